@@ -3,6 +3,7 @@ __all__ = [
 	"models",
 	"service",
 	"pdf_collector",
+	"pdf_cache",
 	"analyzer",
 	"logger_config",
 	"gemini",
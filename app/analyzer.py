@@ -1,103 +1,347 @@
-from sqlalchemy import select, desc
+from sqlalchemy import select
+from typing import Optional, Union
+from datetime import datetime
 import json
-from app.database import get_session
-from app.models import RawDocument, Document
-from app.gemini import extract_fields_from_gemini
+import os
+from app.database import chunked, get_session, insert_ignore
+from app.models import RawDocument, Document, TextBlob
+from app.models.raw_documents import STATUS_DONE, STATUS_DUPLICATE, STATUS_FAILED, STATUS_PENDING
+from app.gemini import (
+    OPTIONAL_FIELDS,
+    REQUIRED_FIELDS,
+    build_prompt,
+    collect_batch_job,
+    extract_many_from_gemini,
+    extraction_cache_key,
+    normalize_fields,
+    pending_batch_jobs,
+    prompt_cache_key,
+    submit_batch_job,
+)
+from app.fast_extract import FAST_PATH_DEFAULTS, FAST_PATH_ENABLED, FastPathResult, fast_extract
+from app import llm_cache
 from app.logger_config import get_logger
 
 logger = get_logger(__name__)
 
-def process_raw_documents(metadata_id: int, inserted_record_count: int):
+# RawDocuments extracted and committed together; a restart loses at most one batch of work.
+ANALYZER_BATCH_SIZE = int(os.getenv("ANALYZER_BATCH_SIZE", "50"))
+# Attempts before a RawDocument that keeps failing is marked failed and leaves the queue.
+ANALYZER_MAX_ATTEMPTS = int(os.getenv("ANALYZER_MAX_ATTEMPTS", "3"))
+
+
+def _pending_raw_documents(session, metadata_id: Optional[int], limit: int, after_id: int = 0) -> list[RawDocument]:
+    """Next pending RawDocuments in id order (the partial index), starting after `after_id`, texts included."""
+    stmt = (
+        select(RawDocument)
+        .options(RawDocument.pdf_raw.loader())
+        .where(RawDocument.status == STATUS_PENDING, RawDocument.id > after_id)
+        .order_by(RawDocument.id)
+        .limit(limit)
+    )
+    if metadata_id is not None:
+        stmt = stmt.where(RawDocument.metadata_id == metadata_id)
+    return session.scalars(stmt).all()
+
+
+def _stream_pending_texts(session, metadata_id: Optional[int], limit: Optional[int]):
+    """
+    Yields (id, payload, pdf_text) of pending RawDocuments in id order.
+    Rows are fetched ANALYZER_BATCH_SIZE at a time (a server-side cursor on Postgres) and never
+    enter the session, so only one page of texts is held at a time; what the caller keeps is up to it.
+    """
+    stmt = (
+        select(RawDocument.id, RawDocument.payload, TextBlob.content)
+        .join(TextBlob, TextBlob.sha256 == RawDocument.pdf_raw_sha256)
+        .where(RawDocument.status == STATUS_PENDING)
+        .order_by(RawDocument.id)
+        .limit(limit)
+        .execution_options(yield_per=ANALYZER_BATCH_SIZE)
+    )
+    if metadata_id is not None:
+        stmt = stmt.where(RawDocument.metadata_id == metadata_id)
+    yield from session.execute(stmt)
+
+
+def _mark(raw_doc: RawDocument, status: str, error: Optional[str] = None) -> None:
+    """Records the outcome of one attempt; errors keep the row pending until ANALYZER_MAX_ATTEMPTS."""
+    raw_doc.processed_at = datetime.utcnow()
+    if error is None:
+        raw_doc.status = status
+        raw_doc.last_error = None
+        return
+    raw_doc.attempts = (raw_doc.attempts or 0) + 1
+    raw_doc.last_error = error[:2000]
+    raw_doc.status = STATUS_FAILED if raw_doc.attempts >= ANALYZER_MAX_ATTEMPTS else STATUS_PENDING
+
+
+def _fast_path(payload: dict, pdf_text: str) -> Optional[FastPathResult]:
+    return fast_extract(payload, pdf_text) if FAST_PATH_ENABLED else None
+
+
+def _llm_fields(fast: Optional[FastPathResult]) -> Optional[list[str]]:
+    """Fields still to ask Gemini for; None means the full prompt."""
+    if fast is None:
+        return None
+    confident = fast.confident()
+    if not any(name in confident for name in REQUIRED_FIELDS):
+        return None
+    # Gemini is called anyway, so it also settles the fields that would otherwise take their default
+    return fast.missing() + [name for name in [*FAST_PATH_DEFAULTS, *OPTIONAL_FIELDS] if name not in confident]
+
+
+def _merge_fields(fast: Optional[FastPathResult], extracted: dict) -> dict:
+    """Gemini fills the gaps; confident rule values always win, weaker ones only replace blanks."""
+    if fast is None:
+        return extracted
+    merged = fast.filled()
+    for name, value in extracted.items():
+        if value not in (None, "", "Unknown") or name not in merged:
+            merged[name] = value
+    merged.update(fast.confident())
+    return normalize_fields(merged)
+
+
+def _extract_all(pending: list[tuple[RawDocument, dict]], cache_mode: Optional[str]) -> list:
     """
-    Processes RawDocuments and stores structured data in the Document table.
-    Avoids duplicate reference_id/title/doc_type and handles errors per record safely.
+    Fields for each (raw_doc, payload), in order; failures come back as exceptions.
+    - The rule-based fast path runs first; documents it fills confidently never reach Gemini.
+    - The rest are served from the LLM cache or extracted concurrently, asking only for missing fields.
     """
+    fast = [_fast_path(payload, raw_doc.pdf_raw) for raw_doc, payload in pending]
+    results = [
+        normalize_fields(f.filled()) if f is not None and f.complete else None
+        for f in fast
+    ]
+    todo = [i for i, result in enumerate(results) if result is None]
+    logger.info(f"Fast path completed {len(pending) - len(todo)}/{len(pending)} documents without Gemini.")
+
+    fields = {i: _llm_fields(fast[i]) for i in todo}
+    keys = {i: extraction_cache_key(pending[i][1], pending[i][0].pdf_raw, fields[i]) for i in todo}
+    cached = llm_cache.lookup_many(keys.values(), cache_mode)
+    misses = [i for i in todo if keys[i] not in cached]
+    fresh = extract_many_from_gemini(
+        [(pending[i][1], pending[i][0].pdf_raw, fields[i]) for i in misses]
+    )
+    llm_cache.store_many(
+        {keys[i]: result for i, result in zip(misses, fresh) if not isinstance(result, Exception)},
+        cache_mode,
+    )
+    llm_cache.log_stats()
+
+    for i in todo:
+        if keys[i] in cached:
+            results[i] = _merge_fields(fast[i], cached[keys[i]])
+    for i, result in zip(misses, fresh):
+        results[i] = result if isinstance(result, Exception) else _merge_fields(fast[i], result)
+    return results
+
+
+def _document_row(raw_doc: RawDocument, extracted: dict) -> dict:
+    """Column values of the Document built from one extraction."""
+    return {
+        "reference_id": (extracted.get("reference_id") or "Unknown").strip(),
+        "title": (extracted.get("title") or "").strip(),
+        "doc_type": (extracted.get("doc_type") or "").strip(),
+        "jurisdiction": extracted.get("jurisdiction"),
+        "court": extracted.get("court"),
+        "authority_level": extracted.get("authority_level"),
+        "tags": extracted.get("tags"),
+        "citation": extracted.get("citation"),
+        "year": (
+            int(str(extracted.get("date", "")).split("-")[0]) if extracted.get("date")
+            else int(extracted.get("year") or 0)
+        ),
+        "raw_content_uri": raw_doc.pdf_uri,
+        "legal_status": extracted.get("legal_status"),
+        # Point at the same blob instead of copying the text.
+        "raw_content_sha256": raw_doc.pdf_raw_sha256,
+    }
 
+
+def _existing_reference_ids(session, ref_ids: list[str]) -> set[str]:
+    """One prefetch (per BULK_BATCH_SIZE ids) instead of a SELECT per record."""
+    existing = set()
+    for batch in chunked(ref_ids):
+        existing.update(session.scalars(select(Document.reference_id).where(Document.reference_id.in_(batch))))
+    return existing
+
+
+def _insert_documents(session, fresh: list[tuple[RawDocument, dict]]) -> tuple[set[str], dict[str, str]]:
+    """
+    Bulk-inserts the rows; returns the reference_ids actually written and the errors of failed ones.
+    If the batch statement fails (e.g. a NOT NULL column), rows are retried one by one
+    so a single bad record doesn't sink the batch.
+    """
+    if not fresh:
+        return set(), {}
+    inserted, failed = set(), {}
     try:
-        with get_session() as session:
-            raw_docs = (
-                session.scalars(
-                    select(RawDocument)
-                    .where(RawDocument.metadata_id == metadata_id)
-                    .order_by(desc(RawDocument.created_at))
-                    .limit(inserted_record_count)
-                )
-                .all()
-            )
+        with session.begin_nested():
+            inserted.update(ref_id for ref_id, in insert_ignore(
+                session, Document, [row for _, row in fresh], ["reference_id"], returning=["reference_id"]
+            ))
+    except Exception as e:
+        logger.warning(f"Bulk insert of {len(fresh)} Documents failed, inserting one by one: {e}")
+        for raw_doc, row in fresh:
+            try:
+                with session.begin_nested():
+                    inserted.update(ref_id for ref_id, in insert_ignore(
+                        session, Document, [row], ["reference_id"], returning=["reference_id"]
+                    ))
+            except Exception as insert_error:
+                failed[row["reference_id"]] = str(insert_error)
+                logger.error(f"Failed to insert Document for raw_doc id={raw_doc.id}: {insert_error}")
 
-            if not raw_docs:
-                logger.info(f"No RawDocuments found for metadata_id={metadata_id}")
-                return
-
-            logger.info(f"Processing {len(raw_docs)} RawDocuments for metadata_id={metadata_id}")
-
-            for raw_doc in raw_docs:
-                try:
-                    # Extract fields
-                    payload = json.loads(raw_doc.payload)
-                    pdf_text = raw_doc.pdf_raw
-                    extracted = extract_fields_from_gemini(payload, pdf_text)
-                except Exception as e:
-                    logger.error(f"Failed to extract for raw_doc id={raw_doc.id}: {e}")
-                    continue
-
-                try:
-                    ref_id = (extracted.get("reference_id") or "Unknown").strip()
-                    title = (extracted.get("title") or "").strip()
-                    doc_type = (extracted.get("doc_type") or "").strip()
-
-                    # Check duplicates in DB
-                    existing = session.scalar(
-                        select(Document).where(Document.reference_id == ref_id)
-                    )
-
-                    # Also check duplicates in pending session
-                    in_session_duplicate = any(
-                        isinstance(obj, Document)
-                        and obj.reference_id == ref_id
-                        for obj in session.new
-                    )
-
-                    if existing or in_session_duplicate:
-                        logger.info(
-                            f"Skipping raw_doc id={raw_doc.id}: duplicate reference_id '{ref_id}'."
-                        )
-                        continue
-
-                    # Create Document
-                    doc = Document(
-                        reference_id=ref_id,
-                        title=title,
-                        doc_type=doc_type,
-                        jurisdiction=extracted.get("jurisdiction"),
-                        court=extracted.get("court"),
-                        authority_level=extracted.get("authority_level"),
-                        tags=extracted.get("tags"),
-                        citation=extracted.get("citation"),
-                        year=int(str(extracted.get("date", "")).split("-")[0]) if extracted.get("date") else 0,
-                        raw_content_uri=raw_doc.pdf_uri,
-                        legal_status=extracted.get("legal_status"),
-                        raw_content=raw_doc.pdf_raw,
-                    )
-
-                    session.add(doc)
-                    try:
-                        session.flush()
-                        logger.info(f"Inserted Document for raw_doc id={raw_doc.id}")
-                    except Exception as insert_error:
-                        session.rollback()
-                        logger.error(
-                            f"Failed to insert Document for raw_doc id={raw_doc.id}: {insert_error}"
-                        )
-                        continue
-
-                except Exception as e:
-                    logger.exception(f"Error preparing Document for raw_doc id={raw_doc.id}")
-                    session.rollback()
-                    continue
-
-            session.commit()
-            logger.info(f"Completed processing {len(raw_docs)} documents successfully.")
+    return inserted, failed
+
+
+def _extract_batch(raw_docs: list[RawDocument], cache_mode: Optional[str]) -> list[tuple[RawDocument, Union[dict, Exception]]]:
+    """Extracted fields (or the error) for each RawDocument, in order."""
+    # Parse payloads up front so one bad record doesn't sink the batch
+    outcomes: dict[int, Union[dict, Exception]] = {}
+    pending = []
+    for raw_doc in raw_docs:
+        try:
+            pending.append((raw_doc, json.loads(raw_doc.payload)))
+        except Exception as e:
+            outcomes[raw_doc.id] = ValueError(f"Invalid payload: {e}")
+
+    for (raw_doc, _), extracted in zip(pending, _extract_all(pending, cache_mode)):
+        outcomes[raw_doc.id] = extracted
+    return [(raw_doc, outcomes[raw_doc.id]) for raw_doc in raw_docs]
+
+
+def _store_batch(session, outcomes: list[tuple[RawDocument, Union[dict, Exception]]]) -> int:
+    """Inserts the Documents of one extracted batch and records each RawDocument's outcome; returns Documents inserted."""
+    rows = {}
+    for raw_doc, extracted in outcomes:
+        if isinstance(extracted, Exception):
+            logger.error(f"Failed to extract for raw_doc id={raw_doc.id}: {extracted}")
+            _mark(raw_doc, STATUS_FAILED, str(extracted))
+            continue
+        try:
+            row = _document_row(raw_doc, extracted)
+        except Exception as e:
+            logger.exception(f"Error preparing Document for raw_doc id={raw_doc.id}")
+            _mark(raw_doc, STATUS_FAILED, str(e))
+            continue
+        if row["reference_id"] in rows:
+            logger.info(f"Skipping raw_doc id={raw_doc.id}: duplicate reference_id '{row['reference_id']}'.")
+            _mark(raw_doc, STATUS_DUPLICATE)
+            continue
+        rows[row["reference_id"]] = (raw_doc, row)
+
+    existing = _existing_reference_ids(session, list(rows))
+    fresh = [rows[ref_id] for ref_id in rows if ref_id not in existing]
+    inserted, failed = _insert_documents(session, fresh)
+
+    for ref_id, (raw_doc, _) in rows.items():
+        if ref_id in inserted:
+            _mark(raw_doc, STATUS_DONE)
+        elif ref_id in failed:
+            _mark(raw_doc, STATUS_FAILED, failed[ref_id])
+        else:
+            # Already stored, or lost a race with a concurrent writer (skipped by ON CONFLICT)
+            logger.info(f"Skipping raw_doc id={raw_doc.id}: duplicate reference_id '{ref_id}'.")
+            _mark(raw_doc, STATUS_DUPLICATE)
+    return len(inserted)
+
+
+def _process_batch(session, raw_docs: list[RawDocument], cache_mode: Optional[str]) -> int:
+    """Extracts and stores one batch, recording each RawDocument's outcome; returns Documents inserted."""
+    return _store_batch(session, _extract_batch(raw_docs, cache_mode))
+
+
+def process_raw_documents(metadata_id: Optional[int] = None, inserted_record_count: Optional[int] = None,
+                          cache_mode: str = None) -> int:
+    """
+    Drains pending RawDocuments into the Document table, ANALYZER_BATCH_SIZE at a time.
+    - Work comes from the pending queue in id order, optionally for one metadata_id and at most
+      `inserted_record_count` documents (None drains everything).
+    - Each batch commits its Documents together with the RawDocuments' new status, so the run can be
+      stopped and restarted at any point without skipping or repeating work.
+    - Failed documents stay pending (with attempts/last_error) until ANALYZER_MAX_ATTEMPTS.
+    - Reference_ids already stored are skipped (one prefetch plus ON CONFLICT DO NOTHING).
+    Gemini answers are cached by prompt inputs; `cache_mode` is use/refresh/bypass (default LLM_CACHE_MODE).
+    Returns the number of Documents inserted.
+    """
+    processed, inserted, last_id = 0, 0, 0
+    try:
+        while inserted_record_count is None or processed < inserted_record_count:
+            limit = ANALYZER_BATCH_SIZE
+            if inserted_record_count is not None:
+                limit = min(limit, inserted_record_count - processed)
+
+            with get_session() as session:
+                raw_docs = _pending_raw_documents(session, metadata_id, limit, last_id)
+                if not raw_docs:
+                    break
+                # Keyset cursor: rows left pending after a failure wait for the next run
+                last_id = raw_docs[-1].id
+                logger.info(f"Processing {len(raw_docs)} pending RawDocuments (metadata_id={metadata_id})")
+                inserted += _process_batch(session, raw_docs, cache_mode)
+                processed += len(raw_docs)
+
+        if not processed:
+            logger.info(f"No pending RawDocuments for metadata_id={metadata_id}")
+        else:
+            logger.info(
+                f"Completed processing {processed} documents: {inserted} inserted, "
+                f"{processed - inserted} skipped or failed."
+            )
 
     except Exception:
         logger.exception("process_raw_documents failed")
+    return inserted
+
+
+def _uncached(requests: dict[str, str]) -> dict[str, str]:
+    cached = llm_cache.cached_keys(requests)
+    return {key: prompt for key, prompt in requests.items() if key not in cached}
+
+
+def submit_extraction_job(metadata_id: Optional[int] = None, inserted_record_count: Optional[int] = None):
+    """
+    Deferred mode for backfills: queues the uncached pending RawDocuments as one Gemini batch job.
+    - Rows are streamed ANALYZER_BATCH_SIZE at a time and checked against the LLM cache per page;
+      only the cache key and built prompt (text cut to PROMPT_TEXT_TOKENS) of each uncached
+      document are kept, so memory grows by one prompt per queued document, not by the PDF texts.
+    Once collect_extraction_jobs() has stored the answers in the LLM cache,
+    process_raw_documents() inserts the Documents without calling Gemini again.
+    """
+    queued, page = {}, {}
+    with get_session() as session:
+        for raw_id, raw_payload, pdf_text in _stream_pending_texts(session, metadata_id, inserted_record_count):
+            try:
+                payload = json.loads(raw_payload)
+            except Exception as e:
+                logger.error(f"Skipping raw_doc id={raw_id} for batch job: {e}")
+                continue
+            fast = _fast_path(payload, pdf_text)
+            if fast is not None and fast.complete:
+                continue
+            prompt = build_prompt(payload, pdf_text, _llm_fields(fast))
+            page[prompt_cache_key(prompt)] = prompt
+            if len(page) >= ANALYZER_BATCH_SIZE:
+                queued.update(_uncached(page))
+                page = {}
+    queued.update(_uncached(page))
+
+    if not queued:
+        logger.info(f"Nothing to queue for metadata_id={metadata_id}, all extractions are cached.")
+        return None
+    return submit_batch_job(list(queued.items()), display_name=f"metadata-{metadata_id}-{len(queued)}")
+
+
+def collect_extraction_jobs() -> int:
+    """Stores the answers of every finished batch job in the LLM cache; returns how many were stored."""
+    stored = 0
+    for job_name in pending_batch_jobs():
+        results = collect_batch_job(job_name)
+        if results is None:
+            continue
+        ok = {key: result for key, result in results.items() if not isinstance(result, Exception)}
+        llm_cache.store_many(ok, "refresh")
+        stored += len(ok)
+    return stored
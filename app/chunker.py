@@ -0,0 +1,346 @@
+import os
+import re
+import bisect
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, Optional
+from sqlalchemy import delete, insert, select, update
+from app.database import chunked, get_session
+from app.models import Chunk, Document, MetadataChunk, TextBlob
+from app.prompt_builder import TOKEN_PIECE
+from app.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Upper bound on the tokens of one chunk.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+# Tokens a chunk repeats from the end of the previous one (cut at a sentence start where possible).
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "60"))
+# A heading starts a new chunk once the current one holds at least this many tokens.
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "100"))
+# Processes splitting documents (0 or 1 splits in this process).
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Documents chunked and committed together.
+CHUNK_BATCH_SIZE = int(os.getenv("CHUNK_BATCH_SIZE", "50"))
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n|\n(?=[ \t]*\d+\.\s)")
+_LINE = re.compile(r"[^\n]+")
+_SENTENCE_END = re.compile(
+    r"(?<!\bNo)(?<!\bvs)(?<!\bv)(?<!\bArt)(?<!\bSec)(?<!\b[A-Z])"
+    r"[.?!;][\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])"
+)
+_NUMBERED_HEADING = re.compile(r"(?:(?:PART|CHAPTER|SECTION|ISSUE|POINT)\s+[\w.-]+|[IVXLC]+\.\s+\S)", re.I)
+
+
+@dataclass
+class ChunkSpan:
+    start: int
+    end: int
+    token_count: int
+
+
+@dataclass
+class _Unit:
+    start: int
+    end: int
+    tokens: int
+    heading: bool = False
+
+
+class _Pieces:
+    """
+    Token offsets of a text, so the tokens of any span are two bisects away.
+    Same pieces and weights as prompt_builder.count_tokens' heuristic.
+    """
+
+    def __init__(self, text: str):
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        self.cum = [0]
+        for match in TOKEN_PIECE.finditer(text):
+            self.starts.append(match.start())
+            self.ends.append(match.end())
+            self.cum.append(self.cum[-1] + 1 + (match.end() - match.start()) // 8)
+
+    def index(self, pos: int) -> int:
+        return bisect.bisect_left(self.starts, pos)
+
+    def tokens(self, start: int, end: int) -> int:
+        return self.cum[self.index(end)] - self.cum[self.index(start)]
+
+    def start_within(self, end: int, tokens: int, lo: int) -> int:
+        """Earliest piece start >= lo from which at most `tokens` tokens remain before `end`."""
+        k = bisect.bisect_left(self.cum, self.cum[self.index(end)] - tokens, lo=self.index(lo))
+        return self.starts[k] if k < len(self.starts) else end
+
+
+def _is_heading(line: str) -> bool:
+    line = line.strip()
+    if not 3 <= len(line) <= 80 or line.endswith((".", ",")):
+        return False
+    letters = [c for c in line if c.isalpha()]
+    if len(letters) >= 3 and all(c.isupper() for c in letters):
+        return True
+    return bool(_NUMBERED_HEADING.match(line)) and len(line.split()) <= 10
+
+
+def _trimmed(text: str, start: int, end: int) -> Optional[tuple[int, int]]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def _blocks(text: str) -> Iterator[tuple[int, int, bool]]:
+    """(start, end, is_heading) of paragraphs, with heading lines split off into blocks of their own."""
+    cut = 0
+    bounds = [(m.start(), m.end()) for m in _PARAGRAPH_BREAK.finditer(text)] + [(len(text), len(text))]
+    for sep_start, sep_end in bounds:
+        body_start = body_end = None
+        for line in _LINE.finditer(text, cut, sep_start):
+            if _is_heading(line.group(0)):
+                if body_start is not None:
+                    yield body_start, body_end, False
+                    body_start = None
+                yield line.start(), line.end(), True
+            else:
+                if body_start is None:
+                    body_start = line.start()
+                body_end = line.end()
+        if body_start is not None:
+            yield body_start, body_end, False
+        cut = sep_end
+
+
+def _units(text: str, pieces: _Pieces, limit: int) -> Iterator[_Unit]:
+    """Paragraphs and headings; paragraphs over `limit` tokens are split into sentences, then hard-split."""
+    for start, end, heading in _blocks(text):
+        span = _trimmed(text, start, end)
+        if span is None:
+            continue
+        tokens = pieces.tokens(*span)
+        if tokens == 0:
+            continue
+        if tokens <= limit:
+            yield _Unit(span[0], span[1], tokens, heading)
+            continue
+        cuts = [span[0]] + [m.end() for m in _SENTENCE_END.finditer(text, span[0], span[1])] + [span[1]]
+        for sentence_start, sentence_end in zip(cuts, cuts[1:]):
+            sentence = _trimmed(text, sentence_start, sentence_end)
+            if sentence is not None:
+                yield from _hard_split(pieces, sentence[0], sentence[1], limit)
+
+
+def _hard_split(pieces: _Pieces, start: int, end: int, limit: int) -> Iterator[_Unit]:
+    """Cuts [start, end) between pieces into units of at most `limit` tokens."""
+    while start < end:
+        tokens = pieces.tokens(start, end)
+        if tokens <= limit:
+            yield _Unit(start, end, tokens)
+            return
+        i = pieces.index(start)
+        j = max(i + 1, bisect.bisect_right(pieces.cum, pieces.cum[i] + limit) - 1)
+        yield _Unit(start, pieces.ends[j - 1], pieces.cum[j] - pieces.cum[i])
+        start = pieces.starts[j] if j < len(pieces.starts) else end
+
+
+def _overlap_start(text: str, pieces: _Pieces, start: int, end: int, overlap: int) -> int:
+    """Where the next chunk begins so it repeats about `overlap` tokens of [start, end); end means no overlap."""
+    if overlap <= 0:
+        return end
+    pos = pieces.start_within(end, overlap, start)
+    if pos <= start:
+        # The whole chunk would be repeated
+        return end
+    sentence = _SENTENCE_END.search(text, pos, end)
+    if sentence is not None and sentence.end() < end:
+        pos = sentence.end()
+    return pos
+
+
+def split_text(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    min_tokens: int = CHUNK_MIN_TOKENS,
+) -> list[ChunkSpan]:
+    """
+    Splits a judgment into overlapping chunks of at most `max_tokens` tokens.
+    - Chunks end on paragraph boundaries; only paragraphs too long for one chunk are cut,
+      at sentence ends if possible.
+    - A heading (ORDER, JUDGMENT, numbered parts...) starts a new chunk, without overlap,
+      once the current chunk holds `min_tokens`; a chunk never ends on a heading if it can be moved on.
+    - Each chunk repeats up to `overlap_tokens` from the end of the previous one, from a sentence start where possible.
+    - Spans are character offsets into `text`, so text[start:end] is the chunk.
+    """
+    if not text:
+        return []
+    pieces = _Pieces(text)
+    spans: list[ChunkSpan] = []
+    current: list[_Unit] = []
+    start = 0
+
+    def close(end: int) -> None:
+        spans.append(ChunkSpan(start, end, pieces.tokens(start, end)))
+
+    for unit in _units(text, pieces, max_tokens):
+        if not current:
+            current, start = [unit], unit.start
+            continue
+        used = pieces.tokens(start, current[-1].end)
+        if not unit.heading or used < min_tokens:
+            if used + unit.tokens <= max_tokens:
+                current.append(unit)
+                continue
+
+        if unit.heading:
+            close(current[-1].end)
+            current, start = [unit], unit.start
+            continue
+
+        # Don't leave a heading dangling at the end of a chunk; carry it over with its text
+        if current[-1].heading and len(current) > 1 and pieces.tokens(current[-1].start, unit.end) <= max_tokens:
+            close(current[-2].end)
+            current, start = [current[-1], unit], current[-1].start
+            continue
+
+        close(current[-1].end)
+        next_start = _overlap_start(text, pieces, start, current[-1].end, overlap_tokens)
+        if next_start >= current[-1].end:
+            # No overlap: start at the unit itself, not at the whitespace before it
+            next_start = unit.start
+        if pieces.tokens(next_start, unit.end) > max_tokens:
+            next_start = max(next_start, pieces.start_within(unit.end, max_tokens, next_start))
+        current, start = [unit], min(next_start, unit.start)
+
+    if current:
+        close(current[-1].end)
+    return spans
+
+
+def _chunk_document(item: tuple[int, str]) -> tuple[int, list[ChunkSpan]]:
+    """Pool task: chunk spans of one (document_id, text)."""
+    document_id, text = item
+    return document_id, split_text(text)
+
+
+###################
+# Storage
+###################
+
+_METADATA_FIELDS = ("doc_type", "jurisdiction", "citation", "year", "court", "authority_level", "tags")
+
+
+def _fit(value, column):
+    """Cuts strings to the column length, since Document allows longer values than MetadataChunk."""
+    length = getattr(column.type, "length", None)
+    if isinstance(value, str) and length:
+        return value[:length]
+    return value
+
+
+def _documents_to_chunk(session, limit: int, after_id: int) -> list:
+    """Next documents not chunked yet in id order, with their text and the metadata chunks inherit."""
+    return session.execute(
+        select(Document.id, TextBlob.content, *(getattr(Document, name) for name in _METADATA_FIELDS))
+        .join(TextBlob, TextBlob.sha256 == Document.raw_content_sha256)
+        .where(Document.id > after_id, Document.chunked_at.is_(None))
+        .order_by(Document.id)
+        .limit(limit)
+    ).all()
+
+
+def _store_chunks(session, documents: dict[int, tuple], results: list[tuple[int, list[ChunkSpan]]]) -> int:
+    """Bulk-inserts the chunks of a batch and their MetadataChunk rows; returns chunks inserted."""
+    chunk_rows, owners = [], []
+    for document_id, spans in results:
+        text = documents[document_id][1]
+        for span in spans:
+            chunk_rows.append({
+                "document_id": document_id,
+                "token_count": span.token_count,
+                "char_start": span.start,
+                "char_end": span.end,
+                "chunk_text": text[span.start:span.end],
+            })
+            owners.append(document_id)
+    if not chunk_rows:
+        return 0
+
+    chunks = Chunk.__table__
+    metadata = MetadataChunk.__table__
+    chunk_ids = []
+    for batch in chunked(chunk_rows):
+        chunk_ids.extend(session.execute(
+            insert(chunks).returning(chunks.c.id, sort_by_parameter_order=True), batch
+        ).scalars())
+
+    metadata_rows = []
+    for chunk_id, document_id in zip(chunk_ids, owners):
+        row = documents[document_id]
+        metadata_rows.append({"chunk_id": chunk_id} | {
+            name: _fit(value, metadata.c[name]) for name, value in zip(_METADATA_FIELDS, row[2:])
+        })
+    for batch in chunked(metadata_rows):
+        session.execute(insert(metadata), batch)
+    return len(chunk_rows)
+
+
+def reset_chunks(document_ids: Optional[list[int]] = None) -> None:
+    """Deletes the chunks (and their metadata) of the given documents, or of all, so they get chunked again."""
+    with get_session() as session:
+        chunk_ids = select(Chunk.id)
+        if document_ids is not None:
+            chunk_ids = chunk_ids.where(Chunk.document_id.in_(document_ids))
+        session.execute(delete(MetadataChunk).where(MetadataChunk.chunk_id.in_(chunk_ids)))
+        stmt = delete(Chunk)
+        unmark = update(Document).values(chunked_at=None)
+        if document_ids is not None:
+            stmt = stmt.where(Chunk.document_id.in_(document_ids))
+            unmark = unmark.where(Document.id.in_(document_ids))
+        session.execute(stmt)
+        session.execute(unmark)
+
+
+def chunk_documents(limit: Optional[int] = None, workers: int = CHUNK_WORKERS) -> int:
+    """
+    Chunks every Document not chunked yet, CHUNK_BATCH_SIZE documents per transaction.
+    - Documents are split across `workers` processes; the database work stays in this one.
+    - Each batch's chunks and MetadataChunk rows are bulk-inserted and committed together,
+      with the documents' chunked_at mark, so a stopped run resumes with the first unchunked
+      document and documents that yield no chunks are not split again on every run.
+    Returns the number of chunks inserted.
+    """
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    documents_done = inserted = last_id = 0
+    try:
+        while limit is None or documents_done < limit:
+            size = CHUNK_BATCH_SIZE if limit is None else min(CHUNK_BATCH_SIZE, limit - documents_done)
+            with get_session() as session:
+                rows = _documents_to_chunk(session, size, last_id)
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                documents = {row[0]: row for row in rows}
+                items = [(row[0], row[1]) for row in rows]
+                results = list(pool.map(_chunk_document, items, chunksize=max(1, len(items) // (workers * 4)))
+                               if pool is not None else map(_chunk_document, items))
+                count = _store_chunks(session, documents, results)
+                # Marked even when they yield no chunks (e.g. blank text), so they aren't picked again
+                session.execute(
+                    update(Document).where(Document.id.in_(list(documents))).values(chunked_at=datetime.utcnow())
+                )
+            documents_done += len(rows)
+            inserted += count
+            logger.info(f"Chunked {len(rows)} documents into {count} chunks (up to document id={last_id}).")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    logger.info(f"Chunking finished: {documents_done} documents, {inserted} chunks.")
+    return inserted
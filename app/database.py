@@ -1,6 +1,7 @@
 from __future__ import annotations
 from contextlib import contextmanager
 import os
+from typing import Optional
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
@@ -36,3 +37,62 @@ def get_session():
         raise
     finally:
         session.close()
+
+
+# Rows per INSERT/IN statement, well under the bind parameter limits of SQLite and PostgreSQL.
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+
+
+def chunked(items: list, size: int = BULK_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def insert_ignore(session, model, rows: list[dict], conflict_columns: list[str],
+                  returning: Optional[list[str]] = None) -> Optional[list[tuple]]:
+    """
+    Bulk INSERT that silently skips rows colliding on `conflict_columns`.
+    - Uses ON CONFLICT DO NOTHING on PostgreSQL and SQLite.
+    - Other dialects fall back to filtering out keys that already exist.
+    - Rows are sent BULK_BATCH_SIZE per statement.
+    - With `returning`, gives back those columns of the rows actually inserted.
+    """
+    if not rows:
+        return [] if returning else None
+    inserted: list[tuple] = []
+    dialect = session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        for batch in chunked(rows):
+            stmt = insert(model).values(batch).on_conflict_do_nothing(index_elements=conflict_columns)
+            if returning:
+                stmt = stmt.returning(*(getattr(model, name) for name in returning))
+                inserted.extend(tuple(row) for row in session.execute(stmt))
+            else:
+                session.execute(stmt)
+        return inserted if returning else None
+
+    from sqlalchemy import insert, select, tuple_
+
+    columns = [getattr(model, name) for name in conflict_columns]
+    for batch in chunked(rows):
+        keys = [tuple(row[name] for name in conflict_columns) for row in batch]
+        # Like ON CONFLICT DO NOTHING, the first of several rows with one key wins
+        seen = set(session.execute(select(*columns).where(tuple_(*columns).in_(keys))).tuples())
+        fresh, fresh_keys = [], []
+        for row, key in zip(batch, keys):
+            if key not in seen:
+                seen.add(key)
+                fresh.append(row)
+                fresh_keys.append(key)
+        if not fresh:
+            continue
+        session.execute(insert(model), fresh)
+        if returning:
+            inserted.extend(tuple(row) for row in session.execute(
+                select(*(getattr(model, name) for name in returning)).where(tuple_(*columns).in_(fresh_keys))
+            ))
+    return inserted if returning else None
@@ -0,0 +1,181 @@
+import os
+import re
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Optional
+from dotenv import load_dotenv
+from logger_config import get_logger
+
+try:
+    import numpy as np
+except ImportError:  # optional: only embeddings and the vector index need it
+    np = None
+
+load_dotenv()
+logger = get_logger(__name__)
+
+# Which backend embeds chunks and queries: "hashing" (local, deterministic) or "gemini".
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "hashing").lower()
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
+# Bump when the model or its settings change; chunks embedded under another version get re-embedded.
+EMBEDDING_VERSION = os.getenv("EMBEDDING_VERSION", "1")
+EMBEDDING_DIM = os.getenv("EMBEDDING_DIM")
+# Texts per embedding request (the Gemini API takes up to 100).
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+
+_WORD = re.compile(r"\w+")
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("Embeddings and the vector index need numpy: pip install numpy")
+    return np
+
+
+class EmbeddingBackend(ABC):
+    """
+    Turns texts into vectors for the vector index.
+    - embed() returns a float32 (len(texts), dim) matrix of L2-normalized rows,
+      so a dot product is the cosine similarity.
+    - `model` and `version` are stored with each chunk to tell stale embeddings apart.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str, dim: int, version: str = EMBEDDING_VERSION):
+        require_numpy()
+        self.model = model
+        self.dim = dim
+        self.version = version
+
+    @abstractmethod
+    def embed(self, texts: list[str]):
+        ...
+
+    @staticmethod
+    def _normalized(vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+
+@lru_cache(maxsize=200_000)
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashingEmbedder(EmbeddingBackend):
+    """
+    Local bag-of-words embedder: word unigrams and bigrams hashed into `dim` signed buckets.
+    Deterministic across processes and machines, needs no network, and is good enough to find
+    passages that share their wording; use a neural backend for semantic search.
+    """
+
+    name = "hashing"
+
+    def __init__(self, model: str = "hashing-v1", dim: int = 256, version: str = EMBEDDING_VERSION):
+        super().__init__(model, dim, version)
+
+    def embed(self, texts: list[str]):
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = _feature_hash(feature)
+                rows.append(row)
+                columns.append(h % self.dim)
+                signs.append(1.0 if h >> 63 else -1.0)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if rows:
+            np.add.at(vectors, (np.array(rows), np.array(columns)), np.array(signs, dtype=np.float32))
+        # Dampen repeated terms so long passages aren't dominated by their most common words
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return self._normalized(vectors)
+
+
+class GeminiEmbedder(EmbeddingBackend):
+    """google-genai embed_content, EMBEDDING_BATCH_SIZE texts per request."""
+
+    name = "gemini"
+
+    def __init__(self, model: str = "text-embedding-004", dim: int = 768, version: str = EMBEDDING_VERSION):
+        super().__init__(model, dim, version)
+        from llm_backends import get_gemini_client
+
+        self.client = get_gemini_client()
+
+    def embed(self, texts: list[str]):
+        vectors = []
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            response = self.client.models.embed_content(
+                model=self.model,
+                contents=texts[start:start + EMBEDDING_BATCH_SIZE],
+                config={"output_dimensionality": self.dim},
+            )
+            vectors.extend(embedding.values for embedding in response.embeddings)
+        return self._normalized(np.array(vectors, dtype=np.float32).reshape(len(texts), self.dim))
+
+
+_shared_embedder: Optional[EmbeddingBackend] = None
+_shared_embedder_lock = threading.Lock()
+
+
+def create_embedder(name: Optional[str] = None) -> EmbeddingBackend:
+    """Builds the embedder selected by `name` (default EMBEDDING_BACKEND), honouring EMBEDDING_MODEL/DIM."""
+    name = (name or EMBEDDING_BACKEND).lower()
+    options = {}
+    if EMBEDDING_MODEL:
+        options["model"] = EMBEDDING_MODEL
+    if EMBEDDING_DIM:
+        options["dim"] = int(EMBEDDING_DIM)
+    if name == "hashing":
+        return HashingEmbedder(**options)
+    if name == "gemini":
+        return GeminiEmbedder(**options)
+    raise ValueError(f"Unknown embedding backend '{name}', expected 'hashing' or 'gemini'")
+
+
+def get_embedder() -> EmbeddingBackend:
+    """Process-wide embedder."""
+    global _shared_embedder
+    with _shared_embedder_lock:
+        if _shared_embedder is None:
+            _shared_embedder = create_embedder()
+            logger.info(f"Embedding with {_shared_embedder.name} ({_shared_embedder.model}, "
+                        f"dim {_shared_embedder.dim}, version {_shared_embedder.version}).")
+        return _shared_embedder
+
+
+_embedders_by_model: dict[tuple, EmbeddingBackend] = {}
+
+
+def embedder_for(model: str, version: Optional[str] = None, dim: Optional[int] = None) -> EmbeddingBackend:
+    """
+    Embedder that produces vectors comparable to `model`'s, e.g. to query a vector store that was
+    built before EMBEDDING_MODEL changed; the shared embedder when it already matches.
+    """
+    current = get_embedder()
+    if model is None or (
+        current.model == model
+        and (version is None or current.version == version)
+        and (dim is None or current.dim == dim)
+    ):
+        return current
+    key = (model, version, dim)
+    with _shared_embedder_lock:
+        if key not in _embedders_by_model:
+            options = {"model": model, "version": version or EMBEDDING_VERSION}
+            if dim:
+                options["dim"] = dim
+            backend = HashingEmbedder if model.startswith("hashing") else GeminiEmbedder
+            _embedders_by_model[key] = backend(**options)
+        return _embedders_by_model[key]
+
+
+def set_embedder(embedder: Optional[EmbeddingBackend]) -> None:
+    """Swaps the process-wide embedder; None resets it."""
+    global _shared_embedder
+    with _shared_embedder_lock:
+        _shared_embedder = embedder
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from app.gemini import REQUIRED_FIELDS
+
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+# Fields below this confidence are still asked of Gemini (the rule value is kept as a fallback).
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.75"))
+# How much of the PDF text counts as the "first page" for header rules.
+FAST_PATH_HEAD_CHARS = int(os.getenv("FAST_PATH_HEAD_CHARS", "4000"))
+# Required fields no rule can settle, and the value they take when the rules fill everything else.
+# Whether a judgment still stands isn't in its own text, so legal_status only comes from Gemini when
+# Gemini is asked for other fields anyway.
+FAST_PATH_DEFAULTS = {"legal_status": os.getenv("FAST_PATH_DEFAULT_LEGAL_STATUS", "Reported")}
+
+# canonical court -> (jurisdiction, authority_level)
+COURTS = {
+    "Supreme Court of Pakistan": ("Pakistan", "Apex Court"),
+    "Federal Shariat Court": ("Pakistan", "Federal Shariat Court"),
+    "Islamabad High Court": ("Islamabad Capital Territory", "High Court"),
+    "Lahore High Court": ("Punjab", "High Court"),
+    "Sindh High Court": ("Sindh", "High Court"),
+    "Peshawar High Court": ("Khyber Pakhtunkhwa", "High Court"),
+    "Balochistan High Court": ("Balochistan", "High Court"),
+}
+
+# Court names/abbreviations as they appear in citations and headers -> canonical court
+COURT_ALIASES = {
+    "sc": "Supreme Court of Pakistan",
+    "supreme court": "Supreme Court of Pakistan",
+    "supreme court of pakistan": "Supreme Court of Pakistan",
+    "fsc": "Federal Shariat Court",
+    "federal shariat court": "Federal Shariat Court",
+    "islamabad": "Islamabad High Court",
+    "islamabad high court": "Islamabad High Court",
+    "lahore": "Lahore High Court",
+    "lahore high court": "Lahore High Court",
+    "karachi": "Sindh High Court",
+    "sindh": "Sindh High Court",
+    "sindh high court": "Sindh High Court",
+    "high court of sindh": "Sindh High Court",
+    "peshawar": "Peshawar High Court",
+    "peshawar high court": "Peshawar High Court",
+    "quetta": "Balochistan High Court",
+    "balochistan": "Balochistan High Court",
+    "balochistan high court": "Balochistan High Court",
+    "high court of balochistan": "Balochistan High Court",
+}
+
+# Reporters that only publish one court's judgments; the rest name the court in the citation or header.
+REPORTER_COURTS = {
+    "SCMR": "Supreme Court of Pakistan",
+    "SCR": "Supreme Court of Pakistan",
+}
+
+# Reporter abbreviations, also matching the spaced/dotted forms printed in headers ("S C M R", "P.Cr.L.J.")
+_REPORTERS = "|".join(
+    r"\.?\s?".join(abbr) for abbr in ("SCMR", "SCR", "CLC", "YLR", "MLD", "PLC", "PTD", "CLD", "PLJ", "PCrLJ", "GBLR", "PLD")
+)
+# "2019 SCMR 123", "2020 P.Cr.L.J. 45"
+_YEAR_FIRST = re.compile(rf"\b(?P<year>(?:19|20)\d{{2}})\s+(?P<reporter>{_REPORTERS})\.?\s+(?P<page>\d+)\b", re.I)
+# "PLD 2019 SC 123", "PLD 2020 Lahore 10"
+_REPORTER_FIRST = re.compile(
+    rf"\b(?P<reporter>PLD|PLJ)\s+(?P<year>(?:19|20)\d{{2}})\s+(?P<court>[A-Za-z][A-Za-z. ]{{0,30}}?)\s+(?P<page>\d+)\b", re.I
+)
+_HEADER_COURT = re.compile(
+    r"\b(SUPREME COURT OF PAKISTAN|FEDERAL SHARIAT COURT|ISLAMABAD HIGH COURT|LAHORE HIGH COURT|"
+    r"SINDH HIGH COURT|HIGH COURT OF SINDH|PESHAWAR HIGH COURT|BALOCHISTAN HIGH COURT|HIGH COURT OF BALOCHISTAN)\b",
+    re.I,
+)
+_DOC_TYPE = re.compile(r"^\s*(JUDGMENT|JUDGEMENT|SHORT ORDER|ORDER)\s*$", re.M)
+_PARTIES = re.compile(
+    r"(?P<a>[^\n]{3,200}?)\s*-{2,}\s*(?:Appellant|Petitioner|Applicant|Plaintiff)s?\b.{0,400}?"
+    r"\b(?:Versus|Vs\.?|V\.)\s+(?P<b>[^\n]{3,200}?)\s*-{2,}\s*(?:Respondent|Defendant|Accused)s?\b",
+    re.S | re.I,
+)
+_MONTHS = "January|February|March|April|May|June|July|August|September|October|November|December"
+_DATE_WORDS = re.compile(
+    rf"Date\s+of\s+(?:hearing|decision|judgment|order)\s*[:\-]?\s*(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+"
+    rf"(?P<month>{_MONTHS}),?\s+(?P<year>(?:19|20)\d{{2}})",
+    re.I,
+)
+_DATE_DIGITS = re.compile(
+    r"Date\s+of\s+(?:hearing|decision|judgment|order)\s*[:\-]?\s*(?P<day>\d{1,2})[./-](?P<month>\d{1,2})[./-](?P<year>(?:19|20)\d{2})",
+    re.I,
+)
+
+
+@dataclass
+class FastPathResult:
+    """Fields the rules could fill, each with a confidence in [0, 1]."""
+    fields: dict = field(default_factory=dict)
+    confidence: dict = field(default_factory=dict)
+
+    def set(self, name: str, value, confidence: float) -> None:
+        if value in (None, ""):
+            return
+        if confidence > self.confidence.get(name, 0.0):
+            self.fields[name] = value
+            self.confidence[name] = confidence
+
+    def confident(self, threshold: float = FAST_PATH_MIN_CONFIDENCE) -> dict:
+        return {k: v for k, v in self.fields.items() if self.confidence[k] >= threshold}
+
+    def missing(self, threshold: float = FAST_PATH_MIN_CONFIDENCE) -> list[str]:
+        """Required fields that still need the LLM (the FAST_PATH_DEFAULTS ones never hold a document back)."""
+        confident = self.confident(threshold)
+        return [name for name in REQUIRED_FIELDS if name not in confident and name not in FAST_PATH_DEFAULTS]
+
+    def filled(self) -> dict:
+        """The rule values, with FAST_PATH_DEFAULTS for the fields the rules left empty."""
+        return {**FAST_PATH_DEFAULTS, **self.fields}
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing()
+
+
+def _canonical_court(name: str) -> Optional[str]:
+    return COURT_ALIASES.get(re.sub(r"[.\s]+", " ", name).strip().lower())
+
+
+def _parse_citation(text: str) -> Optional[dict]:
+    """First law-report citation in `text` as {citation, year, court?}."""
+    match = _REPORTER_FIRST.search(text) or _YEAR_FIRST.search(text)
+    if not match:
+        return None
+    reporter = re.sub(r"[\s.]", "", match.group("reporter")).upper()
+    parsed = {
+        "citation": re.sub(r"\s+", " ", match.group(0)).strip(),
+        "year": int(match.group("year")),
+        "court": REPORTER_COURTS.get(reporter),
+    }
+    if "court" in match.groupdict() and match.group("court"):
+        parsed["court"] = _canonical_court(match.group("court")) or parsed["court"]
+    return parsed
+
+
+def _parse_date(head: str) -> Optional[str]:
+    match = _DATE_WORDS.search(head)
+    fmt = "%d %B %Y"
+    if not match:
+        match = _DATE_DIGITS.search(head)
+        fmt = "%d %m %Y"
+    if not match:
+        return None
+    try:
+        dt = datetime.strptime(f"{match.group('day')} {match.group('month')} {match.group('year')}", fmt)
+    except ValueError:
+        return None
+    return dt.strftime("%Y-%m-%d")
+
+
+def _clean(value: str) -> str:
+    return re.sub(r"\s+", " ", value).strip(" ,.-")
+
+
+def fast_extract(payload: dict, pdf_text: str) -> FastPathResult:
+    """
+    Fills what it can from the scraped row and the first page of the PDF.
+    - Structured payload columns (Case No, Citation, Topic) are trusted most.
+    - Reporter/court lookup tables give court, jurisdiction, authority level and year.
+    - Header regexes on the first page give court, doc type, parties and date.
+    """
+    result = FastPathResult()
+    head = (pdf_text or "")[:FAST_PATH_HEAD_CHARS]
+
+    case_no = _clean(str(payload.get("Case No") or ""))
+    result.set("reference_id", case_no, 1.0)
+
+    topic = _clean(str(payload.get("Topic") or ""))
+    result.set("tags", topic, 1.0)
+
+    citation = _parse_citation(str(payload.get("Citation") or ""))
+    citation_confidence = 1.0
+    if not citation:
+        citation = _parse_citation(head)
+        citation_confidence = 0.8
+    if citation:
+        result.set("citation", citation["citation"], citation_confidence)
+        result.set("reference_id", citation["citation"], 0.7)
+        result.set("year", citation["year"], citation_confidence)
+        result.set("court", citation["court"], 0.9 * citation_confidence)
+
+    header = _HEADER_COURT.search(head)
+    if header:
+        result.set("court", _canonical_court(header.group(1)), 0.95)
+
+    court = result.fields.get("court")
+    if court in COURTS:
+        jurisdiction, authority_level = COURTS[court]
+        result.set("jurisdiction", jurisdiction, result.confidence["court"])
+        result.set("authority_level", authority_level, result.confidence["court"])
+
+    doc_type = _DOC_TYPE.search(head)
+    if doc_type:
+        label = doc_type.group(1).upper()
+        result.set("doc_type", "Order" if "ORDER" in label else "Judgment", 0.85)
+    elif payload.get("Judgement"):
+        # The row links to a "View Judgement" document
+        result.set("doc_type", "Judgment", 0.6)
+
+    parties = _PARTIES.search(head)
+    if parties:
+        result.set("title", f"{_clean(parties.group('a'))} v. {_clean(parties.group('b'))}", 0.8)
+
+    result.set("date", _parse_date(head), 0.8)
+    if result.fields.get("date"):
+        result.set("year", int(result.fields["date"][:4]), 0.8)
+
+    return result
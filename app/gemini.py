@@ -1,132 +1,527 @@
 import os
 import json
 import time
+import atexit
+import asyncio
+import hashlib
+import threading
+from typing import Optional, Union
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 from logger_config import get_logger
+from llm_backends import LLM_BACKEND, LLMBackend, create_backend, get_backend, get_gemini_client
+from rate_governor import RateGovernor, get_rate_governor, retry_delay
+from prompt_builder import PROMPT_TEXT_TOKENS, compact_payload, count_tokens, prompt_stats, select_text
 import re
 from datetime import datetime
 
 load_dotenv()
 logger = get_logger(__name__)
 
-def extract_fields_from_gemini(payload: dict, pdf_text: str, max_retries: int = 2) -> dict:
-    """
-    Uses Gemini 2.5 Flash to extract structured fields from the PDF content and payload.
-    Returns a fully normalized dict ready for SQLAlchemy insertion. Synchronous version.
-    """
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# Requests in flight at once for the async batch API.
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+# Tokens reserved for the model's answer when estimating a request's cost.
+GEMINI_OUTPUT_TOKENS = int(os.getenv("GEMINI_OUTPUT_TOKENS", "512"))
+# Short documents sent per request in packed mode (1 disables packing), and what counts as short.
+GEMINI_PACK_SIZE = int(os.getenv("GEMINI_PACK_SIZE", "1"))
+GEMINI_PACK_MAX_CHARS = int(os.getenv("GEMINI_PACK_MAX_CHARS", "3000"))
+# Manifests of submitted batch jobs, kept until their results are collected.
+GEMINI_JOBS_DIR = os.getenv("GEMINI_JOBS_DIR", ".cache/gemini_jobs")
+FINISHED_JOB_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+# Bump whenever build_prompt, SYSTEM_INSTRUCTION or normalize_fields change what
+# Gemini returns; cached extractions made under another version are ignored.
+PROMPT_VERSION = "2"
+# Model name recorded with cached extractions; answers from the fake backend never pass for real ones.
+CACHE_MODEL = GEMINI_MODEL if LLM_BACKEND == "gemini" else f"{LLM_BACKEND}/{GEMINI_MODEL}"
+
+SYSTEM_INSTRUCTION = (
+    "You are a strict JSON generator. "
+    "Do not include any explanation or markdown. "
+    "Return only valid JSON that matches the expected fields."
+)
+
+# Define schema fields expected
+REQUIRED_FIELDS = [
+    "reference_id", "title", "doc_type", "jurisdiction",
+    "court", "authority_level", "citation", "legal_status"
+]
+
+OPTIONAL_FIELDS = ["tags", "date"]
 
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    if not GEMINI_API_KEY:
-        raise EnvironmentError("Missing GEMINI_API_KEY in environment variables.")
+FIELD_HINTS = {"tags": "tags (comma-separated string)", "date": "date (YYYY-MM-DD)"}
 
-    client = genai.Client(api_key=GEMINI_API_KEY)
 
-    # Define schema fields expected
-    required_fields = [
-        "reference_id", "title", "doc_type", "jurisdiction",
-        "court", "authority_level", "citation", "legal_status"
-    ]
+def _field_list(fields: Optional[list[str]]) -> str:
+    if not fields:
+        return """reference_id, title, doc_type, jurisdiction, court, authority_level,
+    tags (comma-separated string), citation, date (YYYY-MM-DD), legal_status."""
+    return ", ".join(FIELD_HINTS.get(name, name) for name in fields) + "."
 
-    optional_fields = ["tags", "date"]
 
-    # Build prompt
-    base_prompt = f"""
+def build_prompt(payload: dict, pdf_text: str, fields: Optional[list[str]] = None) -> str:
+    """`fields` narrows the request to what the rule-based fast path couldn't fill."""
+    return f"""
     You are a professional AI trained to extract structured metadata from legal documents.
 
     **Return valid JSON only** (no markdown, no explanations) with these fields:
-    reference_id, title, doc_type, jurisdiction, court, authority_level,
-    tags (comma-separated string), citation, date (YYYY-MM-DD), legal_status.
+    {_field_list(fields)}
 
     If any field is missing, make the best inference. Always ensure 'citation' and 'reference_id' are strings.
 
     Payload:
-    {json.dumps(payload, indent=2)}
+    {compact_payload(payload)}
 
-    PDF Content (first 5000 chars):
-    {pdf_text[:5000]}
+    PDF Content (selected excerpts, "[...]" marks skipped text):
+    {select_text(pdf_text, PROMPT_TEXT_TOKENS)}
     """
 
-    def _parse_response(text: str) -> dict:
-        cleaned = re.sub(r"```(?:json)?|```", "", text).strip()
-        json_match = re.search(r"\{[\s\S]*\}", cleaned)
-        if not json_match:
-            raise ValueError(f"No JSON object found in response:\n{text[:300]}...")
-        extracted = json.loads(json_match.group(0))
-        if not isinstance(extracted, dict):
-            raise ValueError("Gemini returned a non-dictionary JSON structure.")
-        return extracted
-
-    def _call_gemini(prompt: str):
-        return client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                system_instruction=(
-                    "You are a strict JSON generator. "
-                    "Do not include any explanation or markdown. "
-                    "Return only valid JSON that matches the expected fields."
-                )
-            ),
-        )
 
-    for attempt in range(1, max_retries + 1):
+def prompt_cache_key(prompt: str) -> str:
+    """Hash of every input the extraction depends on: prompt (payload + truncated text), version and model."""
+    digest = hashlib.sha256()
+    for part in (PROMPT_VERSION, CACHE_MODEL, prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def extraction_cache_key(payload: dict, pdf_text: str, fields: Optional[list[str]] = None) -> str:
+    return prompt_cache_key(build_prompt(payload, pdf_text, fields))
+
+
+def prompt_tokens(prompt: str) -> int:
+    """Input size of a request (system instruction + prompt), recorded for every call."""
+    tokens = count_tokens(SYSTEM_INSTRUCTION) + count_tokens(prompt)
+    prompt_stats.record(tokens)
+    logger.debug(f"Gemini prompt: {tokens} tokens (average {prompt_stats.average:.0f})")
+    return tokens
+
+
+def _parse_response(text: str) -> dict:
+    cleaned = re.sub(r"```(?:json)?|```", "", text).strip()
+    json_match = re.search(r"\{[\s\S]*\}", cleaned)
+    if not json_match:
+        raise ValueError(f"No JSON object found in response:\n{text[:300]}...")
+    extracted = json.loads(json_match.group(0))
+    if not isinstance(extracted, dict):
+        raise ValueError("Gemini returned a non-dictionary JSON structure.")
+    return extracted
+
+
+def normalize_fields(extracted: dict) -> dict:
+    """Normalizes Gemini's JSON into a dict ready for SQLAlchemy insertion."""
+    # Convert lists → comma strings
+    for key in ("tags", "citation"):
+        val = extracted.get(key)
+        if isinstance(val, list):
+            extracted[key] = ", ".join([str(v).strip() for v in val if v])
+        elif isinstance(val, (int, float)):
+            extracted[key] = str(val)
+        elif val is None:
+            extracted[key] = ""
+
+    # Clean up and title-case text fields
+    text_fields = ["title", "doc_type", "jurisdiction", "court", "authority_level", "legal_status"]
+    for key in text_fields:
+        val = extracted.get(key)
+        if isinstance(val, str):
+            extracted[key] = re.sub(r"\s+", " ", val).strip().title()
+
+    # Validate and normalize date
+    date_val = extracted.get("date")
+    if date_val:
         try:
-            logger.info(f"Gemini extraction attempt {attempt}/{max_retries}")
-            response = _call_gemini(base_prompt)
-            text = response.text.strip()
-
-            extracted = _parse_response(text)
-            logger.debug(f"Gemini raw JSON: {json.dumps(extracted, indent=2)[:500]}...")
-
-            # --- Normalize fields for DB ---
-            # Convert lists → comma strings
-            for key in ("tags", "citation"):
-                val = extracted.get(key)
-                if isinstance(val, list):
-                    extracted[key] = ", ".join([str(v).strip() for v in val if v])
-                elif isinstance(val, (int, float)):
-                    extracted[key] = str(val)
-                elif val is None:
-                    extracted[key] = ""
-
-            # Clean up and title-case text fields
-            text_fields = ["title", "doc_type", "jurisdiction", "court", "authority_level", "legal_status"]
-            for key in text_fields:
-                val = extracted.get(key)
-                if isinstance(val, str):
-                    extracted[key] = re.sub(r"\s+", " ", val).strip().title()
-
-            # Validate and normalize date
-            date_val = extracted.get("date")
-            if date_val:
-                try:
-                    # Try to extract YYYY-MM-DD or any common format
-                    dt = datetime.strptime(date_val[:10], "%Y-%m-%d")
-                    extracted["date"] = dt.strftime("%Y-%m-%d")
-                except Exception:
-                    extracted["date"] = None
-            else:
-                extracted["date"] = None
-
-            # Ensure all required fields are present
-            for field in required_fields:
-                if field not in extracted or not extracted[field]:
-                    logger.warning(f"Missing or empty field: {field}")
-                    extracted[field] = "Unknown"
-
-            # Fill optional if missing
-            for field in optional_fields:
-                extracted.setdefault(field, "")
+            # Try to extract YYYY-MM-DD or any common format
+            dt = datetime.strptime(date_val[:10], "%Y-%m-%d")
+            extracted["date"] = dt.strftime("%Y-%m-%d")
+        except Exception:
+            extracted["date"] = None
+    else:
+        extracted["date"] = None
+
+    # Ensure all required fields are present
+    for field in REQUIRED_FIELDS:
+        if field not in extracted or not extracted[field]:
+            logger.warning(f"Missing or empty field: {field}")
+            extracted[field] = "Unknown"
+
+    # Fill optional if missing
+    for field in OPTIONAL_FIELDS:
+        extracted.setdefault(field, "")
+
+    return extracted
+
+
+def _parse_and_normalize(response) -> dict:
+    text = response.text.strip()
+    extracted = _parse_response(text)
+    logger.debug(f"Gemini raw JSON: {json.dumps(extracted, indent=2)[:500]}...")
+    return normalize_fields(extracted)
+
 
+def extract_fields_from_gemini(payload: dict, pdf_text: str, max_retries: int = 2,
+                               fields: Optional[list[str]] = None) -> dict:
+    """
+    Uses Gemini 2.5 Flash to extract structured fields from the PDF content and payload.
+    Returns a fully normalized dict ready for SQLAlchemy insertion. Synchronous version.
+    """
+    backend = get_backend(GEMINI_MODEL, SYSTEM_INSTRUCTION)
+    governor = get_rate_governor()
+    base_prompt = build_prompt(payload, pdf_text, fields)
+    tokens = prompt_tokens(base_prompt)
+    estimated = tokens + GEMINI_OUTPUT_TOKENS
+
+    for attempt in range(1, max_retries + 1):
+        try:
+            logger.info(f"Gemini extraction attempt {attempt}/{max_retries} ({tokens} prompt tokens)")
+            governor.acquire_sync(estimated)
+            response = backend.generate(base_prompt)
+            governor.record_usage(estimated, response.total_tokens)
+            extracted = _parse_and_normalize(response)
             logger.info("Successfully extracted and normalized structured fields.")
             return extracted
 
         except Exception as e:
             logger.warning(f"Gemini extraction failed (attempt {attempt}): {e}")
+            # Quota/overload errors set the shared backoff that acquire_sync waits out
+            transient = governor.record_failure(e)
             if attempt == max_retries:
                 logger.error("Gemini extraction failed after all retries.")
                 raise
-            time.sleep(2 * attempt)
+            if not transient:
+                time.sleep(retry_delay(attempt))
+
+
+#################
+# Async batch API
+#################
+
+async def _generate_with_retries(backend: LLMBackend, prompt: str, estimated: int,
+                                 governor: Optional[RateGovernor], max_retries: int, parse):
+    """Sends one prompt with retry/backoff and returns parse(response); every attempt passes the governor."""
+    governor = governor or get_rate_governor()
+    for attempt in range(1, max_retries + 1):
+        try:
+            await governor.acquire(estimated)
+            response = await backend.agenerate(prompt)
+            await asyncio.to_thread(governor.record_usage, estimated, response.total_tokens)
+            return parse(response)
+
+        except Exception as e:
+            logger.warning(f"Gemini extraction failed (attempt {attempt}): {e}")
+            # Quota/overload errors set the shared backoff that acquire waits out
+            transient = await asyncio.to_thread(governor.record_failure, e)
+            if attempt == max_retries:
+                raise
+            if not transient:
+                await asyncio.sleep(retry_delay(attempt))
+
+
+async def extract_fields_from_gemini_async(
+    backend: LLMBackend,
+    payload: dict,
+    pdf_text: str,
+    governor: Optional[RateGovernor] = None,
+    max_retries: int = 2,
+    fields: Optional[list[str]] = None,
+) -> dict:
+    """Async counterpart of extract_fields_from_gemini."""
+    base_prompt = build_prompt(payload, pdf_text, fields)
+    estimated = prompt_tokens(base_prompt) + GEMINI_OUTPUT_TOKENS
+    return await _generate_with_retries(backend, base_prompt, estimated, governor, max_retries, _parse_and_normalize)
+
+
+################
+# Packed prompts
+################
+
+def build_packed_prompt(docs: list[tuple[str, dict, str]]) -> str:
+    """One prompt for several short (doc_id, payload, pdf_text) documents; answers are matched back by id."""
+    sections = "\n".join(
+        f"""
+    ### Document {doc_id}
+    Payload:
+    {compact_payload(payload)}
+
+    PDF Content:
+    {select_text(pdf_text, PROMPT_TEXT_TOKENS)}
+    """
+        for doc_id, payload, pdf_text in docs
+    )
+    return f"""
+    You are a professional AI trained to extract structured metadata from legal documents.
+    Below are {len(docs)} separate documents, each introduced by "### Document <id>".
+
+    **Return a valid JSON array only** (no markdown, no explanations) with exactly one object
+    per document. Each object has "id" (the document id exactly as given) and these fields:
+    reference_id, title, doc_type, jurisdiction, court, authority_level,
+    tags (comma-separated string), citation, date (YYYY-MM-DD), legal_status.
+
+    If any field is missing, make the best inference. Always ensure 'citation' and 'reference_id' are strings.
+    Never mix information between documents.
+    {sections}
+    """
+
+
+def _parse_packed_response(response) -> dict[str, dict]:
+    """Maps document id -> normalized fields; objects without a usable id are dropped."""
+    text = response.text.strip()
+    cleaned = re.sub(r"```(?:json)?|```", "", text).strip()
+    json_match = re.search(r"\[[\s\S]*\]", cleaned)
+    if not json_match:
+        raise ValueError(f"No JSON array found in response:\n{text[:300]}...")
+    parsed = json.loads(json_match.group(0))
+    if not isinstance(parsed, list):
+        raise ValueError("Gemini returned a non-list JSON structure for a packed prompt.")
+
+    extracted = {}
+    for obj in parsed:
+        if isinstance(obj, dict) and obj.get("id") is not None:
+            doc_id = str(obj.pop("id")).strip()
+            extracted[doc_id] = normalize_fields(obj)
+    return extracted
+
+
+async def extract_packed_from_gemini_async(
+    backend: LLMBackend,
+    docs: list[tuple[str, dict, str]],
+    governor: Optional[RateGovernor] = None,
+    max_retries: int = 2,
+    retry_missing: bool = True,
+) -> dict[str, Union[dict, Exception]]:
+    """
+    Extracts several documents with a single request.
+    - Documents missing from (or unparseable in) the answer are retried on their own,
+      as is the whole pack if the packed request keeps failing.
+    - With retry_missing=False they are left out of the result for the caller to schedule.
+    """
+    prompt = build_packed_prompt(docs)
+    estimated = prompt_tokens(prompt) + GEMINI_OUTPUT_TOKENS * len(docs)
+    try:
+        packed = await _generate_with_retries(backend, prompt, estimated, governor, max_retries, _parse_packed_response)
+    except Exception as e:
+        logger.warning(f"Packed extraction of {len(docs)} documents failed, retrying them singly: {e}")
+        packed = {}
+
+    results: dict[str, Union[dict, Exception]] = {}
+    retry = []
+    for doc_id, payload, pdf_text in docs:
+        if doc_id in packed:
+            results[doc_id] = packed[doc_id]
+        else:
+            retry.append((doc_id, payload, pdf_text))
+
+    if retry and retry_missing:
+        logger.info(f"Retrying {len(retry)}/{len(docs)} documents of a pack individually.")
+        singles = await asyncio.gather(
+            *(extract_fields_from_gemini_async(backend, p, t, governor, max_retries) for _, p, t in retry),
+            return_exceptions=True,
+        )
+        for (doc_id, _, _), result in zip(retry, singles):
+            results[doc_id] = result
+    return results
+
+
+def _plan_packs(items: list[tuple], pack_size: int, pack_max_chars: int) -> tuple[list[list[int]], list[int]]:
+    """Splits item indexes into packs of short documents and singles for everything else."""
+    if pack_size <= 1:
+        return [], list(range(len(items)))
+    short = [i for i, item in enumerate(items) if len(item[1] or "") <= pack_max_chars]
+    packs = [short[i:i + pack_size] for i in range(0, len(short), pack_size)]
+    # A pack of one is just a single request with a longer prompt
+    if packs and len(packs[-1]) == 1:
+        short.remove(packs.pop()[0])
+    packed = set(short)
+    return packs, [i for i in range(len(items)) if i not in packed]
+
+
+async def extract_many_from_gemini_async(
+    items: list[tuple],
+    concurrency: int = GEMINI_CONCURRENCY,
+    governor: Optional[RateGovernor] = None,
+    max_retries: int = 2,
+    pack_size: int = GEMINI_PACK_SIZE,
+    pack_max_chars: int = GEMINI_PACK_MAX_CHARS,
+    backend: Optional[LLMBackend] = None,
+) -> list[Union[dict, Exception]]:
+    """
+    Extracts fields for many (payload, pdf_text[, fields]) items concurrently.
+    - `fields` restricts an item to the listed fields; packed items always ask for all of them.
+    - At most `concurrency` requests are in flight; the shared governor keeps all processes under RPM/TPM.
+    - With pack_size > 1, documents of at most pack_max_chars are sent pack_size per request.
+    - Results keep the order of `items`; a failed item yields its exception instead of a dict.
+    - The async transport is bound to the running event loop, so without a `backend` the batch
+      builds its own (LLM_BACKEND picks the real API or the local fake) and closes it afterwards;
+      a backend passed in is left open for the caller's next batch.
+    """
+    if not items:
+        return []
+    governor = governor or get_rate_governor()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    owned = backend is None
+    backend = backend or create_backend(GEMINI_MODEL, SYSTEM_INSTRUCTION)
+    results: list[Union[dict, Exception, None]] = [None] * len(items)
+    packs, singles = _plan_packs(items, pack_size, pack_max_chars)
+
+    async def _one(i: int) -> None:
+        async with semaphore:
+            try:
+                payload, pdf_text, *fields = items[i]
+                results[i] = await extract_fields_from_gemini_async(
+                    backend, payload, pdf_text, governor, max_retries, fields[0] if fields else None
+                )
+            except Exception as e:
+                results[i] = e
+
+    async def _pack(indexes: list[int]) -> None:
+        async with semaphore:
+            docs = [(str(i), items[i][0], items[i][1]) for i in indexes]
+            packed = await extract_packed_from_gemini_async(backend, docs, governor, max_retries, retry_missing=False)
+        for doc_id, result in packed.items():
+            results[int(doc_id)] = result
+        # Documents the pack didn't answer go back through the semaphore one by one
+        missing = [i for i in indexes if str(i) not in packed]
+        if missing:
+            logger.info(f"Retrying {len(missing)}/{len(indexes)} documents of a pack individually.")
+            await asyncio.gather(*(_one(i) for i in missing))
+
+    try:
+        await asyncio.gather(*(_one(i) for i in singles), *(_pack(p) for p in packs))
+    finally:
+        if owned:
+            await backend.aclose()
+
+    failed = sum(isinstance(r, Exception) for r in results)
+    logger.info(
+        f"Gemini batch finished: {len(results) - failed} extracted, {failed} failed "
+        f"({len(packs)} packed requests, {len(singles)} single, "
+        f"{prompt_stats.average:.0f} prompt tokens on average)."
+    )
+    return results
+
+
+_batch_runtime = threading.local()
+_batch_runners: list[tuple[asyncio.Runner, LLMBackend]] = []
+_batch_runners_lock = threading.Lock()
+
+
+def _thread_batch_runner() -> tuple[asyncio.Runner, LLMBackend]:
+    """This thread's event loop and the async backend bound to it, kept across batches."""
+    runner = getattr(_batch_runtime, "runner", None)
+    if runner is None:
+        runner = (asyncio.Runner(), create_backend(GEMINI_MODEL, SYSTEM_INSTRUCTION))
+        _batch_runtime.runner = runner
+        with _batch_runners_lock:
+            _batch_runners.append(runner)
+    return runner
+
+
+@atexit.register
+def _close_batch_runners() -> None:
+    with _batch_runners_lock:
+        runners = list(_batch_runners)
+        _batch_runners.clear()
+    for runner, backend in runners:
+        try:
+            runner.run(backend.aclose())
+        except Exception as e:
+            logger.debug(f"Closing a batch backend failed: {e}")
+        finally:
+            runner.close()
+
+
+def extract_many_from_gemini(
+    items: list[tuple],
+    concurrency: int = GEMINI_CONCURRENCY,
+    max_retries: int = 2,
+    pack_size: int = GEMINI_PACK_SIZE,
+) -> list[Union[dict, Exception]]:
+    """
+    Synchronous wrapper around extract_many_from_gemini_async.
+    Each calling thread keeps one event loop and backend for all its batches, so
+    connections are reused and the fake backend's random sequence carries on.
+    """
+    runner, backend = _thread_batch_runner()
+    return runner.run(
+        extract_many_from_gemini_async(items, concurrency, max_retries=max_retries, pack_size=pack_size,
+                                       backend=backend)
+    )
+
+
+######################
+# Deferred batch jobs
+######################
+
+def _job_manifest_path(job_name: str) -> str:
+    return os.path.join(GEMINI_JOBS_DIR, f"{job_name.replace('/', '_')}.json")
+
+
+def submit_batch_job(requests: list[tuple[str, str]], display_name: Optional[str] = None) -> str:
+    """
+    Queues (cache key, build_prompt() prompt) extractions as a Gemini batch job and returns the job name.
+    - Batch jobs run asynchronously on Google's side (typically within hours) at a lower price.
+    - The keys are kept in a local manifest, since the job returns answers in request order only.
+    """
+    client = get_gemini_client()
+    job = client.batches.create(
+        model=GEMINI_MODEL,
+        src=[
+            {
+                "contents": [{"parts": [{"text": prompt}], "role": "user"}],
+                "config": {"system_instruction": SYSTEM_INSTRUCTION},
+            }
+            for _, prompt in requests
+        ],
+        config={"display_name": display_name or f"extraction-{int(time.time())}"},
+    )
+    os.makedirs(GEMINI_JOBS_DIR, exist_ok=True)
+    with open(_job_manifest_path(job.name), "w", encoding="utf-8") as f:
+        json.dump({"name": job.name, "keys": [request[0] for request in requests], "submitted_at": time.time()}, f)
+    logger.info(f"Submitted Gemini batch job {job.name} with {len(requests)} documents.")
+    return job.name
+
+
+def pending_batch_jobs() -> list[str]:
+    """Names of submitted jobs whose results have not been collected yet."""
+    if not os.path.isdir(GEMINI_JOBS_DIR):
+        return []
+    names = []
+    for entry in sorted(os.listdir(GEMINI_JOBS_DIR)):
+        if entry.endswith(".json"):
+            with open(os.path.join(GEMINI_JOBS_DIR, entry), encoding="utf-8") as f:
+                names.append(json.load(f)["name"])
+    return names
+
+
+def collect_batch_job(job_name: str) -> Optional[dict[str, Union[dict, Exception]]]:
+    """
+    Returns key -> normalized fields (or the exception) once the job has finished, else None.
+    The manifest is removed after a finished job has been read, so results are collected once.
+    """
+    job = get_gemini_client().batches.get(name=job_name)
+    state = getattr(job.state, "name", str(job.state))
+    if state not in FINISHED_JOB_STATES:
+        logger.info(f"Gemini batch job {job_name} is still {state}.")
+        return None
+
+    path = _job_manifest_path(job_name)
+    with open(path, encoding="utf-8") as f:
+        keys = json.load(f)["keys"]
+
+    responses = (job.dest.inlined_responses or []) if job.dest else []
+    results: dict[str, Union[dict, Exception]] = {}
+    for i, key in enumerate(keys):
+        item = responses[i] if i < len(responses) else None
+        try:
+            if item is None:
+                raise RuntimeError(f"Batch job ended in {state} without an answer")
+            if item.error:
+                raise RuntimeError(f"Batch request failed: {item.error.message}")
+            results[key] = _parse_and_normalize(item.response)
+        except Exception as e:
+            results[key] = e
 
+    os.remove(path)
+    failed = sum(isinstance(r, Exception) for r in results.values())
+    logger.info(f"Collected Gemini batch job {job_name} ({state}): {len(results) - failed} ok, {failed} failed.")
+    return results
@@ -0,0 +1,205 @@
+import os
+import shutil
+from typing import Optional
+from sqlalchemy import select, update
+from app.database import chunked, get_session
+from app.models import Chunk
+from app.embeddings import EmbeddingBackend, embedder_for, get_embedder
+from app.vector_store import VectorStore, get_vector_store
+from app.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Chunks embedded, written to the vector store and stamped in the database together.
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "256"))
+# The IVF index is (re)built once the store has this many rows and a fifth of them aren't covered yet.
+VECTOR_IVF_MIN_ROWS = int(os.getenv("VECTOR_IVF_MIN_ROWS", "50000"))
+# Share of tombstoned rows that triggers a compaction after indexing.
+VECTOR_COMPACT_RATIO = float(os.getenv("VECTOR_COMPACT_RATIO", "0.2"))
+# Chunks per embed() call when re-embedding; large batches keep the embedder's matrix work efficient.
+REEMBED_BATCH_SIZE = int(os.getenv("REEMBED_BATCH_SIZE", "2048"))
+
+
+def _maintain(store: VectorStore) -> None:
+    """Compacts away tombstones and keeps the IVF index covering most rows."""
+    stats = store.stats()
+    if stats["rows"] and (stats["rows"] - stats["live"]) / stats["rows"] > VECTOR_COMPACT_RATIO:
+        store.compact()
+        stats = store.stats()
+    if stats["live"] >= VECTOR_IVF_MIN_ROWS and stats["ivf_rows"] < 0.8 * stats["rows"]:
+        store.build_ivf()
+
+
+def index_chunks(limit: Optional[int] = None, store: Optional[VectorStore] = None,
+                 embedder: Optional[EmbeddingBackend] = None) -> int:
+    """
+    Embeds the chunks that have no embedding yet and appends them to the vector store.
+    - Each batch's vectors are written before its chunks are stamped with embedding_model/version,
+      so an interrupted run re-embeds at most one batch (the new rows replace the old ones).
+    - Afterwards the store is compacted and its IVF index rebuilt when they have fallen behind.
+    - When the store holds another model's vectors (EMBEDDING_MODEL changed), new chunks are
+      embedded with the store's model so they stay searchable, and a warning asks for
+      reembed_chunks(), which moves them over with the rest.
+    Returns the number of chunks embedded.
+    """
+    store = store if store is not None else get_vector_store()
+    embedder = embedder if embedder is not None else get_embedder()
+    if len(store) and (store.model, store.version) != (embedder.model, embedder.version):
+        logger.warning(
+            f"Vector store holds {store.model} v{store.version} vectors but the embedder is "
+            f"{embedder.model} v{embedder.version}; run reembed_chunks() to migrate. "
+            f"Embedding new chunks with {store.model} v{store.version} until then."
+        )
+        embedder = embedder_for(store.model, store.version, store.dim)
+    embedded = last_id = 0
+    while limit is None or embedded < limit:
+        size = INDEX_BATCH_SIZE if limit is None else min(INDEX_BATCH_SIZE, limit - embedded)
+        with get_session() as session:
+            rows = session.execute(
+                select(Chunk.id, Chunk.chunk_text)
+                .where(Chunk.embedding_model.is_(None), Chunk.id > last_id)
+                .order_by(Chunk.id)
+                .limit(size)
+            ).all()
+            if not rows:
+                break
+            ids = [chunk_id for chunk_id, _ in rows]
+            last_id = ids[-1]
+            store.append(ids, embedder.embed([text for _, text in rows]), embedder.model, embedder.version)
+            session.execute(
+                update(Chunk)
+                .where(Chunk.id.in_(ids))
+                .values(embedding_model=embedder.model, embedding_version=embedder.version)
+            )
+        embedded += len(rows)
+        logger.info(f"Embedded {embedded} chunks (up to chunk id={last_id}).")
+
+    if embedded:
+        _maintain(store)
+    logger.info(f"Indexing finished: {embedded} chunks embedded, {len(store)} in the vector store.")
+    return embedded
+
+
+def _staging_store(store: VectorStore, embedder: EmbeddingBackend) -> VectorStore:
+    """Store the new vectors are built in next to `store`; a leftover for another target is discarded."""
+    path = os.path.join(store.root, "staging")
+    staging = VectorStore(path, dtype=store.dtype)
+    if staging.stats()["rows"] and (staging.model, staging.version, staging.dim) != \
+            (embedder.model, embedder.version, embedder.dim):
+        logger.info(f"Discarding staged {staging.model} v{staging.version} vectors.")
+        shutil.rmtree(path, ignore_errors=True)
+        staging = VectorStore(path, dtype=store.dtype)
+    return staging
+
+
+def _stale_chunk_ids(session, model: Optional[str], version: Optional[str], after_id: int, size: int) -> list[int]:
+    """Next ids embedded under (model, version), in id order along ix_chunks_embedding."""
+    return session.scalars(
+        select(Chunk.id)
+        .where(
+            Chunk.embedding_model == model if model is not None else Chunk.embedding_model.is_(None),
+            Chunk.embedding_version == version if version is not None else Chunk.embedding_version.is_(None),
+            Chunk.id > after_id,
+        )
+        .order_by(Chunk.id)
+        .limit(size)
+    ).all()
+
+
+def _stamp(session, ids, embedder: EmbeddingBackend) -> None:
+    for batch in chunked([int(i) for i in ids]):
+        session.execute(
+            update(Chunk)
+            .where(Chunk.id.in_(batch))
+            .values(embedding_model=embedder.model, embedding_version=embedder.version)
+        )
+
+
+def reembed_chunks(limit: Optional[int] = None, store: Optional[VectorStore] = None,
+                   embedder: Optional[EmbeddingBackend] = None) -> int:
+    """
+    Re-embeds the chunks whose embedding_model/embedding_version differ from the configured embedder.
+    - Stale chunks are read per (model, version) in id order along ix_chunks_embedding and embedded
+      REEMBED_BATCH_SIZE at a time.
+    - While the vector store already holds the target model, their rows are replaced in place.
+    - After a model change, the new vectors are built in a staging store next to the live one;
+      searches keep using the old vectors (and the old model for queries) until every chunk is
+      done and the staging store is swapped in with one manifest rename.
+    - Progress survives interruptions: chunks already in the destination store are not embedded
+      again, and chunks are only stamped with the new version once their vectors are live.
+    Returns the number of chunks embedded; a run stopped by `limit` resumes where it left off.
+    """
+    store = store if store is not None else get_vector_store()
+    embedder = embedder if embedder is not None else get_embedder()
+    target = (embedder.model, embedder.version)
+    in_place = not len(store) or (store.model, store.version) == target
+    destination = store if in_place else _staging_store(store, embedder)
+
+    with get_session() as session:
+        groups = session.execute(
+            select(Chunk.embedding_model, Chunk.embedding_version).distinct()
+        ).all()
+    # A staging store must end up complete, so there every chunk is taken, whatever its stamp
+    stale = [tuple(group) for group in groups if not in_place or tuple(group) != target]
+    logger.info(f"Re-embedding chunks of {stale} to {embedder.model} v{embedder.version} "
+                f"({'in place' if in_place else 'in a staging store'}).")
+
+    embedded = 0
+    finished = True
+    for model, version in stale:
+        last_id = 0
+        while True:
+            if limit is not None and embedded >= limit:
+                finished = False
+                break
+            with get_session() as session:
+                ids = _stale_chunk_ids(session, model, version, last_id, REEMBED_BATCH_SIZE)
+                if not ids:
+                    break
+                last_id = ids[-1]
+                # Vectors written by an interrupted run are kept
+                todo = [i for i, done in zip(ids, destination.contains(ids)) if not done]
+                if limit is not None:
+                    todo = todo[:limit - embedded]
+                if todo:
+                    texts = dict(session.execute(select(Chunk.id, Chunk.chunk_text).where(Chunk.id.in_(todo))).all())
+                    destination.append(todo, embedder.embed([texts[i] for i in todo]), *target)
+                    embedded += len(todo)
+                if in_place:
+                    _stamp(session, [i for i, live in zip(ids, destination.contains(ids)) if live], embedder)
+            logger.info(f"Re-embedded {embedded} chunks (up to chunk id={last_id} of {model} v{version}).")
+        if not finished:
+            break
+
+    if not in_place and finished:
+        _maintain(destination)
+        store.swap_in(destination)
+        with get_session() as session:
+            _stamp(session, store.chunk_ids(), embedder)
+    elif embedded:
+        _maintain(destination)
+    logger.info(f"Re-embedding {'finished' if finished else 'paused'}: {embedded} chunks embedded.")
+    return embedded
+
+
+def search_chunks(query: str, k: int = 10, store: Optional[VectorStore] = None,
+                  embedder: Optional[EmbeddingBackend] = None) -> list[tuple[int, float]]:
+    """
+    Chunks closest to a free-text query as [(chunk_id, score)], best first.
+    The query is embedded with the model of the vectors being served, which is the old one
+    while a re-embedding is still being staged.
+    """
+    store = store if store is not None else get_vector_store()
+    store.refresh()
+    if embedder is None:
+        embedder = embedder_for(store.model, store.version, store.dim)
+    return store.search(embedder.embed([query]), k=k)[0]
+
+
+def similar_chunks(chunk_id: int, k: int = 10, store: Optional[VectorStore] = None) -> list[tuple[int, float]]:
+    """Passages most similar to an indexed chunk (itself excluded) as [(chunk_id, score)]."""
+    store = store if store is not None else get_vector_store()
+    vector = store.refresh().get([chunk_id])
+    if not vector.any():
+        return []
+    return store.search(vector, k=k, exclude={chunk_id})[0]
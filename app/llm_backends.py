@@ -0,0 +1,260 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
+from dotenv import load_dotenv
+from logger_config import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+# Which backend answers extraction prompts: "gemini" (the real API) or "fake" (local stand-in).
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+
+# Fake backend behaviour. Latency is log-normal around the median; rates are per request.
+FAKE_LATENCY_MEDIAN_MS = float(os.getenv("FAKE_LLM_LATENCY_MEDIAN_MS", "800"))
+FAKE_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.4"))
+FAKE_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_429_RATE", "0"))
+FAKE_MALFORMED_RATE = float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0"))
+FAKE_SEED = os.getenv("FAKE_LLM_SEED")
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    total_tokens: Optional[int] = None
+
+
+class LLMBackendError(Exception):
+    """Backend-neutral API error; `code` is the HTTP status so the rate governor can classify it."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class LLMBackend(ABC):
+    """
+    What the extraction code needs from a model: one prompt in, text out.
+    - generate/agenerate send `prompt` with the backend's system instruction.
+    - Errors carrying an HTTP status (`.code`) are treated as quota/overload by the governor.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def generate(self, prompt: str) -> LLMResponse:
+        ...
+
+    @abstractmethod
+    async def agenerate(self, prompt: str) -> LLMResponse:
+        ...
+
+    async def aclose(self) -> None:
+        pass
+
+
+##################
+# Gemini
+##################
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def _api_key() -> str:
+    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    if not GEMINI_API_KEY:
+        raise EnvironmentError("Missing GEMINI_API_KEY in environment variables.")
+    return GEMINI_API_KEY
+
+
+def get_gemini_client():
+    """Returns the process-wide Gemini client, so connections are reused across calls."""
+    global _shared_client
+    from google import genai
+
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = genai.Client(api_key=_api_key())
+        return _shared_client
+
+
+class GeminiBackend(LLMBackend):
+    """
+    google-genai generate_content.
+    - shared=True reuses the process-wide client (sync calls).
+    - shared=False opens a client of its own, since the async transport is bound to
+      the event loop it was first used on; aclose() releases it.
+    """
+
+    name = "gemini"
+
+    def __init__(self, model: str, system_instruction: str, shared: bool = True):
+        from google import genai
+        from google.genai import types
+
+        self.model = model
+        self.config = types.GenerateContentConfig(system_instruction=system_instruction)
+        self.shared = shared
+        self.client = get_gemini_client() if shared else genai.Client(api_key=_api_key())
+
+    @staticmethod
+    def _wrap(response) -> LLMResponse:
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(response.text or "", getattr(usage, "total_token_count", None))
+
+    def generate(self, prompt: str) -> LLMResponse:
+        return self._wrap(self.client.models.generate_content(model=self.model, contents=prompt, config=self.config))
+
+    async def agenerate(self, prompt: str) -> LLMResponse:
+        response = await self.client.aio.models.generate_content(model=self.model, contents=prompt, config=self.config)
+        return self._wrap(response)
+
+    async def aclose(self) -> None:
+        if not self.shared:
+            await self.client.aio.aclose()
+
+
+##################
+# Fake
+##################
+
+_DOCUMENT_ID = re.compile(r"### Document (\S+)")
+_REQUESTED_FIELDS = re.compile(r"with these fields:\s*(.+?)\n\s*\n", re.S)
+_FAKE_VALUES = {
+    "title": "Fake Appellant v. The State",
+    "doc_type": "Judgment",
+    "jurisdiction": "Pakistan",
+    "court": "Supreme Court of Pakistan",
+    "authority_level": "Apex Court",
+    "legal_status": "Reported",
+    "tags": "criminal, appeal",
+}
+
+
+# Shared by every FakeBackend built without a seed of its own.
+_fake_rng = random.Random(int(FAKE_SEED) if FAKE_SEED else None)
+
+
+class FakeBackend(LLMBackend):
+    """
+    Local stand-in for load and CI tests; needs no network or API key.
+    - Answers are schema-valid JSON derived from a hash of the prompt, so the same
+      prompt always gets the same answer (packed prompts get one object per document).
+    - Latency is log-normal (median/sigma); 5xx errors, 429s and malformed output are
+      injected at the configured rates.
+    - Without a seed of its own it draws from one RNG per process (seeded by FAKE_LLM_SEED),
+      so backends built for successive batches continue the sequence instead of replaying it.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_median_ms: float = FAKE_LATENCY_MEDIAN_MS,
+        latency_sigma: float = FAKE_LATENCY_SIGMA,
+        error_rate: float = FAKE_ERROR_RATE,
+        rate_limit_rate: float = FAKE_RATE_LIMIT_RATE,
+        malformed_rate: float = FAKE_MALFORMED_RATE,
+        seed: Optional[int] = None,
+    ):
+        self.latency_median_ms = latency_median_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.rng = random.Random(seed) if seed is not None else _fake_rng
+        self.calls = 0
+
+    def _latency(self) -> float:
+        if self.latency_median_ms <= 0:
+            return 0.0
+        return self.rng.lognormvariate(math.log(self.latency_median_ms / 1000.0), self.latency_sigma)
+
+    @staticmethod
+    def _document(seed: str, doc_id: Optional[str] = None) -> dict:
+        digest = hashlib.sha256(seed.encode("utf-8")).hexdigest()
+        year = 1950 + int(digest[:4], 16) % 75
+        document = dict(_FAKE_VALUES)
+        document.update({
+            "reference_id": f"FAKE-{digest[:10]}",
+            "citation": f"{year} SCMR {int(digest[4:8], 16) % 2000 + 1}",
+            "date": f"{year}-{int(digest[8:10], 16) % 12 + 1:02d}-{int(digest[10:12], 16) % 28 + 1:02d}",
+        })
+        if doc_id is not None:
+            document["id"] = doc_id
+        return document
+
+    def _answer(self, prompt: str) -> LLMResponse:
+        self.calls += 1
+        roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            raise LLMBackendError(429, "RESOURCE_EXHAUSTED (injected)")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise LLMBackendError(503, "UNAVAILABLE (injected)")
+
+        ids = _DOCUMENT_ID.findall(prompt)
+        if ids:
+            body = json.dumps([self._document(f"{prompt}|{doc_id}", doc_id) for doc_id in ids])
+        else:
+            document = self._document(prompt)
+            requested = _REQUESTED_FIELDS.search(prompt)
+            if requested:
+                # Narrowed prompts (fast path) only ask for some fields
+                wanted = set(re.findall(r"[a-z_]+", requested.group(1)))
+                document = {k: v for k, v in document.items() if k in wanted}
+            body = json.dumps(document)
+
+        if self.rng.random() < self.malformed_rate:
+            body = body[: max(1, len(body) // 2)]
+        return LLMResponse(body, total_tokens=len(prompt) // 4 + len(body) // 4)
+
+    def generate(self, prompt: str) -> LLMResponse:
+        time.sleep(self._latency())
+        return self._answer(prompt)
+
+    async def agenerate(self, prompt: str) -> LLMResponse:
+        await asyncio.sleep(self._latency())
+        return self._answer(prompt)
+
+
+_shared_backend: Optional[LLMBackend] = None
+_shared_backend_lock = threading.Lock()
+
+
+def create_backend(model: str, system_instruction: str, name: Optional[str] = None, shared: bool = False) -> LLMBackend:
+    """Builds the backend selected by `name` (default LLM_BACKEND)."""
+    name = (name or LLM_BACKEND).lower()
+    if name == "gemini":
+        return GeminiBackend(model, system_instruction, shared=shared)
+    if name == "fake":
+        logger.info(f"Using the fake LLM backend (median latency {FAKE_LATENCY_MEDIAN_MS:.0f}ms, "
+                    f"error rate {FAKE_ERROR_RATE}, 429 rate {FAKE_RATE_LIMIT_RATE}).")
+        return FakeBackend()
+    raise ValueError(f"Unknown LLM backend '{name}', expected 'gemini' or 'fake'")
+
+
+def get_backend(model: str, system_instruction: str) -> LLMBackend:
+    """Process-wide backend for synchronous calls."""
+    global _shared_backend
+    with _shared_backend_lock:
+        if _shared_backend is None:
+            _shared_backend = create_backend(model, system_instruction, shared=True)
+        return _shared_backend
+
+
+def set_backend(backend: Optional[LLMBackend]) -> None:
+    """Swaps the process-wide backend (e.g. a configured FakeBackend in benchmarks); None resets it."""
+    global _shared_backend
+    with _shared_backend_lock:
+        _shared_backend = backend
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, or_, select, update
+
+from app.database import get_session, insert_ignore
+from app.gemini import CACHE_MODEL, PROMPT_VERSION
+from app.logger_config import get_logger
+from app.models import LlmExtraction
+
+logger = get_logger(__name__)
+
+# use: read and write the cache; refresh: ignore cached answers but overwrite them;
+# bypass: leave the cache alone entirely.
+CACHE_MODES = ("use", "refresh", "bypass")
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "use").lower()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+# Process-wide counters; the per-row hit_count keeps the long-term picture.
+stats = CacheStats()
+
+
+def resolve_mode(mode: Optional[str] = None) -> str:
+    mode = (mode or LLM_CACHE_MODE).lower()
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown LLM cache mode '{mode}', expected one of {CACHE_MODES}")
+    return mode
+
+
+def lookup_many(keys: Iterable[str], mode: Optional[str] = None) -> dict[str, dict]:
+    """
+    Returns cached extractions for the given keys (missing keys are absent).
+    - Hits bump the per-row hit_count/last_hit_at and the process counters.
+    - In refresh/bypass mode nothing is read and every key counts as a miss.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    if resolve_mode(mode) != "use":
+        stats.misses += len(keys)
+        return {}
+
+    with get_session() as session:
+        rows = session.execute(
+            select(LlmExtraction.cache_key, LlmExtraction.result)
+            .where(LlmExtraction.cache_key.in_(keys))
+        ).all()
+        found = {key: dict(result) for key, result in rows}
+        if found:
+            session.execute(
+                update(LlmExtraction)
+                .where(LlmExtraction.cache_key.in_(list(found)))
+                .values(hit_count=LlmExtraction.hit_count + 1, last_hit_at=datetime.utcnow())
+            )
+
+    stats.hits += len(found)
+    stats.misses += len(keys) - len(found)
+    return found
+
+
+def cached_keys(keys: Iterable[str], mode: Optional[str] = None) -> set[str]:
+    """
+    Which of the keys have a cached extraction, without reading the answers or counting hits
+    (e.g. to leave them out of a batch job; the hit is counted when the answer is used).
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys or resolve_mode(mode) != "use":
+        return set()
+    with get_session() as session:
+        return set(session.scalars(select(LlmExtraction.cache_key).where(LlmExtraction.cache_key.in_(keys))))
+
+
+def store_many(results: dict[str, dict], mode: Optional[str] = None) -> None:
+    """Saves fresh extractions; refresh mode replaces rows that already exist."""
+    mode = resolve_mode(mode)
+    if not results or mode == "bypass":
+        return
+    rows = [
+        {
+            "cache_key": key,
+            "model": CACHE_MODEL,
+            "prompt_version": PROMPT_VERSION,
+            "result": result,
+            "hit_count": 0,
+        }
+        for key, result in results.items()
+    ]
+    with get_session() as session:
+        if mode == "refresh":
+            session.execute(delete(LlmExtraction).where(LlmExtraction.cache_key.in_(list(results))))
+        insert_ignore(session, LlmExtraction, rows, ["cache_key"])
+    stats.stores += len(rows)
+
+
+def purge_stale() -> int:
+    """Deletes entries made with another prompt version or model; they can never be hit again."""
+    with get_session() as session:
+        deleted = session.execute(
+            delete(LlmExtraction).where(
+                or_(LlmExtraction.prompt_version != PROMPT_VERSION, LlmExtraction.model != CACHE_MODEL)
+            )
+        ).rowcount
+    logger.info(f"Purged {deleted} stale LLM cache entries.")
+    return deleted
+
+
+def log_stats() -> None:
+    logger.info(
+        f"LLM cache: {stats.hits} hits, {stats.misses} misses, "
+        f"{stats.stores} stored ({stats.hit_rate:.0%} hit rate)"
+    )
@@ -1,5 +1,8 @@
+from .text_blobs import TextBlob
 from .documents import Document
 from .chunks import Chunk
 from .metadata_chunks import MetadataChunk
 from .raw_documents import RawDocument
-from .metadata_raw import MetadataRaw
\ No newline at end of file
+from .metadata_raw import MetadataRaw
+from .llm_extractions import LlmExtraction
+from .raw_document_leases import RawDocumentLease
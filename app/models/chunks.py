@@ -2,7 +2,7 @@ from typing import Optional
 from app.models.documents import Document
 from app.database import Base
 from sqlalchemy.types import Integer, String, Text, DateTime
-from sqlalchemy import ForeignKey, UniqueConstraint, func
+from sqlalchemy import ForeignKey, Index, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
 
@@ -22,7 +22,8 @@ class Chunk(Base):
 
     char_end: Mapped[int] = mapped_column(Integer, nullable=False)
 
-    chunk_text: Mapped[str] = mapped_column(Text, nullable=False)
+    # Deferred: loaded on first access, so listing chunks doesn't pull their text.
+    chunk_text: Mapped[str] = mapped_column(Text, nullable=False, deferred=True)
 
     embedding_model: Mapped[Optional[str]] = mapped_column(String(100))
 
@@ -50,4 +51,6 @@ class Chunk(Base):
 
     __table_args__ = (
         UniqueConstraint('document_id', 'id', name='uix_document_id'),
+        # Chunks of one (model, version) in id order, so stale embeddings are found without a scan.
+        Index('ix_chunks_embedding', 'embedding_model', 'embedding_version', 'id'),
     )
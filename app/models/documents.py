@@ -1,8 +1,9 @@
 from app.database import Base
-from sqlalchemy import DateTime, String, Integer, func, Text
+from app.models.text_blobs import BlobText, TextBlob
+from sqlalchemy import DateTime, String, Integer, ForeignKey, Index, func, Text, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 if TYPE_CHECKING:
     from app.models.chunks import Chunk
@@ -43,7 +44,15 @@ class Document(Base):
 
     legal_status: Mapped[str] = mapped_column(String(255), nullable=False)
     
-    raw_content: Mapped[str] = mapped_column(Text, nullable=False)
+    # Shares the text_blobs row of the RawDocument it was built from.
+    raw_content_sha256: Mapped[str] = mapped_column(
+        String(64), ForeignKey("text_blobs.sha256"), nullable=False, index=True
+    )
+
+    raw_content = BlobText("raw_content_sha256", "raw_content_blob")
+
+    # Set once the chunker has split the document (even into no chunks); cleared by reset_chunks.
+    chunked_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime, server_default=func.now()
@@ -56,3 +65,18 @@ class Document(Base):
     chunks: Mapped[list["Chunk"]] = relationship(
         "Chunk", back_populates="original_document", cascade="all, delete-orphan"
     )
+
+    raw_content_blob: Mapped["TextBlob"] = relationship("TextBlob", viewonly=True)
+
+    ################
+    # Constraints
+    ################
+
+    # Only documents still to be chunked are indexed, so the chunker's queue stays small.
+    __table_args__ = (
+        Index(
+            "ix_documents_unchunked", "id",
+            postgresql_where=text("chunked_at IS NULL"),
+            sqlite_where=text("chunked_at IS NULL"),
+        ),
+    )
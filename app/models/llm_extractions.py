@@ -0,0 +1,31 @@
+from app.database import Base
+from sqlalchemy import JSON, DateTime, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from typing import Optional
+
+
+class LlmExtraction(Base):
+    """
+    Cached result of one Gemini field extraction.
+    - `cache_key` hashes everything the answer depends on: the full prompt
+      (payload + truncated PDF text), the prompt version and the model.
+    - prompt_version/model are kept as columns so stale rows can be purged.
+    """
+    __tablename__ = "llm_extractions"
+
+    cache_key: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+
+    prompt_version: Mapped[str] = mapped_column(String(20), nullable=False, index=True)
+
+    result: Mapped[dict] = mapped_column(JSON, nullable=False)
+
+    hit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    last_hit_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now()
+    )
@@ -0,0 +1,27 @@
+from app.database import Base
+from sqlalchemy import DateTime, ForeignKey, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+
+
+class RawDocumentLease(Base):
+    """
+    A worker's claim on a pending RawDocument.
+    - At most one live lease per document (the primary key); workers extend
+      `expires_at` while they hold it.
+    - An expired lease belongs to a worker that died or hung; the document is
+      free to be claimed again.
+    """
+    __tablename__ = "raw_document_leases"
+
+    raw_document_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("raw_documents.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    worker_id: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
+
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now()
+    )
@@ -1,7 +1,15 @@
 from app.database import Base
-from sqlalchemy import DateTime, String, Integer, Text, ForeignKey, func
+from app.models.text_blobs import BlobText, TextBlob
+from sqlalchemy import DateTime, String, Integer, Text, ForeignKey, Index, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
+from typing import Optional
+
+# Processing states of a RawDocument in the analyzer's work queue.
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_DUPLICATE = "duplicate"
+STATUS_FAILED = "failed"
 
 
 class RawDocument(Base):
@@ -23,7 +31,25 @@ class RawDocument(Base):
 
     pdf_uri: Mapped[str] = mapped_column(String(1000), nullable=False)
 
-    pdf_raw: Mapped[str] = mapped_column(Text, nullable=False)
+    # Extracted text lives in text_blobs; `pdf_raw` reads/writes it transparently.
+    pdf_raw_sha256: Mapped[str] = mapped_column(
+        String(64), ForeignKey("text_blobs.sha256"), nullable=False, index=True
+    )
+
+    pdf_raw = BlobText("pdf_raw_sha256", "pdf_raw_blob")
+
+    # pending -> done/duplicate, or failed once attempts run out
+    status: Mapped[str] = mapped_column(
+        String(20), nullable=False, default=STATUS_PENDING, server_default=STATUS_PENDING
+    )
+
+    attempts: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime, server_default=func.now()
@@ -38,3 +64,17 @@ class RawDocument(Base):
         back_populates="raw_documents"
     )
 
+    pdf_raw_blob: Mapped["TextBlob"] = relationship("TextBlob", viewonly=True)
+
+    ################
+    # Constraints
+    ################
+
+    # Only pending rows are indexed, so the work queue stays small however much is done.
+    __table_args__ = (
+        Index(
+            "ix_raw_documents_pending", "id",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
@@ -0,0 +1,117 @@
+from app.database import Base, SessionLocal, insert_ignore
+from sqlalchemy import DateTime, String, Text, event, func
+from sqlalchemy.orm import Mapped, mapped_column, selectinload
+from datetime import datetime
+from typing import Optional
+import hashlib
+
+
+class TextBlob(Base):
+    """
+    Content-addressed store for large extracted texts.
+    - Rows are keyed by the sha256 of the text, so identical PDFs are stored once
+      no matter how many RawDocuments/Documents point at them.
+    - Rows are immutable; models reference them through a BlobText attribute.
+    - `content` is deferred: it is only read when the text is actually used.
+    """
+    __tablename__ = "text_blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    content: Mapped[str] = mapped_column(Text, nullable=False, deferred=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now()
+    )
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BlobText:
+    """
+    Model attribute whose text lives in text_blobs.
+    - Assigning text records its hash in `hash_attr`; the blob row itself is
+      written (insert-or-ignore) just before the owning row is flushed, once:
+      later flushes of the row skip it until new text is assigned.
+    - Reading returns the assigned text, or loads it through `blob_attr` on first access.
+    - Code that reads the text of many rows should load it up front with
+      `.options(Model.attr.loader())` (one IN query per batch instead of one per row).
+    """
+
+    def __init__(self, hash_attr: str, blob_attr: str):
+        self.hash_attr = hash_attr
+        self.blob_attr = blob_attr
+
+    def __set_name__(self, owner, name: str):
+        self.owner = owner
+        self.pending_attr = f"_{name}_text"
+        self.written_attr = f"_{name}_written"
+        owner.__blob_texts__ = getattr(owner, "__blob_texts__", ()) + (self,)
+
+    def __get__(self, obj, owner=None) -> Optional[str]:
+        if obj is None:
+            return self
+        text = obj.__dict__.get(self.pending_attr)
+        if text is not None:
+            return text
+        blob = getattr(obj, self.blob_attr)
+        return blob.content if blob is not None else None
+
+    def __set__(self, obj, text: str):
+        obj.__dict__[self.pending_attr] = text
+        setattr(obj, self.hash_attr, TextBlob.hash_text(text))
+
+    def loader(self):
+        """Loader option that fetches the blobs, text included, of every row a query returns."""
+        return selectinload(getattr(self.owner, self.blob_attr)).undefer(TextBlob.content)
+
+    def pending(self, obj) -> Optional[tuple[str, str]]:
+        """(sha256, text) assigned to `obj` and not yet written."""
+        text = obj.__dict__.get(self.pending_attr)
+        if text is None:
+            return None
+        sha256 = getattr(obj, self.hash_attr)
+        if obj.__dict__.get(self.written_attr) == sha256:
+            return None
+        return sha256, text
+
+    def mark_written(self, obj, sha256: Optional[str]) -> None:
+        """Records that the blob `sha256` of `obj` is in the database (None: it may not be any more)."""
+        obj.__dict__[self.written_attr] = sha256
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _write_pending_blobs(session, flush_context, instances):
+    """Writes blobs for new/changed rows once per flush, before the rows that reference them."""
+    blobs, written = {}, []
+    for obj in list(session.new) + list(session.dirty):
+        for attr in getattr(type(obj), "__blob_texts__", ()):
+            pending = attr.pending(obj)
+            if pending:
+                blobs[pending[0]] = pending[1]
+                written.append((attr, obj, pending[0]))
+    if not blobs:
+        return
+    rows = [{"sha256": sha256, "content": text} for sha256, text in blobs.items()]
+    insert_ignore(session, TextBlob, rows, ["sha256"])
+    for attr, obj, sha256 in written:
+        attr.mark_written(obj, sha256)
+    session.info.setdefault("written_blobs", []).extend(written)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _forget_written_blobs(session):
+    session.info.pop("written_blobs", None)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _unmark_rolled_back_blobs(session, previous_transaction):
+    """
+    Blobs inserted in a rolled-back transaction or savepoint are gone; the next flush writes them again.
+    Every blob of the session is unmarked, including ones outside the savepoint: writing those once
+    more is a no-op insert, while keeping a lost one marked would leave its rows pointing at nothing.
+    """
+    for attr, obj, _ in session.info.pop("written_blobs", []):
+        attr.mark_written(obj, None)
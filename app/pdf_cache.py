@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "true").lower() == "true"
+CACHE_DIR = os.getenv("PDF_CACHE_DIR", ".cache/pdfs")
+CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Seconds an entry is served without revalidating against the server (0 = always revalidate).
+CACHE_MAX_AGE = int(os.getenv("PDF_CACHE_MAX_AGE", "0"))
+CACHE_OFFLINE = os.getenv("PDF_CACHE_OFFLINE", "false").lower() == "true"
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+class CacheMissError(LookupError):
+    """Raised in offline mode when a URL has no cached copy."""
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    sha256: str
+    size: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+class PdfCache:
+    """
+    On-disk PDF cache keyed by URL.
+    - Bodies are stored once per sha256 under blobs/<aa>/<sha256>.pdf, so mirrors
+      serving the same judgment under different URLs share one file.
+    - A small SQLite index maps URL -> blob plus the ETag/Last-Modified validators.
+    - When the blobs exceed max_bytes, least recently used URLs are evicted.
+    - In offline mode the network is never touched; misses raise CacheMissError.
+    """
+
+    def __init__(
+        self,
+        root: str = CACHE_DIR,
+        max_bytes: int = CACHE_MAX_BYTES,
+        max_age: int = CACHE_MAX_AGE,
+        offline: bool = CACHE_OFFLINE,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.offline = offline
+        self._lock = threading.Lock()
+        # Lockfiles of the partial downloads this instance owns -> their open descriptors;
+        # guarded by _partial_locks_lock, as downloads claim and release from many threads.
+        self._partial_locks: dict[str, int] = {}
+        self._partial_locks_lock = threading.Lock()
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(root, "index.db"), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_sha256 ON entries (sha256)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_last_access ON entries (last_access)")
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "blobs", sha256[:2], f"{sha256}.pdf")
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Returns the entry for a URL, dropping it if its blob has gone missing."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, sha256, size, etag, last_modified, fetched_at FROM entries WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            entry = CacheEntry(*row)
+            if not os.path.exists(self.blob_path(entry.sha256)):
+                logger.warning(f"Cached blob missing for {url}, dropping cache entry.")
+                self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                return None
+            return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return self.max_age > 0 and time.time() - entry.fetched_at < self.max_age
+
+    @staticmethod
+    def conditional_headers(entry: CacheEntry) -> dict[str, str]:
+        """Validators to send when revalidating a cached entry."""
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def open(self, entry: CacheEntry) -> BinaryIO:
+        """Opens the cached body for reading; the caller closes it."""
+        f = open(self.blob_path(entry.sha256), "rb")
+        self.touch(entry.url)
+        return f
+
+    def touch(self, url: str, revalidated: bool = False) -> None:
+        """Marks an entry as recently used (and, after a 304, as freshly validated)."""
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self._conn.execute(
+                    "UPDATE entries SET last_access = ?, fetched_at = ? WHERE url = ?",
+                    (now, now, url),
+                )
+            else:
+                self._conn.execute("UPDATE entries SET last_access = ? WHERE url = ?", (now, url))
+
+    def store(self, url: str, source: BinaryIO, etag: Optional[str], last_modified: Optional[str]) -> CacheEntry:
+        """
+        Copies the body from `source` into the cache (once per sha256) and points the URL at it.
+        The body is hashed while it is copied, so it is never held in memory as a whole.
+        """
+        tmp_path = os.path.join(self.root, "blobs", f".{os.getpid()}.{threading.get_ident()}.tmp")
+        hasher = hashlib.sha256()
+        size = 0
+        source.seek(0)
+        with open(tmp_path, "wb") as f:
+            for block in iter(lambda: source.read(COPY_BLOCK_SIZE), b""):
+                hasher.update(block)
+                f.write(block)
+                size += len(block)
+        source.seek(0)
+        return self._commit(url, tmp_path, hasher.hexdigest(), size, etag, last_modified)
+
+    def adopt(self, url: str, path: str, etag: Optional[str], last_modified: Optional[str]) -> CacheEntry:
+        """Moves a finished file (e.g. a completed partial download) into the cache without copying it."""
+        hasher = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b""):
+                hasher.update(block)
+                size += len(block)
+        return self._commit(url, path, hasher.hexdigest(), size, etag, last_modified)
+
+    def _commit(
+        self, url: str, file_path: str, digest: str, size: int, etag: Optional[str], last_modified: Optional[str]
+    ) -> CacheEntry:
+        """Renames a hashed file into blobs/ and points the URL at it."""
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            os.remove(file_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(file_path, path)
+
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT sha256 FROM entries WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                """
+                INSERT INTO entries (url, sha256, size, etag, last_modified, fetched_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    sha256 = excluded.sha256, size = excluded.size, etag = excluded.etag,
+                    last_modified = excluded.last_modified, fetched_at = excluded.fetched_at,
+                    last_access = excluded.last_access
+                """,
+                (url, digest, size, etag, last_modified, now, now),
+            )
+            if previous and previous[0] != digest:
+                self._drop_blob_if_unreferenced(previous[0])
+            self._evict(keep=url)
+
+        logger.info(f"Cached {size / 1024:.2f} KB for {url} (sha256={digest[:12]})")
+        return CacheEntry(url, digest, size, etag, last_modified, now)
+
+    ###################
+    # Partial downloads
+    ###################
+
+    def partial_path(self, url: str) -> str:
+        """Where an unfinished download of `url` is kept, so it can be resumed later."""
+        return os.path.join(self.root, "partial", f"{hashlib.sha256(url.encode()).hexdigest()}.part")
+
+    def load_partial(self, url: str) -> tuple[Optional[str], Optional[str]]:
+        """Returns the (etag, last_modified) recorded for a partial download."""
+        try:
+            with open(f"{self.partial_path(url)}.json", encoding="utf-8") as f:
+                meta = json.load(f)
+            return meta.get("etag"), meta.get("last_modified")
+        except (FileNotFoundError, ValueError):
+            return None, None
+
+    def save_partial(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        path = f"{self.partial_path(url)}.json"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "etag": etag, "last_modified": last_modified}, f)
+
+    def claim_partial(self, url: str) -> bool:
+        """
+        Takes the lock on `url`'s partial download: an O_EXCL lockfile beside the .part, holding the
+        pid and kept open until release_partial(). Returns False while another download (in this or
+        another process) holds it; a lock left behind by a process that is gone is taken over.
+        """
+        path = f"{self.partial_path(url)}.lock"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not _lock_is_stale(path):
+                    return False
+                logger.info(f"Taking over the stale partial download lock of {url}")
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            os.write(fd, str(os.getpid()).encode())
+            with self._partial_locks_lock:
+                self._partial_locks[url] = fd
+            return True
+        return False
+
+    def release_partial(self, url: str) -> None:
+        """Drops a lock taken with claim_partial(); locks this instance doesn't hold are left alone."""
+        with self._partial_locks_lock:
+            fd = self._partial_locks.pop(url, None)
+        if fd is None:
+            return
+        os.close(fd)
+        try:
+            os.remove(f"{self.partial_path(url)}.lock")
+        except FileNotFoundError:
+            pass
+
+    def discard_partial(self, url: str) -> None:
+        path = self.partial_path(url)
+        for leftover in (path, f"{path}.json"):
+            try:
+                os.remove(leftover)
+            except FileNotFoundError:
+                pass
+
+    def total_bytes(self) -> int:
+        """Size of all distinct blobs."""
+        row = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT sha256, MAX(size) AS size FROM entries GROUP BY sha256)"
+        ).fetchone()
+        return row[0]
+
+    def _drop_blob_if_unreferenced(self, sha256: str) -> bool:
+        """Removes a blob no entry points at any more; returns whether it was unreferenced."""
+        in_use = self._conn.execute("SELECT 1 FROM entries WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone()
+        if in_use:
+            return False
+        try:
+            os.remove(self.blob_path(sha256))
+        except FileNotFoundError:
+            pass
+        return True
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """
+        Drops least recently used URLs until the blobs fit in max_bytes. Caller holds the lock.
+        `keep` (the entry just written) is never evicted, even if it alone exceeds the cap.
+        The total is summed once; each blob freed is then subtracted from it.
+        """
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        for url, sha256, size in self._conn.execute(
+            "SELECT url, sha256, size FROM entries WHERE url IS NOT ? ORDER BY last_access ASC", (keep,)
+        ).fetchall():
+            self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            if self._drop_blob_if_unreferenced(sha256):
+                total -= size
+            logger.info(f"Evicted {url} from PDF cache")
+            if total <= self.max_bytes:
+                break
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _lock_is_stale(path: str) -> bool:
+    """
+    Whether a lockfile was left behind by a download that is gone.
+    - POSIX: the pid written in it no longer runs.
+    - Windows: a file its holder keeps open can't be deleted, so one that can is stale.
+    """
+    if os.name != "posix":
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return True
+        except PermissionError:
+            return False
+        return True
+    try:
+        with open(path, encoding="utf-8") as f:
+            pid = int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return True
+    except ValueError:
+        return False
+    if pid <= 0:
+        # The holder is still writing its pid
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+_shared_cache: Optional[PdfCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_pdf_cache() -> Optional[PdfCache]:
+    """Returns the process-wide cache, or None when PDF_CACHE_ENABLED is false."""
+    global _shared_cache
+    if not CACHE_ENABLED:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = PdfCache()
+        return _shared_cache
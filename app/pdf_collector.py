@@ -1,16 +1,64 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
 import io
-from dataclasses import dataclass
-from typing import Optional
+import mmap
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, Optional, Sequence, Union
+from urllib.parse import urlsplit
 import httpx
 from pypdf import PdfReader
 from logger_config import get_logger
+from pdf_cache import CacheEntry, CacheMissError, PdfCache, get_pdf_cache
 
 logger = get_logger(__name__)
 
 DEFAULT_TIMEOUT = httpx.Timeout(30.0, read=60.0)
 MAX_DOWNLOAD_SIZE = 50 * 1024 * 1024
+MAX_CONCURRENCY = int(os.getenv("PDF_MAX_CONCURRENCY", "8"))
+PER_HOST_LIMIT = int(os.getenv("PDF_PER_HOST_LIMIT", "4"))
+HTTP2_REQUESTED = os.getenv("PDF_HTTP2", "false").lower() == "true"
+KEEPALIVE_EXPIRY = 30.0
+POOL_LIMITS = httpx.Limits(
+    max_connections=MAX_CONCURRENCY * 2,
+    max_keepalive_connections=MAX_CONCURRENCY,
+    keepalive_expiry=KEEPALIVE_EXPIRY,
+)
+PDF_MAGIC = b"%PDF"
+# The PDF spec tolerates a little junk before the header, so look a bit past byte 0.
+PDF_MAGIC_WINDOW = 1024
+# Downloads larger than this roll over from memory to a temporary file.
+PDF_SPOOL_THRESHOLD = int(os.getenv("PDF_SPOOL_THRESHOLD", str(4 * 1024 * 1024)))
+# Bytes the async downloader collects before a worker thread writes them to the spool.
+ASYNC_WRITE_BUFFER = 1024 * 1024
+# How many times a dropped download is resumed before giving up.
+DOWNLOAD_ATTEMPTS = int(os.getenv("PDF_DOWNLOAD_ATTEMPTS", "4"))
+# Optional: fetch large PDFs as this many concurrent byte ranges (0/1 = off; needs the cache).
+PARALLEL_SEGMENTS = int(os.getenv("PDF_PARALLEL_SEGMENTS", "0"))
+PARALLEL_MIN_SIZE = int(os.getenv("PDF_PARALLEL_MIN_SIZE", str(8 * 1024 * 1024)))
+EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACT_TIMEOUT = float(os.getenv("PDF_EXTRACT_TIMEOUT", "120"))
+EXTRACT_MAX_PAGES = int(os.getenv("PDF_EXTRACT_MAX_PAGES", "500")) or None
+EXTRACT_MAX_TASKS_PER_CHILD = int(os.getenv("PDF_EXTRACT_MAX_TASKS_PER_CHILD", "50"))
+# Per-page mode sends only empty/garbled pages to pdfminer instead of the whole document.
+EXTRACT_PER_PAGE = os.getenv("PDF_EXTRACT_PER_PAGE", "true").lower() == "true"
+# A page is treated as garbled when fewer than this share of its visible characters are letters or digits.
+MIN_ALNUM_RATIO = 0.3
+
+
+# A PDF to extract from: raw bytes, a path on disk, or an open binary file.
+PdfSource = Union[bytes, bytearray, memoryview, str, BinaryIO]
 
 
 @dataclass
@@ -18,114 +66,966 @@ class PdfText:
     url: str
     text: str
     pages: int
+    # Per-page extraction only: which engine produced each page ("pypdf", "pdfminer" or "none").
+    page_engines: list[str] = field(default_factory=list)
+
+
+def _check_pdf_headers(headers: httpx.Headers) -> None:
+    """Reject responses that are clearly not a PDF or exceed the size limit."""
+    ctype = headers.get("content-type", "").lower()
+    length = headers.get("content-length")
+    if length is not None and int(length) > MAX_DOWNLOAD_SIZE:
+        raise ValueError(f"PDF too large: {length} bytes (limit {MAX_DOWNLOAD_SIZE})")
+    if "pdf" not in ctype and ctype != "application/octet-stream":
+        raise ValueError(f"URL does not appear to be a PDF (content-type: {ctype})")
+
+
+class _PdfSpool:
+    """
+    Receives streamed chunks into a file, enforcing the size limit and the %PDF
+    magic bytes. By default the file is a spooled temporary file: bodies stay in
+    memory up to PDF_SPOOL_THRESHOLD and roll over to disk above it, so a large
+    PDF is never held as a list of chunks plus a joined copy. An existing file
+    (e.g. a partial download) continues from its current end.
+    """
+
+    def __init__(self, file: Optional[BinaryIO] = None):
+        self.file = file if file is not None else tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_THRESHOLD)
+        self._sniffed = False
+        self._load_existing()
+
+    def _load_existing(self) -> None:
+        self.file.seek(0)
+        self._prefix = self.file.read(PDF_MAGIC_WINDOW)
+        self.total = self.file.seek(0, io.SEEK_END)
+        if len(self._prefix) >= PDF_MAGIC_WINDOW:
+            self._sniff()
+
+    def _sniff(self) -> None:
+        if PDF_MAGIC not in self._prefix:
+            raise ValueError(f"Response body is not a PDF (starts with {self._prefix[:16]!r})")
+        self._sniffed = True
+
+    def feed(self, chunk: bytes) -> None:
+        self.total += len(chunk)
+        if self.total > MAX_DOWNLOAD_SIZE:
+            raise ValueError("Download exceeded size limit (50 MB)")
+        self.file.write(chunk)
+        if not self._sniffed:
+            self._prefix = (self._prefix + chunk)[:PDF_MAGIC_WINDOW]
+            if len(self._prefix) >= PDF_MAGIC_WINDOW:
+                self._sniff()
+
+    def reset(self) -> None:
+        """Throws away everything received so far."""
+        self.file.seek(0)
+        self.file.truncate()
+        self.total = 0
+        self._prefix = b""
+        self._sniffed = False
+
+    def reload(self) -> None:
+        """Re-reads size and prefix after the file was written behind the spool's back."""
+        self._sniffed = False
+        self._load_existing()
+
+    def finish(self) -> BinaryIO:
+        """Validates the body and returns the file, rewound for reading."""
+        if not self._sniffed:
+            self._sniff()
+        self.file.flush()
+        self.file.seek(0)
+        return self.file
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class _RangeMismatch(Exception):
+    """The server's answer to a range request cannot be appended to the partial body."""
+
+
+def _content_range_start(value: Optional[str]) -> Optional[int]:
+    """Parses the first byte position out of a 'bytes start-end/total' Content-Range header."""
+    match = re.match(r"bytes\s+(\d+)-", value or "")
+    return int(match.group(1)) if match else None
+
+
+class _ResumableDownload:
+    """
+    State for one download that survives dropped connections.
+    - With the PDF cache enabled the body is written to a .part file in the
+      cache's partial/ directory next to its ETag/Last-Modified, so a retry, or
+      a later run, continues with `Range` + `If-Range` instead of byte zero.
+    - Without the cache, retries resume into the in-memory/temporary spool.
+    - When the server ignores the range (200) or the validator changed, the
+      partial body is dropped and the download starts over.
+    - Only one download at a time owns a URL's .part file (PdfCache.claim_partial);
+      a concurrent download of the same URL spools a private copy without
+      cross-run resume and stores it in the cache when done.
+    """
+
+    def __init__(self, url: str, cache: Optional[PdfCache]):
+        self.url = url
+        self.cache = cache
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.owns_partial = cache is not None and cache.claim_partial(url)
+        self.allow_parallel = PARALLEL_SEGMENTS > 1 and self.owns_partial
+        if not self.owns_partial:
+            if cache is not None:
+                logger.info(f"{url} is already being downloaded elsewhere, fetching a private copy")
+            self.spool = _PdfSpool()
+            return
+
+        try:
+            path = cache.partial_path(url)
+            self.etag, self.last_modified = cache.load_partial(url)
+            part = open(path, "a+b")
+            try:
+                self.spool = _PdfSpool(part)
+            except ValueError:
+                # The leftover does not start like a PDF; start clean.
+                part.truncate(0)
+                self.spool = _PdfSpool(part)
+        except BaseException:
+            cache.release_partial(url)
+            raise
+
+    @property
+    def received(self) -> int:
+        return self.spool.total
+
+    def _validator(self) -> Optional[str]:
+        # If-Range needs a strong ETag; fall back to the Last-Modified date.
+        if self.etag and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+    def request_headers(self, base: dict[str, str]) -> dict[str, str]:
+        headers = dict(base)
+        if self.received and not self._validator():
+            # Without a validator there is no way to tell if the file changed underneath us.
+            self.spool.reset()
+        if self.received:
+            headers["Range"] = f"bytes={self.received}-"
+            headers["If-Range"] = self._validator()
+        return headers
+
+    def begin(self, resp: httpx.Response) -> None:
+        """Decides from the response whether its body continues the partial file or replaces it."""
+        if resp.status_code == 416:
+            self.spool.reset()
+            raise _RangeMismatch(f"Range not satisfiable for {self.url}")
+        resp.raise_for_status()
+
+        if self.received and resp.status_code == 206:
+            start = _content_range_start(resp.headers.get("content-range"))
+            if start != self.received:
+                self.spool.reset()
+                raise _RangeMismatch(f"Server resumed {self.url} at byte {start}, expected {self.received}")
+            logger.info(f"Resuming {self.url} at {self.received / 1024:.2f} KB")
+            return
+
+        if self.received:
+            logger.info(f"Server sent the full body for {self.url}, restarting from byte 0")
+            self.spool.reset()
+        _check_pdf_headers(resp.headers)
+        self.etag = resp.headers.get("etag")
+        self.last_modified = resp.headers.get("last-modified")
+        if self.owns_partial:
+            self.cache.save_partial(self.url, self.etag, self.last_modified)
+
+    def feed(self, chunk: bytes) -> None:
+        self.spool.feed(chunk)
+
+    def parallel_size(self, resp: httpx.Response) -> int:
+        """Size to fetch as parallel byte ranges, or 0 to keep streaming this response."""
+        if not self.allow_parallel or self.received or resp.status_code != 200:
+            return 0
+        if resp.headers.get("accept-ranges", "").lower() != "bytes" or not self._validator():
+            return 0
+        size = int(resp.headers.get("content-length") or 0)
+        return size if size >= PARALLEL_MIN_SIZE else 0
+
+    def fetch_ranges(self, client: httpx.Client, size: int) -> bool:
+        """
+        Fills the partial file with PARALLEL_SEGMENTS byte ranges fetched
+        concurrently. Returns False (with the partial file cleared) if any range
+        fails, so the caller can fall back to a single stream.
+        """
+        path = self.cache.partial_path(self.url)
+        validator = self._validator()
+        step = -(-size // PARALLEL_SEGMENTS)
+        bounds = [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+        self.spool.file.truncate(size)
+        self.spool.file.flush()
+
+        def _fetch(start: int, end: int) -> None:
+            headers = {"Range": f"bytes={start}-{end}", "If-Range": validator}
+            with open(path, "r+b") as f, client.stream("GET", self.url, headers=headers) as resp:
+                if resp.status_code != 206 or _content_range_start(resp.headers.get("content-range")) != start:
+                    raise _RangeMismatch(f"Range {start}-{end} of {self.url} was not honoured")
+                f.seek(start)
+                for chunk in resp.iter_bytes():
+                    if f.tell() + len(chunk) > end + 1:
+                        raise _RangeMismatch(f"Range {start}-{end} of {self.url} returned too much data")
+                    f.write(chunk)
+                if f.tell() != end + 1:
+                    raise _RangeMismatch(f"Range {start}-{end} of {self.url} ended early")
+
+        logger.info(f"Fetching {self.url} as {len(bounds)} parallel ranges ({size / 1024:.2f} KB)")
+        try:
+            with ThreadPoolExecutor(max_workers=len(bounds)) as pool:
+                list(pool.map(lambda b: _fetch(*b), bounds))
+        except Exception as e:
+            logger.warning(f"Parallel range download failed for {self.url} ({e}), using a single stream.")
+            self.allow_parallel = False
+            self.spool.reset()
+            return False
+        self.spool.reload()
+        return True
+
+    def finish(self) -> BinaryIO:
+        """Validates the body and returns a file to parse from (the cached blob when caching)."""
+        logger.info(f"Successfully downloaded {self.received / 1024:.2f} KB from {self.url}")
+        body = self.spool.finish()
+        if self.cache is None:
+            return body
+        # Parse from the cached blob: it is a real file, so it can be memory-mapped
+        # and handed to extraction workers by path.
+        if not self.owns_partial:
+            try:
+                entry = self.cache.store(self.url, body, self.etag, self.last_modified)
+            finally:
+                body.close()
+            return self.cache.open(entry)
+        body.close()
+        try:
+            entry = self.cache.adopt(self.url, self.cache.partial_path(self.url), self.etag, self.last_modified)
+            self.cache.discard_partial(self.url)
+        finally:
+            self._release()
+        return self.cache.open(entry)
+
+    def _release(self) -> None:
+        if self.owns_partial:
+            self.owns_partial = False
+            self.cache.release_partial(self.url)
+
+    def suspend(self) -> None:
+        """Keeps what was received (cache only) so a later call can resume it."""
+        self.spool.close()
+        if not self.owns_partial:
+            return
+        self._release()
+        logger.info(f"Keeping {self.received / 1024:.2f} KB of {self.url} for a later resume")
+
+    def abandon(self) -> None:
+        """Drops the partial body for good (the response was not a usable PDF)."""
+        self.spool.close()
+        if self.owns_partial:
+            self.cache.discard_partial(self.url)
+            self._release()
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 is opt-in via PDF_HTTP2 and needs the optional `h2` package."""
+    if not HTTP2_REQUESTED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("PDF_HTTP2 is set but the 'h2' package is not installed; using HTTP/1.1.")
+        return False
+    return True
+
+
+_shared_client: Optional[httpx.Client] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Returns the process-wide pooled client used for PDF downloads.
+    Connections are kept alive between calls, so repeated downloads from the
+    same court host reuse the TLS session instead of handshaking every time.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None or _shared_client.is_closed:
+            _shared_client = httpx.Client(
+                timeout=DEFAULT_TIMEOUT,
+                follow_redirects=True,
+                limits=POOL_LIMITS,
+                http2=_http2_enabled(),
+            )
+        return _shared_client
+
+
+def close_http_client() -> None:
+    """Closes the shared client (registered with atexit)."""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+            _shared_client = None
+
+
+atexit.register(close_http_client)
+
+
+def _cached_copy(cache: Optional[PdfCache], url: str) -> tuple[Optional[CacheEntry], Optional[BinaryIO]]:
+    """
+    Looks a URL up in the PDF cache.
+    Returns (entry, file): file is set when the cached copy can be used without
+    touching the network (offline mode or still within max_age); otherwise the
+    entry, if any, is returned for conditional revalidation.
+    """
+    if cache is None:
+        return None, None
+    entry = cache.lookup(url)
+    if entry is not None and (cache.offline or cache.is_fresh(entry)):
+        logger.info(f"Serving {url} from PDF cache")
+        return entry, cache.open(entry)
+    if cache.offline:
+        raise CacheMissError(f"{url} is not cached and the PDF cache is in offline mode")
+    return entry, None
+
+
+def _download_pdf(url: str, client: Optional[httpx.Client] = None, use_cache: bool = True) -> BinaryIO:
+    """
+    Stream-download a PDF from a URL. Synchronous version.
+    Content-type and size are checked on the GET response headers and the body
+    must start with the %PDF magic bytes, so no separate HEAD request is needed.
+    Goes through the on-disk PDF cache unless use_cache is False; cached copies
+    are revalidated with If-None-Match/If-Modified-Since.
+    Dropped connections are resumed with Range requests (see _ResumableDownload).
+    Returns a binary file positioned at the start of the PDF; the caller closes it.
+    """
+    cache = get_pdf_cache() if use_cache else None
+    entry, cached = _cached_copy(cache, url)
+    if cached is not None:
+        return cached
 
-def _download_pdf(url: str, client: Optional[httpx.Client] = None) -> bytes:
-    """Stream-download a PDF from a URL into memory (no disk use). Synchronous version."""
-    close_client = False
     if client is None:
-        client = httpx.Client(timeout=DEFAULT_TIMEOUT, follow_redirects=True)
-        close_client = True
+        client = get_http_client()
 
     logger.info(f"Starting download: {url}")
 
+    download = _ResumableDownload(url, cache)
+    base_headers = PdfCache.conditional_headers(entry) if entry is not None else {}
+    attempt = 1
     try:
-        try:
-            head = client.head(url)
-            if not (200 <= head.status_code < 400):
-                logger.warning(f"HEAD request failed for {url}, continuing with GET.")
-                head = None
-        except Exception as e:
-            logger.warning(f"HEAD request error for {url}: {e}")
-            head = None
-
-        if head is not None:
-            ctype = head.headers.get("content-type", "").lower()
-            length = head.headers.get("content-length")
-            if length is not None and int(length) > MAX_DOWNLOAD_SIZE:
-                raise ValueError(f"PDF too large: {length} bytes (limit {MAX_DOWNLOAD_SIZE})")
-            if "pdf" not in ctype and ctype != "application/octet-stream":
-                raise ValueError(f"URL does not appear to be a PDF (content-type: {ctype})")
-
-        # Stream the download into memory safely
-        with client.stream("GET", url) as resp:
-            resp.raise_for_status()
-            total = 0
-            chunks = []
-            for chunk in resp.iter_bytes():
-                total += len(chunk)
-                if total > MAX_DOWNLOAD_SIZE:
-                    raise ValueError("Download exceeded size limit (50 MB)")
-                chunks.append(chunk)
-
-        logger.info(f"Successfully downloaded {total / 1024:.2f} KB from {url}")
-        return b"".join(chunks)
+        while True:
+            try:
+                with client.stream("GET", url, headers=download.request_headers(base_headers)) as resp:
+                    if entry is not None and resp.status_code == 304:
+                        logger.info(f"Not modified, serving {url} from PDF cache")
+                        download.abandon()
+                        cache.touch(url, revalidated=True)
+                        return cache.open(entry)
+
+                    download.begin(resp)
+                    split_size = download.parallel_size(resp)
+                    if not split_size:
+                        for chunk in resp.iter_bytes():
+                            download.feed(chunk)
+
+                if split_size and not download.fetch_ranges(client, split_size):
+                    continue
+                return download.finish()
 
+            except (httpx.TransportError, _RangeMismatch) as e:
+                if attempt >= DOWNLOAD_ATTEMPTS:
+                    raise
+                logger.warning(
+                    f"Download of {url} interrupted at {download.received / 1024:.2f} KB ({e}), "
+                    f"resuming (attempt {attempt + 1}/{DOWNLOAD_ATTEMPTS})..."
+                )
+                attempt += 1
+                time.sleep(attempt - 1)
+
+    except httpx.TransportError as e:
+        download.suspend()
+        logger.exception(f"Failed to download PDF from {url}: {e}")
+        raise
     except Exception as e:
+        download.abandon()
         logger.exception(f"Failed to download PDF from {url}: {e}")
         raise
+
+
+class _MappedFile(io.RawIOBase):
+    """Read-only file object over an mmap; pdfminer only accepts io objects."""
+
+    def __init__(self, mapped: mmap.mmap):
+        super().__init__()
+        self._mapped = mapped
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        return self._mapped.read(-1 if size is None else size)
+
+    def readinto(self, buffer) -> int:
+        data = self._mapped.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def tell(self) -> int:
+        return self._mapped.tell()
+
+
+@contextmanager
+def _open_pdf_source(source: PdfSource) -> Iterator[BinaryIO]:
+    """
+    Yields a seekable binary stream over a PDF given as bytes, a file path or an
+    open binary file. Files on disk are memory-mapped, so the parsers read the
+    page cache directly instead of a private copy of the document.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+        return
+
+    owned = isinstance(source, str)
+    fp = open(source, "rb") if owned else source
+    try:
+        try:
+            fileno = fp.fileno()
+            size = os.fstat(fileno).st_size
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            # Still in memory (e.g. a spooled file below the rollover threshold).
+            fp.seek(0)
+            yield fp
+            return
+
+        if size == 0:
+            yield io.BytesIO(b"")
+            return
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mapped:
+            yield _MappedFile(mapped)
     finally:
-        if close_client:
-            client.close()
+        if owned:
+            fp.close()
 
 
-def _extract_text_pypdf(data: bytes) -> tuple[str, int]:
-    """Extract text using pypdf."""
+def _extract_text_pypdf(reader: PdfReader, max_pages: Optional[int] = None) -> str:
+    """Extract text using pypdf. Only the first max_pages pages are read when set."""
     try:
-        reader = PdfReader(io.BytesIO(data))
+        total_pages = len(reader.pages)
+        if max_pages and total_pages > max_pages:
+            logger.warning(f"PDF has {total_pages} pages, extracting only the first {max_pages}.")
         texts = []
         for i, page in enumerate(reader.pages):
+            if max_pages and i >= max_pages:
+                break
             try:
                 texts.append(page.extract_text() or "")
             except Exception as e:
                 logger.warning(f"Failed to extract text from page {i + 1}: {e}")
                 texts.append("")
         text = "\n".join(t.strip() for t in texts if t)
-        logger.info(f"Extracted text from {len(reader.pages)} pages using PyPDF.")
-        return text, len(reader.pages)
+        logger.info(f"Extracted text from {len(texts)} pages using PyPDF.")
+        return text
     except Exception as e:
         logger.exception(f"PyPDF extraction failed: {e}")
         raise
 
 
-def _fallback_pdfminer(data: bytes) -> tuple[str, int]:
+def _fallback_pdfminer(stream: BinaryIO, max_pages: Optional[int] = None) -> str:
     """Fallback to pdfminer if pypdf fails."""
     try:
         from pdfminer.high_level import extract_text as pdfminer_extract_text
-        text = pdfminer_extract_text(io.BytesIO(data)) or ""
-        try:
-            reader = PdfReader(io.BytesIO(data))
-            pages = len(reader.pages)
-        except Exception:
-            pages = 0
+        stream.seek(0)
+        text = pdfminer_extract_text(stream, maxpages=max_pages or 0) or ""
         logger.info("Fallback to pdfminer succeeded.")
-        return text, pages
+        return text
     except Exception as e:
         logger.exception(f"Failed to extract text with pdfminer: {e}")
         raise RuntimeError(f"Failed to extract text with pdfminer: {e}")
 
 
-def fetch_pdf_text(url: str) -> PdfText:
+def _page_needs_fallback(text: str) -> bool:
+    """True for pages pypdf returned empty, or as mostly replacement/control characters."""
+    visible = [c for c in text if not c.isspace()]
+    if not visible:
+        return True
+    if text.count("(cid:") * 5 > len(visible) or text.count("\ufffd") * 10 > len(visible):
+        return True
+    alnum = sum(1 for c in visible if c.isalnum())
+    return alnum / len(visible) < MIN_ALNUM_RATIO
+
+
+def _pdfminer_pages(stream: BinaryIO, page_numbers: Optional[Sequence[int]] = None, max_pages: Optional[int] = None) -> list[str]:
+    """
+    Runs pdfminer over the given 0-based pages (all pages when None) and returns
+    one string per page. pdfminer ends every page with a form feed, which is used
+    to split its output back into pages.
+    """
+    from pdfminer.high_level import extract_text as pdfminer_extract_text
+    stream.seek(0)
+    text = pdfminer_extract_text(stream, page_numbers=page_numbers, maxpages=max_pages or 0) or ""
+    pages = text.split("\x0c")
+    if pages and not pages[-1].strip():
+        pages.pop()
+    return pages
+
+
+def _extract_pages_hybrid(reader: PdfReader, stream: BinaryIO, max_pages: Optional[int] = None) -> tuple[list[str], list[str]]:
+    """
+    Extracts page by page with pypdf and re-extracts only the pages that came
+    back empty or garbled with pdfminer, restricted to those page numbers.
+    Returns (page texts, engine per page).
+    """
+    total_pages = len(reader.pages)
+    limit = min(total_pages, max_pages) if max_pages else total_pages
+    if limit < total_pages:
+        logger.warning(f"PDF has {total_pages} pages, extracting only the first {limit}.")
+
+    texts, engines = [], []
+    for i in range(limit):
+        try:
+            texts.append(reader.pages[i].extract_text() or "")
+        except Exception as e:
+            logger.warning(f"Failed to extract text from page {i + 1}: {e}")
+            texts.append("")
+        engines.append("pypdf")
+
+    retry = [i for i, text in enumerate(texts) if _page_needs_fallback(text)]
+    if retry:
+        try:
+            mined = _pdfminer_pages(stream, page_numbers=retry)
+            for i, text in zip(retry, mined):
+                if text.strip():
+                    texts[i], engines[i] = text, "pdfminer"
+                elif not texts[i].strip():
+                    engines[i] = "none"
+        except Exception as e:
+            logger.warning(f"pdfminer failed on {len(retry)} fallback pages: {e}")
+        logger.info(f"Re-extracted {len(retry)} of {limit} pages with pdfminer.")
+
+    logger.info(f"Extracted text from {limit} pages ({engines.count('pypdf')} via PyPDF).")
+    return texts, engines
+
+
+def _extract_pdf_text(
+    url: str,
+    source: PdfSource,
+    max_pages: Optional[int] = EXTRACT_MAX_PAGES,
+    per_page: bool = EXTRACT_PER_PAGE,
+) -> PdfText:
+    """
+    Extract text using pypdf, falling back to pdfminer.
+    - Per-page mode hands only the pages pypdf could not read to pdfminer.
+    - Otherwise pdfminer reruns the whole document when pypdf yields nothing.
+    The document is opened once; the page count from pypdf's parse is reused
+    for the pdfminer result instead of building a second reader.
+    """
+    with _open_pdf_source(source) as stream:
+        pages = 0
+        try:
+            reader = PdfReader(stream)
+            pages = len(reader.pages)
+            if per_page:
+                texts, engines = _extract_pages_hybrid(reader, stream, max_pages)
+                text = "\n".join(t.strip() for t in texts if t.strip())
+                return PdfText(url=url, text=text, pages=pages, page_engines=engines)
+            text = _extract_text_pypdf(reader, max_pages)
+            if text.strip():
+                return PdfText(url=url, text=text, pages=pages)
+        except Exception:
+            logger.warning(f"PyPDF extraction failed for {url}, switching to pdfminer...")
+
+        if per_page:
+            try:
+                texts = _pdfminer_pages(stream, max_pages=max_pages)
+            except Exception as e:
+                logger.exception(f"Failed to extract text with pdfminer: {e}")
+                raise RuntimeError(f"Failed to extract text with pdfminer: {e}")
+            engines = ["pdfminer" if t.strip() else "none" for t in texts]
+            text = "\n".join(t.strip() for t in texts if t.strip())
+            return PdfText(url=url, text=text, pages=pages or len(texts), page_engines=engines)
+
+        text = _fallback_pdfminer(stream, max_pages)
+        return PdfText(url=url, text=text, pages=pages)
+
+
+def _worker_source(source: PdfSource) -> Union[bytes, str]:
+    """
+    What to send to an extraction worker for a source: the path when the PDF is
+    a named file on disk (the worker maps it itself), the bytes otherwise.
+    """
+    if isinstance(source, (bytes, str)):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    source.seek(0)
+    return source.read()
+
+
+class ExtractionTimeoutError(TimeoutError):
+    """Raised when a document exceeds the executor's per-document wall-clock budget."""
+
+
+def _announce_worker(pids) -> None:
+    """Pool initializer: tells the parent which process this worker is."""
+    pids.put(os.getpid())
+
+
+class ExtractionExecutor:
+    """
+    Runs PDF text extraction in a pool of worker processes.
+    - Each document gets `timeout` seconds of wall-clock time; a document that
+      overruns is reported as ExtractionTimeoutError and its worker is killed.
+    - Only the first `max_pages` pages of a document are extracted.
+    - Workers are replaced after `max_tasks_per_child` documents so memory held
+      by the parsers cannot creep up over a long crawl.
+    - extract_many returns results in input order, whatever order they finish in.
+    """
+
+    # Runs in the workers: (url, source, max_pages, per_page) -> PdfText.
+    task = staticmethod(_extract_pdf_text)
+
+    def __init__(
+        self,
+        workers: int = EXTRACT_WORKERS,
+        timeout: float = EXTRACT_TIMEOUT,
+        max_pages: Optional[int] = EXTRACT_MAX_PAGES,
+        max_tasks_per_child: int = EXTRACT_MAX_TASKS_PER_CHILD,
+        per_page: bool = EXTRACT_PER_PAGE,
+    ):
+        self.workers = max(1, workers)
+        self.per_page = per_page
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.max_tasks_per_child = max_tasks_per_child
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._worker_pids = None
+        self._lock = threading.Lock()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn keeps workers independent of the parent's threads and works the same on Windows.
+        context = multiprocessing.get_context("spawn")
+        self._worker_pids = context.SimpleQueue()
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            max_tasks_per_child=self.max_tasks_per_child,
+            initializer=_announce_worker,
+            initargs=(self._worker_pids,),
+        )
+
+    def _kill_pool(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        # A running task cannot be cancelled, so a stuck document is stopped by
+        # terminating the worker processes themselves (the live children that announced
+        # themselves to this pool; a pid of an exited worker is never signalled).
+        pids = set()
+        while not self._worker_pids.empty():
+            pids.add(self._worker_pids.get())
+        for proc in multiprocessing.active_children():
+            if proc.pid in pids:
+                proc.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def extract_many(self, items: Sequence[tuple[str, PdfSource]]) -> list[Union[PdfText, Exception]]:
+        """
+        Extracts text for (url, source) pairs.
+        Returns one entry per pair, in input order: a PdfText or the exception for that document.
+        """
+        results: list[Union[PdfText, Exception, None]] = [None] * len(items)
+        pending = deque(range(len(items)))
+        crashes: Counter[int] = Counter()
+
+        with self._lock:
+            running: dict[Future, tuple[int, float]] = {}
+            while pending or running:
+                if self._pool is None:
+                    self._pool = self._new_pool()
+
+                # Never queue more than there are workers, so a task's deadline starts when it does.
+                while pending and len(running) < self.workers:
+                    index = pending.popleft()
+                    url, source = items[index]
+                    future = self._pool.submit(
+                        self.task, url, _worker_source(source), self.max_pages, self.per_page
+                    )
+                    running[future] = (index, time.monotonic() + self.timeout)
+
+                next_deadline = min(deadline for _, deadline in running.values())
+                done, _ = wait(
+                    running,
+                    timeout=max(0.0, next_deadline - time.monotonic()),
+                    return_when=FIRST_COMPLETED,
+                )
+
+                pool_broken = False
+                for future in done:
+                    index, _ = running.pop(future)
+                    try:
+                        results[index] = future.result()
+                    except BrokenProcessPool as e:
+                        # A worker died (e.g. out of memory). Every in-flight document fails
+                        # with it, so give each one more chance before blaming it.
+                        pool_broken = True
+                        crashes[index] += 1
+                        if crashes[index] > 1:
+                            results[index] = e
+                        else:
+                            pending.appendleft(index)
+                    except Exception as e:
+                        results[index] = e
+
+                now = time.monotonic()
+                expired = [f for f, (_, deadline) in running.items() if deadline <= now]
+                for future in expired:
+                    index, _ = running.pop(future)
+                    url = items[index][0]
+                    logger.error(f"Text extraction for {url} exceeded {self.timeout}s, killing worker.")
+                    results[index] = ExtractionTimeoutError(
+                        f"Text extraction for {url} exceeded {self.timeout}s"
+                    )
+
+                if expired or pool_broken:
+                    # Documents still in flight on the old pool did nothing wrong; run them again.
+                    for index, _ in running.values():
+                        pending.appendleft(index)
+                    running.clear()
+                    self._kill_pool()
+
+        return results
+
+    def extract(self, url: str, source: PdfSource) -> PdfText:
+        result = self.extract_many([(url, source)])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+
+_shared_executor: Optional[ExtractionExecutor] = None
+_shared_executor_lock = threading.Lock()
+
+
+def get_extraction_executor() -> Optional[ExtractionExecutor]:
+    """Returns the process-wide extraction executor, or None when PDF_EXTRACT_WORKERS is 0."""
+    global _shared_executor
+    if EXTRACT_WORKERS <= 0:
+        return None
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = ExtractionExecutor()
+            atexit.register(_shared_executor.shutdown)
+        return _shared_executor
+
+
+def fetch_pdf_text(url: str, executor: Optional[ExtractionExecutor] = None) -> PdfText:
     """
     Synchronous function that:
     - Downloads a PDF (streamed)
-    - Extracts text using pypdf (fallback to pdfminer)
+    - Extracts text using pypdf (fallback to pdfminer), in `executor` when given
     - Returns PdfText dataclass
     """
     try:
-        data = _download_pdf(url)
+        body = _download_pdf(url)
     except Exception as e:
         logger.error(f"Download failed for {url}: {e}")
         raise
 
+    with body:
+        if executor is not None:
+            return executor.extract(url, body)
+        return _extract_pdf_text(url, body)
+
+
+def _suspend_opened(opening: "asyncio.Future") -> None:
+    if not opening.cancelled() and opening.exception() is None:
+        opening.result().suspend()
+
+
+async def _download_pdf_async(url: str, client: httpx.AsyncClient, use_cache: bool = True) -> BinaryIO:
+    """
+    Stream-download a PDF from a URL. Async counterpart of _download_pdf (without parallel ranges).
+    - File work (claiming and writing the partial body, buffered ASYNC_WRITE_BUFFER bytes at a time)
+      runs in worker threads, shielded from cancellation so a step is never cut off halfway.
+    - A cancelled download keeps its partial body and gives up its claim once the step in
+      flight is done, so the next run can resume it.
+    """
+    cache = get_pdf_cache() if use_cache else None
+    entry, cached = await asyncio.to_thread(_cached_copy, cache, url)
+    if cached is not None:
+        return cached
+
+    logger.info(f"Starting download: {url}")
+
+    opening = asyncio.ensure_future(asyncio.to_thread(_ResumableDownload, url, cache))
+    try:
+        download = await asyncio.shield(opening)
+    except asyncio.CancelledError:
+        # The claim is taken in the worker thread; give it back once that is done
+        opening.add_done_callback(_suspend_opened)
+        raise
+    download.allow_parallel = False
+    base_headers = PdfCache.conditional_headers(entry) if entry is not None else {}
+    attempt = 1
+    step: Optional[asyncio.Future] = None
+
+    async def off_loop(func, *args):
+        nonlocal step
+        step = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        return await asyncio.shield(step)
+
     try:
-        text, pages = _extract_text_pypdf(data)
-        if text.strip():
-            return PdfText(url=url, text=text, pages=pages)
-    except Exception:
-        logger.warning(f"PyPDF extraction failed for {url}, switching to pdfminer...")
-
-    text, pages = _fallback_pdfminer(data)
-    return PdfText(url=url, text=text, pages=pages)
+        while True:
+            try:
+                async with client.stream("GET", url, headers=download.request_headers(base_headers)) as resp:
+                    if entry is not None and resp.status_code == 304:
+                        logger.info(f"Not modified, serving {url} from PDF cache")
+                        await off_loop(download.abandon)
+                        await off_loop(lambda: cache.touch(url, revalidated=True))
+                        return await off_loop(cache.open, entry)
+
+                    await off_loop(download.begin, resp)
+                    buffer = bytearray()
+                    async for chunk in resp.aiter_bytes():
+                        buffer += chunk
+                        if len(buffer) >= ASYNC_WRITE_BUFFER:
+                            await off_loop(download.feed, bytes(buffer))
+                            buffer = bytearray()
+                    if buffer:
+                        await off_loop(download.feed, bytes(buffer))
+
+                return await off_loop(download.finish)
+
+            except (httpx.TransportError, _RangeMismatch) as e:
+                if attempt >= DOWNLOAD_ATTEMPTS:
+                    raise
+                logger.warning(
+                    f"Download of {url} interrupted at {download.received / 1024:.2f} KB ({e}), "
+                    f"resuming (attempt {attempt + 1}/{DOWNLOAD_ATTEMPTS})..."
+                )
+                attempt += 1
+                await asyncio.sleep(attempt - 1)
+
+    except httpx.TransportError as e:
+        await off_loop(download.suspend)
+        logger.exception(f"Failed to download PDF from {url}: {e}")
+        raise
+    except Exception as e:
+        await off_loop(download.abandon)
+        logger.exception(f"Failed to download PDF from {url}: {e}")
+        raise
+    except BaseException:
+        # Cancelled (or interrupted): keep what was received for a later resume
+        if step is None or step.done():
+            download.suspend()
+        else:
+            step.add_done_callback(lambda _: download.suspend())
+        logger.info(f"Download of {url} cancelled at {download.received / 1024:.2f} KB")
+        raise
+
+
+async def fetch_pdf_texts_async(
+    urls: Sequence[str],
+    max_concurrency: int = MAX_CONCURRENCY,
+    per_host_limit: int = PER_HOST_LIMIT,
+    client: Optional[httpx.AsyncClient] = None,
+    executor: Optional[ExtractionExecutor] = None,
+) -> list[Union[PdfText, Exception]]:
+    """
+    Downloads and extracts a batch of PDFs concurrently.
+    - At most `max_concurrency` downloads are in flight overall,
+      and at most `per_host_limit` against any single host.
+    - Text extraction runs in a worker thread so it does not block the event loop,
+      or, when `executor` is given, in its process pool once the downloads finish.
+    - Returns one entry per URL, in input order: a PdfText, or the exception
+      raised for that URL (failures never cancel the rest of the batch).
+    """
+    close_client = False
+    if client is None:
+        # An AsyncClient is bound to the event loop that created it, so unlike the
+        # sync path each batch gets its own pooled client.
+        client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            http2=_http2_enabled(),
+        )
+        close_client = True
+
+    global_slots = asyncio.Semaphore(max_concurrency)
+    host_slots: defaultdict[str, asyncio.Semaphore] = defaultdict(
+        lambda: asyncio.Semaphore(per_host_limit)
+    )
+
+    async def _download_one(url: str) -> BinaryIO:
+        # Take the host slot first so a busy host never pins global slots while waiting.
+        async with host_slots[urlsplit(url).netloc]:
+            async with global_slots:
+                return await _download_pdf_async(url, client)
+
+    async def _fetch_one(url: str) -> PdfText:
+        body = await _download_one(url)
+        with body:
+            return await asyncio.to_thread(_extract_pdf_text, url, body)
+
+    try:
+        if executor is None:
+            return await asyncio.gather(*(_fetch_one(url) for url in urls), return_exceptions=True)
+
+        downloads = await asyncio.gather(*(_download_one(url) for url in urls), return_exceptions=True)
+        results: list[Union[PdfText, Exception]] = list(downloads)
+        ready = [i for i, body in enumerate(downloads) if not isinstance(body, BaseException)]
+        try:
+            extracted = await asyncio.to_thread(
+                executor.extract_many, [(urls[i], downloads[i]) for i in ready]
+            )
+        finally:
+            for i in ready:
+                downloads[i].close()
+        for i, result in zip(ready, extracted):
+            results[i] = result
+        return results
+    finally:
+        if close_client:
+            await client.aclose()
+
+
+def fetch_pdf_texts(
+    urls: Sequence[str],
+    max_concurrency: int = MAX_CONCURRENCY,
+    per_host_limit: int = PER_HOST_LIMIT,
+    executor: Optional[ExtractionExecutor] = None,
+) -> list[Union[PdfText, Exception]]:
+    """Synchronous entry point for fetch_pdf_texts_async."""
+    return asyncio.run(
+        fetch_pdf_texts_async(
+            urls, max_concurrency=max_concurrency, per_host_limit=per_host_limit, executor=executor
+        )
+    )
 
 
 def _sync_main():
@@ -0,0 +1,217 @@
+import os
+import time
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+from app.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Items waiting in front of a stage before put() blocks the stage feeding it.
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+# Seconds between queue-depth reports while the pipeline runs (0 disables them).
+PIPELINE_REPORT_SECONDS = float(os.getenv("PIPELINE_REPORT_SECONDS", "30"))
+
+_STOP = object()
+
+
+@dataclass
+class Stage:
+    """
+    One step of a Pipeline.
+    - `fn` takes an item and returns the item for the next stage (None drops it).
+    - With a batch_size, `fn` takes a list of up to batch_size items (fewer once
+      batch_timeout seconds pass without new input) and returns a list for the next stage.
+    - `workers` threads run `fn`; `queue_size` bounds the items waiting in front of them.
+    - With retry_items, a batch `fn` raised on is run again one item at a time, so only
+      the items that fail alone are dropped.
+    """
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+    queue_size: int = PIPELINE_QUEUE_SIZE
+    batch_size: Optional[int] = None
+    batch_timeout: float = 5.0
+    retry_items: bool = False
+    processed: int = 0
+    failed: int = 0
+    busy: int = 0
+    _queue: queue.Queue = field(init=False, repr=False)
+    _lock: threading.Lock = field(init=False, repr=False, default_factory=threading.Lock)
+    _running: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        self.workers = max(1, self.workers)
+        if self.batch_size is not None:
+            self.batch_size = max(1, self.batch_size)
+        self._queue = queue.Queue(maxsize=max(1, self.queue_size))
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues.
+    - A full queue blocks the stage (or caller) feeding it, so a slow stage throttles
+      everything upstream instead of buffering without limit.
+    - A failing item is logged and counted against its stage; the rest keep flowing.
+      A failing batch is dropped whole unless its stage retries items one by one.
+    - close() stops intake and waits until every queued item has passed through all stages.
+    """
+
+    def __init__(self, stages: list[Stage], report_interval: float = PIPELINE_REPORT_SECONDS):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.report_interval = report_interval
+        self._threads: list[threading.Thread] = []
+        self._closed = threading.Event()
+        self._started = False
+
+    def start(self) -> "Pipeline":
+        for index, stage in enumerate(self.stages):
+            stage._running = stage.workers
+            for n in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(index,), name=f"{stage.name}-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        if self.report_interval > 0:
+            reporter = threading.Thread(target=self._report_loop, name="pipeline-report", daemon=True)
+            reporter.start()
+        self._started = True
+        return self
+
+    def put(self, item: Any) -> None:
+        """Feeds the first stage; blocks while its queue is full."""
+        if self._closed.is_set():
+            raise RuntimeError("Pipeline is closed")
+        self.stages[0]._queue.put(item)
+
+    def _forward(self, index: int, item: Any) -> None:
+        if item is not None and index + 1 < len(self.stages):
+            self.stages[index + 1]._queue.put(item)
+
+    def _run(self, index: int, items: list) -> None:
+        """Runs one call of the stage and forwards its output once the call has returned."""
+        stage = self.stages[index]
+        if stage.batch_size is None:
+            self._forward(index, stage.fn(items[0]))
+            return
+        for output in list(stage.fn(items) or []):
+            self._forward(index, output)
+
+    def _next_batch(self, stage: Stage) -> tuple[list, bool]:
+        """Collects up to batch_size items; returns (items, stop_seen)."""
+        first = stage._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + stage.batch_timeout
+        while len(batch) < stage.batch_size:
+            try:
+                item = stage._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _work(self, index: int) -> None:
+        stage = self.stages[index]
+        stop = False
+        while not stop:
+            if stage.batch_size is not None:
+                items, stop = self._next_batch(stage)
+                if not items:
+                    continue
+            else:
+                item = stage._queue.get()
+                if item is _STOP:
+                    break
+                items = [item]
+
+            with stage._lock:
+                stage.busy += 1
+            try:
+                self._run(index, items)
+                with stage._lock:
+                    stage.processed += len(items)
+            except Exception:
+                if stage.retry_items and len(items) > 1:
+                    logger.warning(f"Pipeline stage {stage.name} failed on a batch of {len(items)}; "
+                                   f"retrying item by item", exc_info=True)
+                    for item in items:
+                        self._retry(index, item)
+                else:
+                    logger.exception(f"Pipeline stage {stage.name} failed on {len(items)} item(s)")
+                    with stage._lock:
+                        stage.failed += len(items)
+            finally:
+                with stage._lock:
+                    stage.busy -= 1
+
+        # The last worker out passes the stop signal on, after everything it forwarded
+        with stage._lock:
+            stage._running -= 1
+            last = stage._running == 0
+        if last and index + 1 < len(self.stages):
+            following = self.stages[index + 1]
+            for _ in range(following.workers):
+                following._queue.put(_STOP)
+
+    def _retry(self, index: int, item: Any) -> None:
+        stage = self.stages[index]
+        try:
+            self._run(index, [item])
+        except Exception:
+            logger.exception(f"Pipeline stage {stage.name} failed on 1 item")
+            with stage._lock:
+                stage.failed += 1
+        else:
+            with stage._lock:
+                stage.processed += 1
+
+    def snapshot(self) -> dict[str, dict]:
+        return {
+            stage.name: {
+                "queued": stage.depth,
+                "busy": stage.busy,
+                "processed": stage.processed,
+                "failed": stage.failed,
+            }
+            for stage in self.stages
+        }
+
+    def report(self) -> None:
+        logger.info("Pipeline: " + " | ".join(
+            f"{name} q={s['queued']} busy={s['busy']} done={s['processed']} failed={s['failed']}"
+            for name, s in self.snapshot().items()
+        ))
+
+    def _report_loop(self) -> None:
+        while not self._closed.wait(self.report_interval):
+            self.report()
+
+    def close(self) -> dict[str, dict]:
+        """Stops intake and drains every stage; returns the final per-stage counts."""
+        if self._closed.is_set():
+            return self.snapshot()
+        self._closed.set()
+        if self._started:
+            first = self.stages[0]
+            for _ in range(first.workers):
+                first._queue.put(_STOP)
+            for thread in self._threads:
+                thread.join()
+        self.report()
+        return self.snapshot()
+
+    def __enter__(self) -> "Pipeline":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
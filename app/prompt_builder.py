@@ -0,0 +1,210 @@
+import os
+import re
+import json
+import threading
+from dataclasses import dataclass
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Token budget for the PDF excerpt in a prompt.
+PROMPT_TEXT_TOKENS = int(os.getenv("PROMPT_TEXT_TOKENS", "800"))
+# Share of the budget reserved for the opening block (court, bench, parties, citation)
+# and for the closing block (operative order); the rest goes to signal paragraphs.
+PROMPT_HEAD_SHARE = float(os.getenv("PROMPT_HEAD_SHARE", "0.45"))
+PROMPT_TAIL_SHARE = float(os.getenv("PROMPT_TAIL_SHARE", "0.25"))
+# Use the SDK's sentencepiece tokenizer (downloads the vocabulary once) instead of the heuristic.
+LOCAL_TOKENIZER = os.getenv("GEMINI_LOCAL_TOKENIZER", "false").lower() == "true"
+TOKENIZER_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# Scraped columns that carry nothing the model can use.
+PAYLOAD_SKIP_KEYS = {"S.No", "Judgement"}
+
+GAP_MARKER = "[...]"
+
+# Words and punctuation marks; count_tokens weighs each by its length.
+TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n|\n(?=\s*\d+\.\s)")
+# Paragraphs that usually carry extractable metadata
+_SIGNAL = re.compile(
+    r"\b(?:19|20)\d{2}\s+(?:[A-Z]\.?\s?){2,6}\d+\b"         # 2019 SCMR 123
+    r"|\b(?:PLD|PLJ)\s+(?:19|20)\d{2}\b"                    # PLD 2019 SC 1
+    r"|\bPresent\s*:|\bCoram\b|\bBench\b"
+    r"|\bDate\s+of\s+(?:hearing|decision|judgment|order)\b"
+    r"|\b(?:Appeal|Petition|Application|Reference|Suit)\s+No\b"
+    r"|-{2,}\s*(?:Appellant|Petitioner|Respondent|Applicant)"
+    r"|\bVersus\b",
+    re.I,
+)
+# Paragraphs that carry the outcome
+_OPERATIVE = re.compile(
+    r"\b(?:dismissed|allowed|accepted|disposed of|set aside|remanded|maintained|acquitted|"
+    r"order accordingly|announced|short order)\b",
+    re.I,
+)
+
+
+##################
+# Token counting
+##################
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+_tokenizer_failed = False
+
+
+def _local_tokenizer():
+    """The SDK's LocalTokenizer when enabled and importable (needs sentencepiece), else None."""
+    global _tokenizer, _tokenizer_failed
+    if not LOCAL_TOKENIZER or _tokenizer_failed:
+        return None
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            try:
+                from google.genai.local_tokenizer import LocalTokenizer
+                _tokenizer = LocalTokenizer(model_name=TOKENIZER_MODEL)
+            except Exception as e:
+                logger.warning(f"Local tokenizer unavailable, falling back to the heuristic: {e}")
+                _tokenizer_failed = True
+                return None
+        return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts tokens locally, without an API round trip.
+    - With GEMINI_LOCAL_TOKENIZER=true the SDK's sentencepiece tokenizer is exact.
+    - Otherwise words and punctuation are counted, long words as several pieces
+      (within ~10% of the real count on English legal text).
+    """
+    if not text:
+        return 0
+    tokenizer = _local_tokenizer()
+    if tokenizer is not None:
+        return tokenizer.count_tokens(text).total_tokens
+    return sum(1 + len(piece) // 8 for piece in TOKEN_PIECE.findall(text))
+
+
+###############
+# Payload
+###############
+
+def compact_payload(payload: dict) -> str:
+    """Single-line JSON of the useful, non-empty payload fields."""
+    useful = {
+        key: value.strip() if isinstance(value, str) else value
+        for key, value in payload.items()
+        if key not in PAYLOAD_SKIP_KEYS and value not in (None, "", "N/A", [], {})
+    }
+    return json.dumps(useful, ensure_ascii=False, separators=(",", ":"))
+
+
+###############
+# Text selection
+###############
+
+@dataclass
+class _Paragraph:
+    index: int
+    text: str
+    tokens: int
+
+
+def _paragraphs(text: str) -> list[_Paragraph]:
+    parts = [re.sub(r"[ \t]+", " ", p).strip() for p in _PARAGRAPH_SPLIT.split(text)]
+    return [_Paragraph(i, p, count_tokens(p)) for i, p in enumerate(q for q in parts if q)]
+
+
+def _clip(text: str, tokens: int, from_end: bool = False) -> str:
+    """Cuts text to about `tokens` tokens on a word boundary."""
+    pieces = list(re.finditer(r"\S+", text))
+    kept, used = [], 0
+    for match in (reversed(pieces) if from_end else pieces):
+        cost = count_tokens(match.group(0))
+        if used + cost > tokens:
+            break
+        kept.append(match.group(0))
+        used += cost
+    return " ".join(reversed(kept) if from_end else kept)
+
+
+def select_text(pdf_text: str, budget: int = PROMPT_TEXT_TOKENS) -> str:
+    """
+    Picks the parts of a judgment worth sending, within `budget` tokens.
+    - Head: the opening paragraphs (court, bench, parties, case number, citation).
+    - Tail: the closing paragraphs, where the operative order is.
+    - Middle: paragraphs with citations, dates, parties or the outcome, best first.
+    Segments keep document order and non-adjacent ones are joined with a gap marker.
+    """
+    if not pdf_text:
+        return ""
+    paragraphs = _paragraphs(pdf_text)
+    if sum(p.tokens for p in paragraphs) <= budget:
+        return "\n\n".join(p.text for p in paragraphs)
+
+    chosen: dict[int, str] = {}
+    used = 0
+
+    def take(paragraph: _Paragraph, limit: int, from_end: bool = False) -> bool:
+        nonlocal used
+        room = min(limit, budget - used)
+        if room <= 0:
+            return False
+        text = paragraph.text if paragraph.tokens <= room else _clip(paragraph.text, room, from_end)
+        if not text:
+            return False
+        chosen[paragraph.index] = text
+        used += min(paragraph.tokens, room)
+        return paragraph.tokens <= room
+
+    head_limit = int(budget * PROMPT_HEAD_SHARE)
+    for paragraph in paragraphs:
+        if used >= head_limit or not take(paragraph, head_limit - used):
+            break
+
+    tail_limit = int(budget * PROMPT_TAIL_SHARE)
+    tail_used = 0
+    for paragraph in reversed(paragraphs):
+        if paragraph.index in chosen or tail_used >= tail_limit:
+            break
+        before = used
+        complete = take(paragraph, tail_limit - tail_used, from_end=True)
+        tail_used += used - before
+        if not complete:
+            break
+
+    middle = [p for p in paragraphs if p.index not in chosen]
+    ranked = sorted(
+        middle,
+        key=lambda p: (-(bool(_OPERATIVE.search(p.text)) * 2 + bool(_SIGNAL.search(p.text))), p.index),
+    )
+    for paragraph in ranked:
+        if not (_OPERATIVE.search(paragraph.text) or _SIGNAL.search(paragraph.text)):
+            break
+        if paragraph.tokens <= budget - used:
+            take(paragraph, paragraph.tokens)
+
+    parts, previous = [], None
+    for index in sorted(chosen):
+        if previous is not None and index != previous + 1:
+            parts.append(GAP_MARKER)
+        parts.append(chosen[index])
+        previous = index
+    return "\n\n".join(parts)
+
+
+@dataclass
+class PromptStats:
+    """Prompt sizes sent this process, to watch the effect of the budget."""
+    calls: int = 0
+    tokens: int = 0
+
+    def record(self, tokens: int) -> None:
+        self.calls += 1
+        self.tokens += tokens
+
+    @property
+    def average(self) -> float:
+        return self.tokens / self.calls if self.calls else 0.0
+
+
+prompt_stats = PromptStats()
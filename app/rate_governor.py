@@ -0,0 +1,245 @@
+import os
+import time
+import random
+import sqlite3
+import asyncio
+import threading
+from typing import Optional
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Shared by every process on the machine that points at the same file.
+GOVERNOR_PATH = os.getenv("GEMINI_GOVERNOR_PATH", ".cache/gemini_governor.db")
+# Quota of the API key; 0 disables the corresponding bucket.
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+# Exponential backoff after 429/5xx: base * 2^(failures-1), capped, with +-50% jitter.
+BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "2"))
+BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "120"))
+# Consecutive transient failures (across all processes) that open the circuit, and how long it stays open.
+CIRCUIT_THRESHOLD = int(os.getenv("GEMINI_CIRCUIT_THRESHOLD", "8"))
+CIRCUIT_COOLDOWN = float(os.getenv("GEMINI_CIRCUIT_COOLDOWN", "60"))
+CIRCUIT_COOLDOWN_MAX = float(os.getenv("GEMINI_CIRCUIT_COOLDOWN_MAX", "900"))
+# How long the single half-open probe may take before another worker may probe.
+PROBE_TIMEOUT = 60.0
+# Adaptive rate: a 429 halves the allowed rate, every success wins back a step of it.
+MIN_RATE_FACTOR = 0.1
+RECOVERY_STEP = 0.05
+
+RATE_LIMITED_CODES = {429}
+OVERLOADED_CODES = {500, 502, 503, 504}
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """HTTP status of a google-genai APIError (or anything exposing code/status_code)."""
+    for attr in ("code", "status_code"):
+        code = getattr(error, attr, None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+class RateGovernor:
+    """
+    Rate limiter and circuit breaker shared by all analyzer processes through one SQLite file.
+    - Requests/minute and tokens/minute token buckets live in the file, so N processes
+      together stay under the key's quota instead of each assuming it owns all of it.
+    - 429/503 push a shared backoff deadline (exponential, jittered per process) and scale
+      the allowed rate down; successes scale it back up.
+    - After CIRCUIT_THRESHOLD consecutive failures the circuit opens and every worker pauses;
+      when it expires a single probe request decides whether to close it or reopen for longer.
+    """
+
+    def __init__(
+        self,
+        path: str = GOVERNOR_PATH,
+        rpm: int = GEMINI_RPM,
+        tpm: int = GEMINI_TPM,
+        circuit_threshold: int = CIRCUIT_THRESHOLD,
+    ):
+        self.path = path
+        self.rpm = rpm
+        self.tpm = tpm
+        self.circuit_threshold = circuit_threshold
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS governor (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                requests REAL NOT NULL,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                rate_factor REAL NOT NULL,
+                backoff_until REAL NOT NULL,
+                failures INTEGER NOT NULL,
+                circuit_until REAL NOT NULL,
+                circuit_cooldown REAL NOT NULL,
+                probe_until REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO governor VALUES (1, ?, ?, ?, 1.0, 0, 0, 0, ?, 0)",
+            (float(rpm), float(tpm), time.time(), CIRCUIT_COOLDOWN),
+        )
+
+    def _transaction(self, update):
+        """Runs update(state) -> result under an exclusive lock on the shared row and writes state back."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT requests, tokens, updated, rate_factor, backoff_until, failures, "
+                    "circuit_until, circuit_cooldown, probe_until FROM governor WHERE id = 1"
+                ).fetchone()
+                state = dict(zip(
+                    ("requests", "tokens", "updated", "rate_factor", "backoff_until", "failures",
+                     "circuit_until", "circuit_cooldown", "probe_until"),
+                    row,
+                ))
+                result = update(state)
+                self._conn.execute(
+                    "UPDATE governor SET requests = :requests, tokens = :tokens, updated = :updated, "
+                    "rate_factor = :rate_factor, backoff_until = :backoff_until, failures = :failures, "
+                    "circuit_until = :circuit_until, circuit_cooldown = :circuit_cooldown, "
+                    "probe_until = :probe_until WHERE id = 1",
+                    state,
+                )
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _refill(self, state: dict, now: float) -> None:
+        elapsed = max(0.0, now - state["updated"])
+        factor = state["rate_factor"]
+        if self.rpm > 0:
+            state["requests"] = min(self.rpm, state["requests"] + elapsed * self.rpm * factor / 60.0)
+        if self.tpm > 0:
+            state["tokens"] = min(self.tpm, state["tokens"] + elapsed * self.tpm * factor / 60.0)
+        state["updated"] = now
+
+    def reserve(self, tokens: int) -> float:
+        """Takes one request and `tokens` from the shared quota; returns 0, or the seconds to wait first."""
+        tokens = min(tokens, self.tpm) if self.tpm > 0 else 0
+
+        def update(state: dict) -> float:
+            now = time.time()
+            self._refill(state, now)
+            if state["circuit_until"] > now:
+                return state["circuit_until"] - now
+            half_open = state["failures"] >= self.circuit_threshold
+            if half_open and state["probe_until"] > now:
+                # Another worker is probing; wait for its verdict
+                return min(1.0, state["probe_until"] - now)
+            if state["backoff_until"] > now:
+                return state["backoff_until"] - now
+
+            waits = [0.0]
+            if self.rpm > 0 and state["requests"] < 1:
+                waits.append((1 - state["requests"]) / (self.rpm * state["rate_factor"] / 60.0))
+            if self.tpm > 0 and state["tokens"] < tokens:
+                waits.append((tokens - state["tokens"]) / (self.tpm * state["rate_factor"] / 60.0))
+            wait = max(waits)
+            if wait > 0:
+                return wait
+
+            if self.rpm > 0:
+                state["requests"] -= 1
+            if self.tpm > 0:
+                state["tokens"] -= tokens
+            if half_open:
+                state["probe_until"] = now + PROBE_TIMEOUT
+                logger.info("Gemini circuit half-open, sending a probe request.")
+            return 0.0
+
+        return self._transaction(update)
+
+    async def acquire(self, tokens: int) -> None:
+        # reserve() may block on the shared file's lock (up to its 30s timeout); keep that off the event loop
+        while True:
+            wait = await asyncio.to_thread(self.reserve, tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait + random.uniform(0, 0.1 * wait))
+
+    def acquire_sync(self, tokens: int) -> None:
+        while True:
+            wait = self.reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait + random.uniform(0, 0.1 * wait))
+
+    def record_usage(self, estimated_tokens: int, actual: Optional[int] = None) -> None:
+        """A request succeeded: close the circuit, regain rate and correct the token estimate with the billed count."""
+        def update(state: dict) -> None:
+            if state["failures"] >= self.circuit_threshold:
+                logger.info("Gemini circuit closed after a successful probe.")
+            state["failures"] = 0
+            state["probe_until"] = 0
+            state["circuit_cooldown"] = CIRCUIT_COOLDOWN
+            state["rate_factor"] = min(1.0, state["rate_factor"] + RECOVERY_STEP)
+            if self.tpm > 0 and actual:
+                state["tokens"] = min(self.tpm, state["tokens"] + estimated_tokens - actual)
+
+        self._transaction(update)
+
+    def record_failure(self, error: Exception) -> bool:
+        """
+        Registers a failed request. Returns True for quota/overload errors (429/5xx), which
+        back off every process; other errors (bad output, auth) leave the shared state alone.
+        """
+        code = _status_code(error)
+        if code not in RATE_LIMITED_CODES and code not in OVERLOADED_CODES:
+            return False
+
+        def update(state: dict) -> None:
+            now = time.time()
+            state["failures"] += 1
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (state["failures"] - 1)) * random.uniform(0.5, 1.5)
+            state["backoff_until"] = max(state["backoff_until"], now + delay)
+            if code in RATE_LIMITED_CODES:
+                state["rate_factor"] = max(MIN_RATE_FACTOR, state["rate_factor"] * 0.5)
+            if state["failures"] >= self.circuit_threshold:
+                # The circuit supersedes the backoff, so the probe can go out as soon as it expires
+                state["circuit_until"] = now + state["circuit_cooldown"]
+                state["backoff_until"] = 0
+                state["probe_until"] = 0
+                logger.warning(
+                    f"Gemini circuit open for {state['circuit_cooldown']:.0f}s after "
+                    f"{state['failures']} consecutive failures (last: HTTP {code})."
+                )
+                state["circuit_cooldown"] = min(CIRCUIT_COOLDOWN_MAX, state["circuit_cooldown"] * 2)
+            else:
+                logger.warning(f"Gemini returned HTTP {code}, all workers back off {delay:.1f}s.")
+
+        self._transaction(update)
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def retry_delay(attempt: int) -> float:
+    """Jittered exponential delay for errors that don't involve the governor (e.g. unparseable output)."""
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+
+
+_shared_governor: Optional[RateGovernor] = None
+_shared_governor_lock = threading.Lock()
+
+
+def get_rate_governor() -> RateGovernor:
+    """Returns the process-wide governor (each process opens the shared file once)."""
+    global _shared_governor
+    with _shared_governor_lock:
+        if _shared_governor is None:
+            _shared_governor = RateGovernor()
+        return _shared_governor
@@ -12,7 +12,7 @@ from selenium.common.exceptions import StaleElementReferenceException, TimeoutEx
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from service import store_batch_records, store_raw_metadata
+from service import start_crawl_pipeline, store_raw_metadata
 
 def _build_driver_attach():
     """Attach to an existing Edge window (opened with --remote-debugging-port=9222)."""
@@ -21,7 +21,8 @@ def _build_driver_attach():
     return webdriver.Edge(options=options)
 
 
-def crawl_attached(start: int | None = None, end: int | None = None, save_interval: int = 20):
+def crawl_attached(start: int | None = None, end: int | None = None, save_interval: int = 20,
+                   cache_mode: str | None = None):
     driver = _build_driver_attach()
     print("Attached to existing Edge session!")
     print("Current URL:", driver.current_url)
@@ -32,7 +33,8 @@ def crawl_attached(start: int | None = None, end: int | None = None, save_interv
     delimiter = '[COLEND;]'
     
     metadata_id = store_raw_metadata(driver.current_url, delimiter, fieldnames)
-    new_batch = []
+    # Downloads, text extraction, DB writes and Gemini run behind the browser in their own stages
+    pipeline = start_crawl_pipeline(metadata_id, "Judgement", save_interval=save_interval, cache_mode=cache_mode)
 
     current_year = time.localtime().tm_year
     start_year = start if isinstance(start, int) and start > 0 else 1955
@@ -43,6 +45,19 @@ def crawl_attached(start: int | None = None, end: int | None = None, save_interv
 
     print(f"Processing years from {start_year} to {end_year}...")
 
+    try:
+        _crawl_years(driver, actions, pipeline, start_year, end_year)
+    finally:
+        # Also on Ctrl+C: rows already scraped are still downloaded, stored and analysed
+        print("\nWaiting for the pipeline to drain...")
+        pipeline.close()
+
+    print("\nCrawling complete.")
+    input("\nPress ENTER to detach (browser will stay open)...")
+    driver.quit()
+
+
+def _crawl_years(driver, actions, pipeline, start_year: int, end_year: int):
     for year in range(start_year, end_year + 1):
         print(f"\nProcessing year {year}...")
         try:
@@ -94,17 +109,12 @@ def crawl_attached(start: int | None = None, end: int | None = None, save_interv
                             "Judgement": pdf_link or "N/A",
                         }
 
-                        new_batch.append(record)
+                        pipeline.put(record)
 
                         # Small scroll for lazy loading
                         actions.scroll_by_amount(0, 150).perform()
                         time.sleep(0.5)
 
-                        if len(new_batch) >= save_interval:
-                            records_to_store = new_batch.copy()
-                            store_batch_records(metadata_id, records_to_store, "Judgement")
-                            new_batch.clear()
-
                         break  # exit retry loop if success
 
                     except StaleElementReferenceException:
@@ -123,14 +133,6 @@ def crawl_attached(start: int | None = None, end: int | None = None, save_interv
         print(f"Completed year {year}. Waiting before next...")
         time.sleep(5)
 
-    if new_batch:
-        store_batch_records(metadata_id, new_batch, "Judgement")
-        print(f"Final save: {len(new_batch)} records written.")
-        new_batch.clear()
-
-    print("\nCrawling complete.")
-    input("\nPress ENTER to detach (browser will stay open)...")
-    driver.quit()
 
 
 
@@ -138,13 +140,60 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Attach to an existing Edge (port 9222) and crawl by year range")
     parser.add_argument("--start", type=int, help="Start year (e.g., 1947)")
     parser.add_argument("--end", type=int, help="End year (e.g., 1970)")
-    parser.add_argument("--save-interval", type=int, default=20, help="How many rows to buffer before saving")
+    parser.add_argument("--save-interval", type=int, default=20, help="How many rows are stored per database batch")
     parser.add_argument("--parse", type=bool, default=False, help="Whether to parse the downloaded PDFs (default: False)")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Pending documents to parse/queue (default: the whole remaining backlog)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Analyzer processes sharing the pending backlog when parsing (default: 1)")
+    parser.add_argument("--llm-cache", choices=["use", "refresh", "bypass"], default=None,
+                        help="Gemini result cache when parsing: use, refresh or bypass (default: LLM_CACHE_MODE or use)")
+    parser.add_argument("--submit-batch", action="store_true",
+                        help="Queue the PDFs for a deferred Gemini batch job instead of parsing them now")
+    parser.add_argument("--collect-batch", action="store_true",
+                        help="Collect finished Gemini batch jobs into the LLM cache")
+    parser.add_argument("--chunk", action="store_true",
+                        help="Split parsed documents that have no chunks yet into chunks (--limit caps the documents)")
+    parser.add_argument("--embed", action="store_true",
+                        help="Embed chunks that have no embedding yet into the vector index (--limit caps the chunks)")
+    parser.add_argument("--reembed", action="store_true",
+                        help="Re-embed chunks whose embedding model/version differ from EMBEDDING_MODEL/EMBEDDING_VERSION")
+    parser.add_argument("--search", type=str, default=None,
+                        help="Full-text search the parsed judgments and print the best matches (--limit caps them)")
 
     args = parser.parse_args()
-    if not args.parse:
-        crawl_attached(start=args.start, end=args.end, save_interval=args.save_interval)
+    if args.submit_batch or args.collect_batch:
+        from analyzer import collect_extraction_jobs, submit_extraction_job
+        if args.collect_batch:
+            collect_extraction_jobs()
+        if args.submit_batch:
+            submit_extraction_job(inserted_record_count=args.limit)
+
+    elif args.chunk:
+        from chunker import chunk_documents
+        chunk_documents(limit=args.limit)
+
+    elif args.search:
+        from search import search_documents
+        for hit in search_documents(args.search, limit=args.limit or 20):
+            print(f"{hit.score:.3f}  {hit.reference_id} ({hit.year}, {hit.doc_type})  {hit.title}")
+            print(f"       {' '.join(hit.snippet.split())}")
+
+    elif args.reembed:
+        from indexer import reembed_chunks
+        reembed_chunks(limit=args.limit)
+
+    elif args.embed:
+        from indexer import index_chunks
+        index_chunks(limit=args.limit)
+
+    elif not args.parse:
+        crawl_attached(start=args.start, end=args.end, save_interval=args.save_interval, cache_mode=args.llm_cache)
     
+    elif args.workers > 1:
+        from worker import run_workers
+        run_workers(args.workers, cache_mode=args.llm_cache)
+
     else:
         from analyzer import process_raw_documents
-        process_raw_documents(metadata_id=4, inserted_record_count=10)
+        process_raw_documents(inserted_record_count=args.limit, cache_mode=args.llm_cache)
@@ -0,0 +1,150 @@
+import re
+from dataclasses import dataclass
+from typing import Optional, Union
+from sqlalchemy import desc, func, literal_column, select, table, column
+from app.database import get_session
+from app.models import Document, TextBlob
+from app.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Text search configuration of the tsvector trigger (see the full-text search migration).
+PG_SEARCH_CONFIG = "english"
+# ts_rank_cd normalization: 1 divides by 1 + log(document length), 32 scales the rank into [0, 1).
+PG_RANK_NORMALIZATION = 1 | 32
+PG_HEADLINE_OPTIONS = "StartSel=[, StopSel=], MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter= … "
+# BM25 weights of the FTS5 columns: title, reference/citation, body.
+FTS5_WEIGHTS = (10.0, 5.0, 1.0)
+SNIPPET_TOKENS = 24
+
+_QUERY_TERM = re.compile(r'-?"[^"]*"|\S+')
+
+_fts = table("documents_fts", column("rowid"))
+
+
+@dataclass
+class SearchHit:
+    document_id: int
+    reference_id: str
+    title: str
+    year: int
+    doc_type: str
+    jurisdiction: str
+    score: float
+    snippet: str
+
+
+def _fts5_query(query: str) -> Optional[str]:
+    """
+    Web-search style query in FTS5 syntax: words and "quoted phrases" are ANDed,
+    OR between terms, -term excludes and a trailing * matches prefixes.
+    Every term is quoted, so punctuation in citations can't break the query. None if nothing to match.
+    """
+    positive, negative = [], []
+    for term in _QUERY_TERM.findall(query):
+        if term == "OR":
+            if positive and positive[-1] != "OR":
+                positive.append("OR")
+            continue
+        target = negative if term.startswith("-") and len(term) > 1 else positive
+        term = term[1:] if target is negative else term
+        prefix = term.endswith("*")
+        words = term.strip('"*').replace('"', '""')
+        if words.strip():
+            target.append(f'"{words}"' + ("*" if prefix else ""))
+    while positive and positive[-1] == "OR":
+        positive.pop()
+    if not positive:
+        return None
+    return " ".join(positive) + "".join(f" NOT {term}" for term in negative)
+
+
+def _filters(year, year_from, year_to, doc_type, jurisdiction) -> list:
+    filters = []
+    if year is not None:
+        filters.append(Document.year == year)
+    if year_from is not None:
+        filters.append(Document.year >= year_from)
+    if year_to is not None:
+        filters.append(Document.year <= year_to)
+    for col, value in ((Document.doc_type, doc_type), (Document.jurisdiction, jurisdiction)):
+        if isinstance(value, str):
+            filters.append(col == value)
+        elif value:
+            filters.append(col.in_(list(value)))
+    return filters
+
+
+def _search_postgres(session, query: str, filters: list, limit: int, offset: int) -> list[SearchHit]:
+    tsquery = func.websearch_to_tsquery(PG_SEARCH_CONFIG, query)
+    vector = literal_column("documents.search_vector")
+    score = func.ts_rank_cd(vector, tsquery, PG_RANK_NORMALIZATION).label("score")
+    top = (
+        select(Document.id, Document.reference_id, Document.title, Document.year, Document.doc_type,
+               Document.jurisdiction, Document.raw_content_sha256, score)
+        .where(vector.op("@@")(tsquery), *filters)
+        .order_by(desc("score"), Document.id)
+        .limit(limit)
+        .offset(offset)
+        .subquery()
+    )
+    # Headlines re-parse the text, so they are only built for the page of hits
+    snippet = func.ts_headline(PG_SEARCH_CONFIG, TextBlob.content, tsquery, PG_HEADLINE_OPTIONS).label("snippet")
+    rows = session.execute(
+        select(top.c.id, top.c.reference_id, top.c.title, top.c.year, top.c.doc_type,
+               top.c.jurisdiction, top.c.score, snippet)
+        .join(TextBlob, TextBlob.sha256 == top.c.raw_content_sha256)
+        .order_by(top.c.score.desc(), top.c.id)
+    ).all()
+    return [SearchHit(*row) for row in rows]
+
+
+def _search_sqlite(session, query: str, filters: list, limit: int, offset: int) -> list[SearchHit]:
+    match = _fts5_query(query)
+    if match is None:
+        return []
+    fts = literal_column("documents_fts")
+    bm25 = func.bm25(fts, *FTS5_WEIGHTS)
+    rows = session.execute(
+        select(Document.id, Document.reference_id, Document.title, Document.year, Document.doc_type,
+               Document.jurisdiction, (-bm25).label("score"),
+               func.snippet(fts, -1, "[", "]", " … ", SNIPPET_TOKENS).label("snippet"))
+        .select_from(_fts)
+        .join(Document, Document.id == _fts.c.rowid)
+        .where(fts.op("MATCH")(match), *filters)
+        # bm25() is lower-is-better
+        .order_by(bm25, Document.id)
+        .limit(limit)
+        .offset(offset)
+    ).all()
+    return [SearchHit(*row) for row in rows]
+
+
+def search_documents(
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    year: Optional[int] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    doc_type: Optional[Union[str, list[str]]] = None,
+    jurisdiction: Optional[Union[str, list[str]]] = None,
+) -> list[SearchHit]:
+    """
+    Full-text search over judgments, best match first.
+    - `query` takes web-search syntax: words, "exact phrases", OR and -excluded terms.
+    - PostgreSQL ranks the weighted tsvector (title > reference/citation > text) with ts_rank_cd;
+      SQLite ranks the FTS5 index with BM25. Higher scores are better on both.
+    - Results can be narrowed by year (or a year range), doc_type and jurisdiction (a value or a list).
+    - Each hit carries a snippet of the text with the matches in [brackets].
+    """
+    if not query or not query.strip():
+        return []
+    filters = _filters(year, year_from, year_to, doc_type, jurisdiction)
+    with get_session() as session:
+        dialect = session.get_bind().dialect.name
+        if dialect == "postgresql":
+            return _search_postgres(session, query, filters, limit, offset)
+        if dialect == "sqlite":
+            return _search_sqlite(session, query, filters, limit, offset)
+    raise NotImplementedError(f"Full-text search is not available on {dialect}")
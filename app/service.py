@@ -2,10 +2,19 @@ from sqlalchemy import String, select
 from sqlalchemy.exc import IntegrityError
 from app.database import get_session
 from app.models import MetadataRaw, RawDocument
-from app.pdf_collector import fetch_pdf_text
+from app.pdf_collector import (
+    MAX_CONCURRENCY,
+    _download_pdf,
+    _extract_pdf_text,
+    fetch_pdf_texts,
+    get_extraction_executor,
+)
+from app.pipeline import Pipeline, Stage
 from app.logger_config import get_logger
+from typing import Optional
 import json
-from app.analyzer import process_raw_documents
+import os
+from app.analyzer import ANALYZER_BATCH_SIZE, _extract_batch, _store_batch, process_raw_documents
 
 logger = get_logger(__name__)
 
@@ -86,24 +95,33 @@ def store_batch_records(metadata_id: int, data: list[dict], pdf_link_key: str):
     """
 
     try:
-        processed = []
+        to_fetch = []
         for record in data:
-            try:
-                pdf_url = record.get(pdf_link_key)
-                if not pdf_url:
-                    raise ValueError(f"Missing PDF URL in record (key='{pdf_link_key}')")
-
-                logger.info(f"Fetching PDF for record: {pdf_url}")
-                pdf_info = fetch_pdf_text(pdf_url)
-                logger.info(f"Extracted {pdf_info.pages} pages from PDF: {pdf_url}")
-
-                processed.append({
-                    "payload": json.dumps(record),
-                    "pdf_uri": pdf_url,
-                    "pdf_raw": pdf_info.text,
-                })
-            except Exception as e:
-                logger.warning(f"Skipping record due to PDF error: {e}")
+            pdf_url = record.get(pdf_link_key)
+            if not pdf_url:
+                logger.warning(
+                    f"Skipping record due to PDF error: Missing PDF URL in record (key='{pdf_link_key}')"
+                )
+                continue
+            to_fetch.append((record, pdf_url))
+
+        logger.info(f"Fetching {len(to_fetch)} PDFs for metadata_id={metadata_id}")
+        results = fetch_pdf_texts(
+            [pdf_url for _, pdf_url in to_fetch], executor=get_extraction_executor()
+        )
+
+        processed = []
+        for (record, pdf_url), pdf_info in zip(to_fetch, results):
+            if isinstance(pdf_info, Exception):
+                logger.warning(f"Skipping record due to PDF error: {pdf_info}")
+                continue
+
+            logger.info(f"Extracted {pdf_info.pages} pages from PDF: {pdf_url}")
+            processed.append({
+                "payload": json.dumps(record),
+                "pdf_uri": pdf_url,
+                "pdf_raw": pdf_info.text,
+            })
 
         with get_session() as session:
             for entry in processed:
@@ -124,4 +142,100 @@ def store_batch_records(metadata_id: int, data: list[dict], pdf_link_key: str):
         
 
     except Exception as e:
-        logger.exception(f"Failed to store batch records for metadata_id={metadata_id}: {e}")
\ No newline at end of file
+        logger.exception(f"Failed to store batch records for metadata_id={metadata_id}: {e}")
+
+
+###################
+# Crawl pipeline
+###################
+
+# Threads per stage of the crawl pipeline.
+PIPELINE_DOWNLOAD_WORKERS = int(os.getenv("PIPELINE_DOWNLOAD_WORKERS", str(MAX_CONCURRENCY)))
+PIPELINE_LLM_WORKERS = int(os.getenv("PIPELINE_LLM_WORKERS", "2"))
+
+
+def start_crawl_pipeline(metadata_id: int, pdf_link_key: str, save_interval: int = 20,
+                         cache_mode: Optional[str] = None) -> Pipeline:
+    """
+    Starts the staged pipeline behind the crawler and returns it; put() scraped rows into it
+    and close() it when the crawl ends (it drains everything still in flight).
+    Stages: download -> extract text -> persist raw -> LLM extract -> persist document,
+    so the browser keeps scraping while earlier rows are downloaded, parsed and analysed.
+    A batch the persist stages fail to save is retried row by row, so one bad row
+    does not drop the rows saved with it.
+    """
+    executor = get_extraction_executor()
+
+    def download(record: dict):
+        pdf_url = record.get(pdf_link_key)
+        if not pdf_url or pdf_url == "N/A":
+            logger.warning(f"Skipping record due to PDF error: Missing PDF URL in record (key='{pdf_link_key}')")
+            return None
+        try:
+            return record, pdf_url, _download_pdf(pdf_url)
+        except Exception as e:
+            logger.warning(f"Skipping record due to PDF error: {e}")
+            return None
+
+    def extract_text(batch: list[tuple]) -> list[tuple]:
+        try:
+            if executor is not None:
+                results = executor.extract_many([(pdf_url, body) for _, pdf_url, body in batch])
+            else:
+                results = []
+                for _, pdf_url, body in batch:
+                    try:
+                        results.append(_extract_pdf_text(pdf_url, body))
+                    except Exception as e:
+                        results.append(e)
+        finally:
+            for _, _, body in batch:
+                body.close()
+
+        extracted = []
+        for (record, pdf_url, _), pdf_info in zip(batch, results):
+            if isinstance(pdf_info, Exception):
+                logger.warning(f"Skipping record due to PDF error: {pdf_info}")
+                continue
+            logger.info(f"Extracted {pdf_info.pages} pages from PDF: {pdf_url}")
+            extracted.append((record, pdf_url, pdf_info.text))
+        return extracted
+
+    def persist_raw(batch: list[tuple]) -> list[int]:
+        with get_session() as session:
+            docs = [
+                RawDocument(metadata_id=metadata_id, payload=json.dumps(record), pdf_uri=pdf_url, pdf_raw=text)
+                for record, pdf_url, text in batch
+            ]
+            session.add_all(docs)
+            session.flush()
+            ids = [doc.id for doc in docs]
+        logger.info(f"Stored {len(ids)} raw documents successfully for metadata_id={metadata_id}")
+        return ids
+
+    def llm_extract(raw_ids: list[int]) -> list[tuple]:
+        with get_session() as session:
+            raw_docs = session.scalars(
+                select(RawDocument)
+                .options(RawDocument.pdf_raw.loader())
+                .where(RawDocument.id.in_(raw_ids))
+                .order_by(RawDocument.id)
+            ).all()
+            return [(raw_doc.id, extracted) for raw_doc, extracted in _extract_batch(raw_docs, cache_mode)]
+
+    def persist_document(batch: list[tuple]) -> None:
+        outcomes = dict(batch)
+        with get_session() as session:
+            raw_docs = session.scalars(select(RawDocument).where(RawDocument.id.in_(list(outcomes)))).all()
+            _store_batch(session, [(raw_doc, outcomes[raw_doc.id]) for raw_doc in raw_docs])
+
+    extract_batch = executor.workers if executor is not None else 1
+    return Pipeline([
+        Stage("download", download, workers=PIPELINE_DOWNLOAD_WORKERS),
+        Stage("extract_text", extract_text, batch_size=extract_batch, batch_timeout=1.0),
+        Stage("persist_raw", persist_raw, batch_size=save_interval, retry_items=True),
+        Stage("llm_extract", llm_extract, workers=PIPELINE_LLM_WORKERS, batch_size=ANALYZER_BATCH_SIZE),
+        Stage("persist_document", persist_document, batch_size=ANALYZER_BATCH_SIZE, batch_timeout=1.0,
+              retry_items=True),
+    ]).start()
+
@@ -0,0 +1,459 @@
+import os
+import json
+import glob
+import shutil
+import threading
+from dataclasses import dataclass
+from typing import Optional
+from embeddings import np, require_numpy
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", ".cache/vectors")
+# float16 halves disk and page cache at a small cost in precision; scores are computed in float32.
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+# IVF lists scanned per query; more is slower and closer to the exact answer.
+VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "8"))
+# Rows scored per matrix product during a brute-force scan, to bound temporary memory.
+VECTOR_SEARCH_BLOCK = int(os.getenv("VECTOR_SEARCH_BLOCK", "65536"))
+
+MANIFEST = "manifest.json"
+
+
+@dataclass
+class _View:
+    """One consistent snapshot of the store; searches keep using it while a newer one is loaded."""
+    manifest: dict
+    ids: "np.ndarray"
+    vectors: "np.ndarray"
+    live: "np.ndarray"
+    sorted_ids: "np.ndarray"
+    sorted_rows: "np.ndarray"
+    centroids: Optional["np.ndarray"] = None
+    ivf_rows: Optional["np.ndarray"] = None
+    ivf_offsets: Optional["np.ndarray"] = None
+
+    @property
+    def count(self) -> int:
+        return self.manifest["count"]
+
+
+class VectorStore:
+    """
+    Chunk embeddings in memory-mapped files, searched with NumPy.
+    - Row i of `<gen>-vectors.bin` is the vector of chunk `<gen>-ids.bin`[i]; vectors are L2-normalized,
+      so scores are cosine similarities.
+    - append() only adds bytes past the rows the manifest counts, then rewrites the manifest
+      atomically; readers (also in other processes, after refresh()) never see a half-written row.
+    - Re-appended or deleted chunks leave tombstoned rows behind until compact() rewrites the
+      live rows into a new generation.
+    - build_ivf() adds a coarse-quantized index; rows appended later are scanned exhaustively
+      until it is rebuilt.
+    """
+
+    def __init__(self, root: str = VECTOR_STORE_DIR, dtype: str = VECTOR_DTYPE):
+        require_numpy()
+        self.root = root
+        self.dtype = dtype
+        self._write_lock = threading.Lock()
+        self._view: Optional[_View] = None
+        os.makedirs(root, exist_ok=True)
+        self.refresh()
+
+    ###############
+    # Files
+    ###############
+
+    def _path(self, generation: int, name: str) -> str:
+        return os.path.join(self.root, f"{generation:06d}-{name}.bin")
+
+    def _read_manifest(self) -> dict:
+        path = os.path.join(self.root, MANIFEST)
+        if not os.path.exists(path):
+            return {"generation": 0, "dim": None, "dtype": self.dtype, "count": 0, "deleted": 0,
+                    "model": None, "version": None, "ivf": None}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: dict) -> None:
+        path = os.path.join(self.root, MANIFEST)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _map(self, generation: int, name: str, dtype, rows: int, dim: Optional[int] = None):
+        shape = (rows, dim) if dim else (rows,)
+        if rows == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._path(generation, name), dtype=dtype, mode="r", shape=shape)
+
+    def _append_file(self, generation: int, name: str, keep_bytes: int, data) -> None:
+        """Appends after the first `keep_bytes` bytes, dropping whatever an interrupted append left there."""
+        path = self._path(generation, name)
+        with open(path, "ab") as f:
+            f.truncate(keep_bytes)
+            f.write(np.ascontiguousarray(data).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def refresh(self) -> "VectorStore":
+        """Picks up changes written since the store was opened (e.g. by another process)."""
+        manifest = self._read_manifest()
+        current = self._view.manifest if self._view is not None else None
+        if manifest == current:
+            return self
+        g, n, dim = manifest["generation"], manifest["count"], manifest["dim"]
+        ids = self._map(g, "ids", np.int64, n)
+        live = np.ones(n, dtype=bool)
+        live[self._map(g, "deleted", np.int64, manifest["deleted"])] = False
+        live_rows = np.flatnonzero(live)
+        order = np.argsort(ids[live_rows], kind="stable")
+        view = _View(
+            manifest=manifest,
+            ids=ids,
+            vectors=self._map(g, "vectors", manifest["dtype"], n, dim) if dim else np.zeros((0, 0), np.float32),
+            live=live,
+            sorted_ids=np.asarray(ids[live_rows][order]),
+            sorted_rows=live_rows[order],
+        )
+        ivf = manifest.get("ivf")
+        if ivf:
+            view.centroids = self._map(g, "ivf-centroids", np.float32, ivf["nlist"], dim)
+            view.ivf_rows = self._map(g, "ivf-rows", np.int64, ivf["rows"])
+            view.ivf_offsets = self._map(g, "ivf-offsets", np.int64, ivf["nlist"] + 1)
+        self._view = view
+        return self
+
+    ###############
+    # Properties
+    ###############
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._view.manifest["dim"]
+
+    @property
+    def model(self) -> Optional[str]:
+        return self._view.manifest["model"]
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._view.manifest["version"]
+
+    def __len__(self) -> int:
+        return len(self._view.sorted_ids)
+
+    def stats(self) -> dict:
+        """Rows on disk, live rows, and rows covered by the IVF index."""
+        manifest = self._view.manifest
+        return {
+            "rows": manifest["count"],
+            "live": len(self),
+            "ivf_rows": manifest["ivf"]["rows"] if manifest.get("ivf") else 0,
+        }
+
+    def _rows_of(self, view: _View, chunk_ids) -> "np.ndarray":
+        """Live rows of the given chunk ids (-1 where a chunk has no vector)."""
+        chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        rows = np.full(len(chunk_ids), -1, dtype=np.int64)
+        if len(view.sorted_ids):
+            pos = np.minimum(np.searchsorted(view.sorted_ids, chunk_ids), len(view.sorted_ids) - 1)
+            found = view.sorted_ids[pos] == chunk_ids
+            rows[found] = view.sorted_rows[pos[found]]
+        return rows
+
+    def chunk_ids(self) -> "np.ndarray":
+        """Ids of the chunks with a live vector, ascending."""
+        return self._view.sorted_ids
+
+    def contains(self, chunk_ids) -> "np.ndarray":
+        """Whether each of the given chunks has a live vector."""
+        return self._rows_of(self._view, chunk_ids) >= 0
+
+    def get(self, chunk_ids) -> "np.ndarray":
+        """Vectors of the given chunks as float32; rows of chunks without a vector are zero."""
+        view = self._view
+        rows = self._rows_of(view, chunk_ids)
+        out = np.zeros((len(rows), view.manifest["dim"] or 0), dtype=np.float32)
+        present = rows >= 0
+        out[present] = view.vectors[rows[present]]
+        return out
+
+    ###############
+    # Writes
+    ###############
+
+    def _check_model(self, manifest: dict, dim: int, model: Optional[str], version: Optional[str]) -> None:
+        if manifest["dim"] is not None and manifest["dim"] != dim:
+            raise ValueError(f"Vector store holds {manifest['dim']}-d vectors, got {dim}-d")
+        if manifest["count"] and (model, version) != (manifest["model"], manifest["version"]):
+            raise ValueError(
+                f"Vector store holds {manifest['model']} v{manifest['version']} vectors, got {model} v{version}; "
+                "re-embed the store instead of mixing models"
+            )
+
+    def append(self, chunk_ids, vectors, model: Optional[str] = None, version: Optional[str] = None) -> int:
+        """Adds (or replaces) the vectors of the given chunks; returns how many rows were written."""
+        chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(chunk_ids) != len(vectors):
+            raise ValueError("chunk_ids and vectors differ in length")
+        if not len(chunk_ids):
+            return 0
+        # A chunk given twice keeps its last vector
+        _, last = np.unique(chunk_ids[::-1], return_index=True)
+        keep = np.sort(len(chunk_ids) - 1 - last)
+        chunk_ids, vectors = chunk_ids[keep], vectors[keep]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        with self._write_lock:
+            self.refresh()
+            view = self._view
+            manifest = dict(view.manifest)
+            self._check_model(manifest, vectors.shape[1], model, version)
+            if manifest["dim"] is None:
+                manifest.update(dim=int(vectors.shape[1]), dtype=self.dtype)
+            if not manifest["count"]:
+                manifest.update(model=model, version=version)
+            g, n, dtype = manifest["generation"], manifest["count"], np.dtype(manifest["dtype"])
+
+            replaced = self._rows_of(view, chunk_ids)
+            replaced = replaced[replaced >= 0]
+            self._append_file(g, "vectors", n * manifest["dim"] * dtype.itemsize, vectors.astype(dtype))
+            self._append_file(g, "ids", n * 8, chunk_ids)
+            if len(replaced):
+                self._append_file(g, "deleted", manifest["deleted"] * 8, replaced.astype(np.int64))
+            manifest["count"] = n + len(chunk_ids)
+            manifest["deleted"] += len(replaced)
+            self._write_manifest(manifest)
+            self.refresh()
+        return len(chunk_ids)
+
+    def delete(self, chunk_ids) -> int:
+        """Tombstones the vectors of the given chunks; returns how many were live."""
+        with self._write_lock:
+            self.refresh()
+            rows = self._rows_of(self._view, chunk_ids)
+            rows = np.unique(rows[rows >= 0])
+            if not len(rows):
+                return 0
+            manifest = dict(self._view.manifest)
+            self._append_file(manifest["generation"], "deleted", manifest["deleted"] * 8, rows.astype(np.int64))
+            manifest["deleted"] += len(rows)
+            self._write_manifest(manifest)
+            self.refresh()
+        return len(rows)
+
+    def _write_generation(self, blocks, dim: int, model: Optional[str], version: Optional[str],
+                          nlist: Optional[int] = None) -> None:
+        """
+        Writes (chunk_ids, vectors) blocks as a complete new generation, then switches the manifest
+        to it in one rename; until then readers keep using the current generation.
+        """
+        g = self._view.manifest["generation"] + 1
+        dtype = np.dtype(self.dtype)
+        for name in ("vectors", "ids", "deleted"):
+            open(self._path(g, name), "wb").close()
+        count = 0
+        for chunk_ids, vectors in blocks:
+            self._append_file(g, "vectors", count * dim * dtype.itemsize, np.asarray(vectors, dtype=np.float32).astype(dtype))
+            self._append_file(g, "ids", count * 8, np.asarray(chunk_ids, dtype=np.int64))
+            count += len(chunk_ids)
+        new = {"generation": g, "dim": dim, "dtype": dtype.name, "count": count, "deleted": 0,
+               "model": model, "version": version, "ivf": None}
+        if nlist and count:
+            new["ivf"] = self._write_ivf(g, self._map(g, "vectors", dtype, count, dim), nlist)
+        self._write_manifest(new)
+        self.refresh()
+        self._remove_stale()
+
+    def _remove_stale(self) -> None:
+        """Deletes files of older generations (ones still mapped elsewhere go on the next compaction)."""
+        current = f"{self._view.manifest['generation']:06d}-"
+        for path in glob.glob(os.path.join(self.root, "*.bin")):
+            if not os.path.basename(path).startswith(current):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def swap_in(self, staging: "VectorStore") -> None:
+        """
+        Makes the rows of `staging` (built alongside, e.g. under a new embedding model) this store's
+        next generation: its files are moved over and the manifest switched in one rename, so
+        searches see either all old or all new vectors. The staging store is removed.
+        """
+        with self._write_lock:
+            self.refresh()
+            staged = staging.refresh()._view.manifest
+            g = self._view.manifest["generation"] + 1
+            names = ["vectors", "ids", "deleted"]
+            if staged.get("ivf"):
+                names += ["ivf-centroids", "ivf-rows", "ivf-offsets"]
+            for name in names:
+                source = staging._path(staged["generation"], name)
+                if os.path.exists(source):
+                    os.replace(source, self._path(g, name))
+                else:
+                    open(self._path(g, name), "wb").close()
+            self._write_manifest(dict(staged, generation=g))
+            self.refresh()
+            self._remove_stale()
+        shutil.rmtree(staging.root, ignore_errors=True)
+        logger.info(f"Swapped in {len(self)} {self.model} v{self.version} vectors.")
+
+    def compact(self) -> int:
+        """Rewrites the live rows, in chunk id order, into a new generation; returns the rows dropped."""
+        with self._write_lock:
+            self.refresh()
+            view = self._view
+            manifest = view.manifest
+            dropped = manifest["count"] - len(view.sorted_ids)
+            ivf = manifest.get("ivf")
+            blocks = (
+                (view.sorted_ids[start:start + VECTOR_SEARCH_BLOCK],
+                 view.vectors[view.sorted_rows[start:start + VECTOR_SEARCH_BLOCK]])
+                for start in range(0, len(view.sorted_rows), VECTOR_SEARCH_BLOCK)
+            )
+            self._write_generation(blocks, manifest["dim"], manifest["model"], manifest["version"],
+                                   nlist=ivf["nlist"] if ivf else None)
+        logger.info(f"Compacted vector store: {len(self)} rows kept, {dropped} dropped.")
+        return dropped
+
+    ###############
+    # IVF
+    ###############
+
+    def _assign(self, vectors, centroids) -> "np.ndarray":
+        """Nearest centroid of each row, VECTOR_SEARCH_BLOCK rows at a time."""
+        out = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), VECTOR_SEARCH_BLOCK):
+            block = np.asarray(vectors[start:start + VECTOR_SEARCH_BLOCK], dtype=np.float32)
+            out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return out
+
+    def _write_ivf(self, generation: int, vectors, nlist: int, iterations: int = 10,
+                   sample_size: int = 100_000) -> dict:
+        """Spherical k-means on a sample, then every row filed under its nearest centroid."""
+        rng = np.random.default_rng(0)
+        n = len(vectors)
+        nlist = max(1, min(nlist, n))
+        sample = np.asarray(vectors[np.sort(rng.choice(n, size=min(n, sample_size), replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = ~np.bincount(assign, minlength=nlist).astype(bool)
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        assign = self._assign(vectors, centroids)
+        rows = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assign[rows], np.arange(nlist + 1)).astype(np.int64)
+        for name, data in (("ivf-centroids", centroids), ("ivf-rows", rows), ("ivf-offsets", offsets)):
+            open(self._path(generation, name), "wb").close()
+            self._append_file(generation, name, 0, data)
+        return {"nlist": nlist, "rows": n}
+
+    def build_ivf(self, nlist: Optional[int] = None) -> None:
+        """(Re)builds the coarse index; nlist defaults to about sqrt(rows) lists."""
+        with self._write_lock:
+            self.refresh()
+            manifest = dict(self._view.manifest)
+            n = manifest["count"]
+            if not n:
+                return
+            nlist = nlist or max(1, int(np.sqrt(n)))
+            manifest["ivf"] = self._write_ivf(manifest["generation"], self._view.vectors, nlist)
+            self._write_manifest(manifest)
+            self.refresh()
+        logger.info(f"Built IVF index with {manifest['ivf']['nlist']} lists over {n} rows.")
+
+    ###############
+    # Search
+    ###############
+
+    @staticmethod
+    def _top(scores, rows, k: int) -> tuple["np.ndarray", "np.ndarray"]:
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            scores, rows = scores[keep], rows[keep]
+        order = np.argsort(-scores, kind="stable")
+        return scores[order], rows[order]
+
+    def _scan(self, view: _View, queries, k: int) -> list[tuple["np.ndarray", "np.ndarray"]]:
+        """Exact top-k of every query over all live rows."""
+        best = [(np.empty(0, np.float32), np.empty(0, np.int64)) for _ in queries]
+        for start in range(0, view.count, VECTOR_SEARCH_BLOCK):
+            block = np.asarray(view.vectors[start:start + VECTOR_SEARCH_BLOCK], dtype=np.float32)
+            scores = block @ queries.T
+            scores[~view.live[start:start + len(block)]] = -np.inf
+            rows = np.arange(start, start + len(block))
+            for q in range(len(queries)):
+                top_scores, top_rows = self._top(scores[:, q], rows, k)
+                best[q] = self._top(np.concatenate([best[q][0], top_scores]),
+                                    np.concatenate([best[q][1], top_rows]), k)
+        return best
+
+    def _probe(self, view: _View, query, k: int, nprobe: int) -> tuple["np.ndarray", "np.ndarray"]:
+        """Top-k of one query over the nprobe nearest IVF lists plus the rows appended since the build."""
+        lists = np.argsort(-(view.centroids @ query))[:nprobe]
+        rows = np.concatenate(
+            [view.ivf_rows[view.ivf_offsets[i]:view.ivf_offsets[i + 1]] for i in lists]
+            + [np.arange(len(view.ivf_rows), view.count)]
+        )
+        rows = np.sort(rows[view.live[rows]])
+        scores = np.asarray(view.vectors[rows], dtype=np.float32) @ query
+        return self._top(scores, rows, k)
+
+    def search(self, queries, k: int = 10, nprobe: Optional[int] = VECTOR_IVF_NPROBE,
+               exclude: Optional[set[int]] = None) -> list[list[tuple[int, float]]]:
+        """
+        Nearest chunks of each query vector as [(chunk_id, cosine score)], best first.
+        - Uses the IVF index when there is one and nprobe is set; nprobe=None scans every row exactly.
+        - Chunk ids in `exclude` are left out (e.g. the chunk a similarity query started from).
+        """
+        view = self._view
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if not view.count or view.manifest["dim"] is None:
+            return [[] for _ in queries]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+        wanted = k + len(exclude or ())
+
+        if view.centroids is not None and nprobe:
+            found = [self._probe(view, query, wanted, nprobe) for query in queries]
+        else:
+            found = self._scan(view, queries, wanted)
+
+        results = []
+        for scores, rows in found:
+            hits = [
+                (int(view.ids[row]), float(score)) for score, row in zip(scores, rows)
+                if np.isfinite(score) and not (exclude and int(view.ids[row]) in exclude)
+            ]
+            results.append(hits[:k])
+        return results
+
+
+_shared_store: Optional[VectorStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Process-wide store over VECTOR_STORE_DIR."""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = VectorStore()
+        return _shared_store
@@ -0,0 +1,228 @@
+import os
+import time
+import uuid
+import socket
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, exists, select, update
+from app.database import get_session, insert_ignore
+from app.models import RawDocument, RawDocumentLease
+from app.models.raw_documents import STATUS_FAILED, STATUS_PENDING
+from app.analyzer import ANALYZER_BATCH_SIZE, _mark, _process_batch
+from app.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# How long a claim lives without a heartbeat; a worker that dies loses its batch after this.
+LEASE_SECONDS = int(os.getenv("ANALYZER_LEASE_SECONDS", "300"))
+# Heartbeats per lease period, so a couple can be missed before the lease expires.
+HEARTBEATS_PER_LEASE = 3
+# How long an idle worker waits before looking for new work (when not exiting on idle).
+IDLE_POLL_SECONDS = float(os.getenv("ANALYZER_IDLE_POLL_SECONDS", "10"))
+
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def claim_batch(worker_id: str, batch_size: int, metadata_id: Optional[int] = None) -> list[int]:
+    """
+    Leases up to `batch_size` pending RawDocuments that nobody holds a live lease on.
+    - On Postgres the candidates are picked with FOR UPDATE SKIP LOCKED, so concurrent
+      claimers walk past each other's rows instead of queueing behind them.
+    - The lease rows' primary key settles any remaining race (and SQLite, which has no
+      row locks): only the ids whose lease insert went through are returned.
+    - Expired leases of dead workers are replaced, handing their work back to the pool.
+    """
+    now = datetime.utcnow()
+    live_lease = exists().where(
+        RawDocumentLease.raw_document_id == RawDocument.id,
+        RawDocumentLease.expires_at > now,
+    )
+    stmt = (
+        select(RawDocument.id)
+        .where(RawDocument.status == STATUS_PENDING, ~live_lease)
+        .order_by(RawDocument.id)
+        .limit(batch_size)
+    )
+    if metadata_id is not None:
+        stmt = stmt.where(RawDocument.metadata_id == metadata_id)
+
+    # Losing every candidate to a concurrent claimer isn't "no work"; look again past their leases
+    while True:
+        with get_session() as session:
+            if session.get_bind().dialect.name == "postgresql":
+                stmt = stmt.with_for_update(of=RawDocument, skip_locked=True)
+            candidates = session.scalars(stmt).all()
+            if not candidates:
+                return []
+            session.execute(
+                delete(RawDocumentLease).where(
+                    RawDocumentLease.raw_document_id.in_(candidates),
+                    RawDocumentLease.expires_at <= now,
+                )
+            )
+            expires_at = now + timedelta(seconds=LEASE_SECONDS)
+            claimed = insert_ignore(
+                session,
+                RawDocumentLease,
+                [{"raw_document_id": i, "worker_id": worker_id, "expires_at": expires_at} for i in candidates],
+                ["raw_document_id"],
+                returning=["raw_document_id"],
+            )
+        if claimed:
+            return sorted(raw_id for raw_id, in claimed)
+
+
+def extend_leases(worker_id: str, raw_ids: list[int]) -> int:
+    """Pushes back the expiry of this worker's leases on `raw_ids`; returns how many it still holds."""
+    with get_session() as session:
+        return session.execute(
+            update(RawDocumentLease)
+            .where(RawDocumentLease.worker_id == worker_id, RawDocumentLease.raw_document_id.in_(raw_ids))
+            .values(expires_at=datetime.utcnow() + timedelta(seconds=LEASE_SECONDS))
+        ).rowcount
+
+
+def release_leases(worker_id: str, raw_ids: list[int]) -> None:
+    with get_session() as session:
+        session.execute(
+            delete(RawDocumentLease).where(
+                RawDocumentLease.worker_id == worker_id,
+                RawDocumentLease.raw_document_id.in_(raw_ids),
+            )
+        )
+
+
+class Heartbeat:
+    """Background thread that keeps a batch's leases alive while it is being processed."""
+
+    def __init__(self, worker_id: str, raw_ids: list[int], interval: float = LEASE_SECONDS / HEARTBEATS_PER_LEASE):
+        self.worker_id = worker_id
+        self.raw_ids = raw_ids
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{worker_id}", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                if extend_leases(self.worker_id, self.raw_ids) < len(self.raw_ids):
+                    logger.warning(f"Worker {self.worker_id} lost some of its leases; another worker may redo them.")
+            except Exception as e:
+                # A missed beat is fine; the lease only lapses after several
+                logger.warning(f"Worker {self.worker_id} failed to extend its leases: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _claimed_documents(raw_ids: list[int]):
+    return (
+        select(RawDocument)
+        .options(RawDocument.pdf_raw.loader())
+        .where(RawDocument.id.in_(raw_ids), RawDocument.status == STATUS_PENDING)
+        .order_by(RawDocument.id)
+    )
+
+
+def _record_failure(raw_id: int, error: Exception) -> None:
+    """Counts a failed attempt against one RawDocument (failing it for good after ANALYZER_MAX_ATTEMPTS)."""
+    try:
+        with get_session() as session:
+            raw_doc = session.scalars(_claimed_documents([raw_id])).first()
+            if raw_doc is not None:
+                _mark(raw_doc, STATUS_FAILED, f"{type(error).__name__}: {error}")
+    except Exception:
+        # Nothing recorded; the lease expiring hands the document back for another try
+        logger.exception(f"Could not record the failure of raw_doc id={raw_id}")
+
+
+def _process_one_by_one(worker_id: str, raw_ids: list[int], cache_mode: Optional[str]) -> tuple[int, int]:
+    """
+    Retries a batch that failed as a whole one document at a time, so a single bad row
+    only costs its own attempts instead of holding back its neighbours forever.
+    Returns (Documents inserted, RawDocuments processed).
+    """
+    inserted = processed = 0
+    for raw_id in raw_ids:
+        try:
+            with get_session() as session:
+                raw_docs = session.scalars(_claimed_documents([raw_id])).all()
+                inserted += _process_batch(session, raw_docs, cache_mode)
+                processed += len(raw_docs)
+        except Exception as e:
+            logger.exception(f"Worker {worker_id} failed on raw_doc id={raw_id}")
+            _record_failure(raw_id, e)
+    return inserted, processed
+
+
+def run_worker(
+    worker_id: Optional[str] = None,
+    metadata_id: Optional[int] = None,
+    batch_size: int = ANALYZER_BATCH_SIZE,
+    cache_mode: Optional[str] = None,
+    exit_when_idle: bool = True,
+) -> int:
+    """
+    Claims and processes batches of pending RawDocuments until none are left.
+    Any number of workers (processes or machines) can run against the same database;
+    each batch is leased to one of them. A batch that fails as a whole is retried one
+    document at a time, and documents that still fail use up their attempts.
+    Returns the number of Documents inserted.
+    """
+    worker_id = worker_id or new_worker_id()
+    inserted = processed = 0
+    logger.info(f"Worker {worker_id} started.")
+    while True:
+        raw_ids = claim_batch(worker_id, batch_size, metadata_id)
+        if not raw_ids:
+            if exit_when_idle:
+                break
+            time.sleep(IDLE_POLL_SECONDS)
+            continue
+
+        with Heartbeat(worker_id, raw_ids):
+            try:
+                with get_session() as session:
+                    raw_docs = session.scalars(_claimed_documents(raw_ids)).all()
+                    logger.info(f"Worker {worker_id} processing {len(raw_docs)} RawDocuments ({raw_ids[0]}..{raw_ids[-1]})")
+                    inserted += _process_batch(session, raw_docs, cache_mode)
+                    processed += len(raw_docs)
+            except Exception as e:
+                logger.exception(f"Worker {worker_id} failed on batch {raw_ids[0]}..{raw_ids[-1]}")
+                if len(raw_ids) == 1:
+                    _record_failure(raw_ids[0], e)
+                else:
+                    batch_inserted, batch_processed = _process_one_by_one(worker_id, raw_ids, cache_mode)
+                    inserted += batch_inserted
+                    processed += batch_processed
+        try:
+            release_leases(worker_id, raw_ids)
+        except Exception:
+            logger.exception(f"Worker {worker_id} could not release its leases; they expire on their own")
+
+    logger.info(f"Worker {worker_id} finished: {processed} processed, {inserted} Documents inserted.")
+    return inserted
+
+
+def run_workers(count: int, metadata_id: Optional[int] = None, cache_mode: Optional[str] = None) -> int:
+    """Runs `count` worker processes over the pending backlog and waits for them to drain it."""
+    if count <= 1:
+        return run_worker(metadata_id=metadata_id, cache_mode=cache_mode)
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(count) as pool:
+        results = [
+            pool.apply_async(run_worker, kwds={"metadata_id": metadata_id, "cache_mode": cache_mode})
+            for _ in range(count)
+        ]
+        inserted = sum(result.get() for result in results)
+    logger.info(f"{count} workers inserted {inserted} Documents.")
+    return inserted
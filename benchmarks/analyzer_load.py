@@ -0,0 +1,237 @@
+"""
+Offline load test for the Gemini extraction path.
+
+Drives extract_many_from_gemini_async (concurrency, rate governor, retries,
+packing) against the fake LLM backend, so no API key, network or quota is
+needed. Each scenario runs in a fresh process with its own governor file:
+  - clean      : no injected failures
+  - flaky      : 5% HTTP 503, 2% HTTP 429 and 2% truncated JSON
+  - packed     : clean, short documents sent GEMINI_PACK_SIZE=4 per request
+  - throttled  : clean, with the governor capped at --rpm requests/minute
+
+Reports documents/sec, request p50/p95 latency, requests sent, failed
+documents and average prompt tokens. Results are written as JSON;
+--compare checks them against a stored baseline.
+
+Usage (from the repository root):
+    python benchmarks/analyzer_load.py --out load.json
+    python benchmarks/analyzer_load.py --documents 500 --latency-ms 200 --concurrency 32
+    python benchmarks/analyzer_load.py --compare load.json --tolerance 0.15
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "app")
+
+# name -> (error rate, 429 rate, malformed rate, pack size, throttled)
+SCENARIOS = {
+    "clean": (0.0, 0.0, 0.0, 1, False),
+    "flaky": (0.05, 0.02, 0.02, 1, False),
+    "packed": (0.0, 0.0, 0.0, 4, False),
+    "throttled": (0.0, 0.0, 0.0, 1, True),
+}
+# Metrics where a larger value is better; everything else is "lower is better".
+HIGHER_IS_BETTER = {"docs_per_sec"}
+# Counts that describe the run rather than its speed.
+NOT_COMPARED = {"documents", "requests", "failed"}
+
+WORDS = (
+    "petition appeal respondent appellant court judgment order section act "
+    "constitution tribunal bench honourable learned counsel evidence witness "
+    "conviction sentence bail dismissed allowed remanded impugned jurisdiction "
+    "high supreme civil criminal revision review writ ordinance provincial federal"
+).split()
+
+
+def build_items(count: int, seed: int) -> list[tuple[dict, str]]:
+    """Synthetic (payload, pdf_text) pairs; about a third are short enough to pack."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        year = rng.randint(1960, 2024)
+        paragraphs = [
+            "IN THE SUPREME COURT OF PAKISTAN\n(Appellate Jurisdiction)",
+            f"Present: Justice {rng.choice(WORDS).title()} and Justice {rng.choice(WORDS).title()}",
+            f"Criminal Appeal No. {rng.randint(1, 900)} of {year}",
+        ]
+        for _ in range(rng.choice((3, 12, 40))):
+            paragraphs.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))))
+        paragraphs.append(f"For the foregoing reasons this appeal is {rng.choice(('dismissed', 'allowed'))}.")
+        payload = {
+            "S.No": str(i + 1),
+            "Topic": rng.choice(WORDS).title(),
+            "Case No": f"Crl.A.{rng.randint(1, 900)}/{year}",
+            "Tag Line": " ".join(rng.choice(WORDS) for _ in range(8)),
+            "Citation": "",
+        }
+        items.append((payload, "\n\n".join(paragraphs)))
+    return items
+
+
+def _run_scenario(scenario: str, items: list, args: dict) -> dict:
+    """Runs in a fresh process: one extraction batch against the fake backend."""
+    error_rate, rate_limit_rate, malformed_rate, pack_size, throttled = SCENARIOS[scenario]
+    os.environ["LLM_BACKEND"] = "fake"
+    # Keep injected-failure backoff short, so the run measures the pipeline rather than sleeps
+    os.environ["GEMINI_BACKOFF_BASE"] = str(args["backoff_base"])
+    os.environ["GEMINI_BACKOFF_MAX"] = str(args["backoff_base"] * 8)
+    sys.path.insert(0, APP_DIR)
+    import logging
+    import gemini
+    from llm_backends import FakeBackend
+    from prompt_builder import prompt_stats
+    from rate_governor import RateGovernor
+    logging.getLogger().setLevel(logging.ERROR)
+
+    latencies = []
+
+    class TimedBackend(FakeBackend):
+        async def agenerate(self, prompt: str):
+            started = time.perf_counter()
+            try:
+                return await super().agenerate(prompt)
+            finally:
+                latencies.append(time.perf_counter() - started)
+
+    backend = TimedBackend(
+        latency_median_ms=args["latency_ms"],
+        latency_sigma=args["latency_sigma"],
+        error_rate=error_rate,
+        rate_limit_rate=rate_limit_rate,
+        malformed_rate=malformed_rate,
+        seed=args["seed"],
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        governor = RateGovernor(
+            path=os.path.join(tmp, "governor.db"),
+            rpm=args["rpm"] if throttled else 0,
+            tpm=0,
+            circuit_threshold=10**6,
+        )
+        if throttled:
+            # Start from an empty bucket, like a process joining a quota that is already in use
+            while governor.reserve(0) == 0:
+                pass
+        started = time.perf_counter()
+        results = asyncio.run(gemini.extract_many_from_gemini_async(
+            items,
+            concurrency=args["concurrency"],
+            governor=governor,
+            max_retries=args["max_retries"],
+            pack_size=pack_size,
+            backend=backend,
+        ))
+        elapsed = time.perf_counter() - started
+        governor.close()
+
+    ordered = sorted(latencies)
+    return {
+        "documents": len(items),
+        "requests": backend.calls,
+        "failed": sum(isinstance(r, Exception) for r in results),
+        "docs_per_sec": len(items) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(ordered) * 1000 if ordered else 0.0,
+        "p95_ms": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))] * 1000 if ordered else 0.0,
+        "prompt_tokens_avg": prompt_stats.average,
+    }
+
+
+def run_benchmarks(scenarios: list[str], args: dict) -> dict:
+    items = build_items(args["documents"], args["seed"])
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for scenario in scenarios:
+            print(f"Running scenario {scenario}...", file=sys.stderr)
+            results[scenario] = pool.apply(_run_scenario, (scenario, items, args))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            **args,
+            "scenarios": {name: dict(zip(("error_rate", "429_rate", "malformed_rate", "pack_size", "throttled"), spec))
+                          for name, spec in SCENARIOS.items()},
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Returns a line per metric that regressed by more than `tolerance` (a fraction)."""
+    regressions = []
+    for scenario, metrics in current["results"].items():
+        base = baseline.get("results", {}).get(scenario)
+        if not base:
+            continue
+        for metric, value in metrics.items():
+            old = base.get(metric)
+            if metric in NOT_COMPARED or not old or value is None:
+                continue
+            change = (value - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            status = "REGRESSION" if worse > tolerance else "ok"
+            line = f"{scenario:<10} {metric:<18} {old:>12.2f} -> {value:>12.2f} ({change:+.1%}) {status}"
+            print(line, file=sys.stderr)
+            if status == "REGRESSION":
+                regressions.append(line)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the Gemini extraction path against the fake backend")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--documents", type=int, default=200, help="Documents per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight (GEMINI_CONCURRENCY)")
+    parser.add_argument("--latency-ms", type=float, default=100, help="Median fake response latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="Log-normal spread of the latency")
+    parser.add_argument("--rpm", type=int, default=1200, help="Governor requests/minute in the throttled scenario")
+    parser.add_argument("--max-retries", type=int, default=3, help="Attempts per request")
+    parser.add_argument("--backoff-base", type=float, default=0.05, help="GEMINI_BACKOFF_BASE for the run (seconds)")
+    parser.add_argument("--seed", type=int, default=1947, help="Corpus and fake backend seed")
+    parser.add_argument("--out", type=str, help="Write results JSON to this file (default: stdout)")
+    parser.add_argument("--compare", type=str, help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression (fraction)")
+    args = parser.parse_args()
+
+    settings = {
+        "documents": args.documents,
+        "concurrency": args.concurrency,
+        "latency_ms": args.latency_ms,
+        "latency_sigma": args.latency_sigma,
+        "rpm": args.rpm,
+        "max_retries": args.max_retries,
+        "backoff_base": args.backoff_base,
+        "seed": args.seed,
+    }
+    report = run_benchmarks(args.scenarios, settings)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
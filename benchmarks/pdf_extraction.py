@@ -0,0 +1,324 @@
+"""
+Offline benchmark for PDF text extraction.
+
+Generates a synthetic corpus of judgments (varied page counts, fonts,
+two-column layouts and image-only pages), then measures:
+  - pypdf        : _extract_text_pypdf
+  - pdfminer     : _fallback_pdfminer
+  - hybrid       : _extract_pdf_text (the path used by the collector)
+  - fetch        : fetch_pdf_text against a local HTTP server (cache disabled)
+
+Each extractor runs in a fresh process so its peak RSS is its own.
+Results are written as JSON; --compare checks them against a stored baseline.
+
+Usage (from the repository root):
+    python benchmarks/pdf_extraction.py --out bench.json
+    python benchmarks/pdf_extraction.py --compare bench.json --tolerance 0.15
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "app")
+DEFAULT_CORPUS_DIR = os.path.join(ROOT, "benchmarks", ".corpus")
+
+EXTRACTORS = ["pypdf", "pdfminer", "hybrid", "fetch"]
+# Metrics where a larger value is better; everything else is "lower is better".
+HIGHER_IS_BETTER = {"pages_per_sec", "mb_per_sec"}
+
+FONTS = ["Helvetica", "Times-Roman", "Courier"]
+WORDS = (
+    "petition appeal respondent appellant court judgment order section act "
+    "constitution tribunal bench honourable learned counsel evidence witness "
+    "conviction sentence bail dismissed allowed remanded impugned jurisdiction "
+    "high supreme civil criminal revision review writ ordinance provincial federal"
+).split()
+
+# name -> (page count, layout per page)
+CORPUS_SPEC = {
+    "short_single": (2, "single"),
+    "medium_single": (12, "single"),
+    "long_single": (60, "single"),
+    "two_column": (10, "columns"),
+    "image_only": (8, "image"),
+    "mixed": (20, "mixed"),
+}
+
+
+###################
+# Corpus generation
+###################
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text_lines(rng: random.Random, count: int, width: int) -> list[str]:
+    lines = []
+    for _ in range(count):
+        line = []
+        while sum(len(w) + 1 for w in line) < width:
+            line.append(rng.choice(WORDS))
+        lines.append(" ".join(line).capitalize())
+    return lines
+
+
+def _page_stream(rng: random.Random, layout: str, font_ref: str) -> bytes:
+    if layout == "image":
+        # A full-page gray image with no text at all (a "scanned" page).
+        return b"q 540 0 0 720 36 36 cm /Im1 Do Q"
+
+    ops = ["BT", f"{font_ref} 10 Tf", "12 TL"]
+    if layout == "columns":
+        for x in (48, 318):
+            ops += [f"1 0 0 1 {x} 750 Tm"]
+            ops += [f"({_escape(line)}) '" for line in _text_lines(rng, 55, 45)]
+    else:
+        ops += ["1 0 0 1 48 750 Tm"]
+        ops += [f"({_escape(line)}) '" for line in _text_lines(rng, 55, 95)]
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def make_pdf(rng: random.Random, pages: int, layout: str) -> bytes:
+    """Builds a small, valid PDF by hand so the corpus needs no extra dependencies."""
+    objects: list[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")
+    pages_obj = add(b"")
+    fonts = [add(f"<< /Type /Font /Subtype /Type1 /BaseFont /{name} >>".encode()) for name in FONTS]
+    noise = bytes(rng.randrange(256) for _ in range(64 * 64))
+    image = add(
+        b"<< /Type /XObject /Subtype /Image /Width 64 /Height 64 /ColorSpace /DeviceGray "
+        b"/BitsPerComponent 8 /Length %d >>\nstream\n" % len(noise) + noise + b"\nendstream"
+    )
+    font_dict = " ".join(f"/F{i} {ref} 0 R" for i, ref in enumerate(fonts))
+
+    kids = []
+    for page_no in range(pages):
+        page_layout = layout
+        if layout == "mixed":
+            page_layout = "image" if page_no % 4 == 3 else ("columns" if page_no % 2 else "single")
+        stream = _page_stream(rng, page_layout, f"/F{page_no % len(FONTS)}")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            f"<< /Type /Page /Parent {pages_obj} 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << {font_dict} >> /XObject << /Im1 {image} 0 R >> >> "
+            f"/Contents {content} 0 R >>".encode()
+        ))
+
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages_obj} 0 R >>".encode()
+    objects[pages_obj - 1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>".encode()
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def build_corpus(corpus_dir: str, seed: int = 1947) -> list[str]:
+    """Writes the corpus (deterministic for a given seed) and returns the file names."""
+    os.makedirs(corpus_dir, exist_ok=True)
+    rng = random.Random(seed)
+    names = []
+    for name, (pages, layout) in CORPUS_SPEC.items():
+        file_name = f"{name}.pdf"
+        path = os.path.join(corpus_dir, file_name)
+        data = make_pdf(rng, pages, layout)
+        if not os.path.exists(path) or open(path, "rb").read() != data:
+            with open(path, "wb") as f:
+                f.write(data)
+        names.append(file_name)
+    return names
+
+
+###################
+# Measurement
+###################
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(directory: str) -> tuple[ThreadingHTTPServer, str]:
+    handler = partial(_QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _run_extractor(extractor: str, corpus_dir: str, names: list[str], repeat: int) -> dict:
+    """Runs in a fresh process: times one extractor over the whole corpus."""
+    os.environ["PDF_CACHE_ENABLED"] = "false"
+    os.environ["PDF_EXTRACT_MAX_PAGES"] = "0"
+    sys.path.insert(0, APP_DIR)
+    import logging
+    import pdf_collector
+    from pypdf import PdfReader
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server = None
+    if extractor == "fetch":
+        server, base_url = _serve(corpus_dir)
+
+    latencies, total_pages, total_bytes, chars = [], 0, 0, 0
+    try:
+        for _ in range(repeat):
+            for name in names:
+                with open(os.path.join(corpus_dir, name), "rb") as f:
+                    data = f.read()
+                started = time.perf_counter()
+                if extractor == "pypdf":
+                    reader = PdfReader(io.BytesIO(data))
+                    text, pages = pdf_collector._extract_text_pypdf(reader), len(reader.pages)
+                elif extractor == "pdfminer":
+                    text = pdf_collector._fallback_pdfminer(io.BytesIO(data))
+                    pages = CORPUS_SPEC[name[:-4]][0]
+                elif extractor == "hybrid":
+                    result = pdf_collector._extract_pdf_text(name, data)
+                    text, pages = result.text, result.pages
+                else:
+                    result = pdf_collector.fetch_pdf_text(f"{base_url}/{name}")
+                    text, pages = result.text, result.pages
+                latencies.append(time.perf_counter() - started)
+                total_pages += pages
+                total_bytes += len(data)
+                chars += len(text)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    elapsed = sum(latencies)
+    ordered = sorted(latencies)
+    return {
+        "documents": len(latencies),
+        "pages": total_pages,
+        "chars": chars,
+        "pages_per_sec": total_pages / elapsed if elapsed else 0.0,
+        "mb_per_sec": total_bytes / (1024 * 1024) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))] * 1000,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_benchmarks(corpus_dir: str, extractors: list[str], repeat: int, seed: int) -> dict:
+    names = build_corpus(corpus_dir, seed)
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for extractor in extractors:
+            print(f"Benchmarking {extractor}...", file=sys.stderr)
+            results[extractor] = pool.apply(_run_extractor, (extractor, corpus_dir, names, repeat))
+
+    from importlib.metadata import PackageNotFoundError, version
+
+    def _version(package: str) -> str | None:
+        try:
+            return version(package)
+        except PackageNotFoundError:
+            return None
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pypdf": _version("pypdf"),
+            "pdfminer.six": _version("pdfminer.six"),
+            "seed": seed,
+            "repeat": repeat,
+            "corpus": {name: {"pages": p, "layout": l} for name, (p, l) in CORPUS_SPEC.items()},
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Returns a line per metric that regressed by more than `tolerance` (a fraction)."""
+    regressions = []
+    for extractor, metrics in current["results"].items():
+        base = baseline.get("results", {}).get(extractor)
+        if not base:
+            continue
+        for metric, value in metrics.items():
+            old = base.get(metric)
+            if metric in ("documents", "pages") or not old or value is None:
+                continue
+            change = (value - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            status = "REGRESSION" if worse > tolerance else "ok"
+            line = f"{extractor:<9} {metric:<14} {old:>12.2f} -> {value:>12.2f} ({change:+.1%}) {status}"
+            print(line, file=sys.stderr)
+            if status == "REGRESSION":
+                regressions.append(line)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction on a synthetic corpus")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR, help="Where to generate the corpus")
+    parser.add_argument("--extractors", nargs="+", choices=EXTRACTORS, default=EXTRACTORS)
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus per extractor")
+    parser.add_argument("--seed", type=int, default=1947, help="Corpus generation seed")
+    parser.add_argument("--out", type=str, help="Write results JSON to this file (default: stdout)")
+    parser.add_argument("--compare", type=str, help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression (fraction)")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.corpus_dir, args.extractors, args.repeat, args.seed)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -34,6 +34,16 @@ target_metadata = Base.metadata
 
 config.set_main_option("sqlalchemy.url", DATABASE_URL)
 
+# Full-text search objects are created by hand in their migration (and differ per dialect);
+# keep autogenerate from proposing to drop them.
+SEARCH_OBJECTS = {"search_vector", "ix_documents_search_vector"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if reflected and compare_to is None and (name in SEARCH_OBJECTS or name.startswith("documents_fts")):
+        return False
+    return True
+
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
@@ -53,6 +63,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -74,7 +85,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
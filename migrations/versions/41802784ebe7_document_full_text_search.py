@@ -0,0 +1,114 @@
+"""Document full-text search
+
+Revision ID: 41802784ebe7
+Revises: f1a7c3e9b264
+Create Date: 2026-10-17 15:11:52.304817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '41802784ebe7'
+down_revision: Union[str, Sequence[str], None] = 'f1a7c3e9b264'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Title weighs most, then reference/citation, then the judgment text (kept in text_blobs).
+# The text is capped because a tsvector cannot exceed 1MB.
+PG_FUNCTION = """
+CREATE OR REPLACE FUNCTION documents_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.reference_id, '') || ' ' || coalesce(NEW.citation, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT left(content, 1000000) FROM text_blobs WHERE sha256 = NEW.raw_content_sha256), ''
+        )), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PG_TRIGGER = """
+CREATE TRIGGER documents_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, reference_id, citation, raw_content_sha256 ON documents
+FOR EACH ROW EXECUTE FUNCTION documents_search_vector_update()
+"""
+
+# FTS5 external-content table: the index stores no copy of the text, it reads it back through the view.
+SQLITE_STATEMENTS = [
+    """
+    CREATE VIEW documents_fts_source AS
+    SELECT documents.id AS id,
+           documents.title AS title,
+           documents.reference_id || ' ' || documents.citation AS reference,
+           text_blobs.content AS body
+    FROM documents JOIN text_blobs ON text_blobs.sha256 = documents.raw_content_sha256
+    """,
+    """
+    CREATE VIRTUAL TABLE documents_fts USING fts5(
+        title, reference, body,
+        content='documents_fts_source', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER documents_fts_insert AFTER INSERT ON documents BEGIN
+        INSERT INTO documents_fts(rowid, title, reference, body)
+        SELECT id, title, reference, body FROM documents_fts_source WHERE id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER documents_fts_delete AFTER DELETE ON documents BEGIN
+        INSERT INTO documents_fts(documents_fts, rowid, title, reference, body)
+        VALUES ('delete', old.id, old.title, old.reference_id || ' ' || old.citation,
+                (SELECT content FROM text_blobs WHERE sha256 = old.raw_content_sha256));
+    END
+    """,
+    """
+    CREATE TRIGGER documents_fts_update AFTER UPDATE OF title, reference_id, citation, raw_content_sha256 ON documents BEGIN
+        INSERT INTO documents_fts(documents_fts, rowid, title, reference, body)
+        VALUES ('delete', old.id, old.title, old.reference_id || ' ' || old.citation,
+                (SELECT content FROM text_blobs WHERE sha256 = old.raw_content_sha256));
+        INSERT INTO documents_fts(rowid, title, reference, body)
+        SELECT id, title, reference, body FROM documents_fts_source WHERE id = new.id;
+    END
+    """,
+    "INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.add_column('documents', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute(PG_FUNCTION)
+        op.execute(PG_TRIGGER)
+        # Fires the trigger once for every existing document
+        op.execute("UPDATE documents SET raw_content_sha256 = raw_content_sha256")
+        op.create_index('ix_documents_search_vector', 'documents', ['search_vector'], unique=False,
+                        postgresql_using='gin')
+    elif dialect == 'sqlite':
+        for statement in SQLITE_STATEMENTS:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_documents_search_vector', table_name='documents', postgresql_using='gin')
+        op.execute("DROP TRIGGER IF EXISTS documents_search_vector_trigger ON documents")
+        op.execute("DROP FUNCTION IF EXISTS documents_search_vector_update()")
+        op.drop_column('documents', 'search_vector')
+    elif dialect == 'sqlite':
+        for trigger in ('documents_fts_update', 'documents_fts_delete', 'documents_fts_insert'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS documents_fts")
+        op.execute("DROP VIEW IF EXISTS documents_fts_source")
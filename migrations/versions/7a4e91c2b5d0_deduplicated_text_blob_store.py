@@ -0,0 +1,130 @@
+"""Deduplicated text blob store
+
+Revision ID: 7a4e91c2b5d0
+Revises: d3c7cd386718
+Create Date: 2026-10-17 10:12:44.318204
+
+"""
+from typing import Sequence, Union
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a4e91c2b5d0'
+down_revision: Union[str, Sequence[str], None] = 'd3c7cd386718'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+text_blobs = sa.table(
+    'text_blobs',
+    sa.column('sha256', sa.String),
+    sa.column('content', sa.Text),
+)
+
+
+def _move_text_to_blobs(table_name: str, text_column: str, hash_column: str) -> None:
+    """Hashes each row's text into text_blobs (once per distinct text) and records the hash."""
+    bind = op.get_bind()
+    table = sa.table(
+        table_name,
+        sa.column('id', sa.Integer),
+        sa.column(text_column, sa.Text),
+        sa.column(hash_column, sa.String),
+    )
+    ids = bind.execute(sa.select(table.c.id).order_by(table.c.id)).scalars().all()
+    for start in range(0, len(ids), BATCH_SIZE):
+        rows = bind.execute(
+            sa.select(table.c.id, table.c[text_column])
+            .where(table.c.id.in_(ids[start:start + BATCH_SIZE]))
+        ).all()
+        hashes = {}
+        for row_id, text in rows:
+            text = text or ''
+            hashes[row_id] = (hashlib.sha256(text.encode('utf-8')).hexdigest(), text)
+
+        known = set(bind.execute(
+            sa.select(text_blobs.c.sha256)
+            .where(text_blobs.c.sha256.in_({digest for digest, _ in hashes.values()}))
+        ).scalars())
+        fresh = {}
+        for digest, text in hashes.values():
+            if digest not in known:
+                fresh[digest] = text
+        if fresh:
+            bind.execute(
+                text_blobs.insert(),
+                [{'sha256': digest, 'content': text} for digest, text in fresh.items()],
+            )
+        bind.execute(
+            table.update()
+            .where(table.c.id == sa.bindparam('row_id'))
+            .values({hash_column: sa.bindparam('digest')}),
+            [{'row_id': row_id, 'digest': digest} for row_id, (digest, _) in hashes.items()],
+        )
+
+
+def _restore_text_from_blobs(table_name: str, text_column: str, hash_column: str) -> None:
+    table = sa.table(
+        table_name,
+        sa.column(text_column, sa.Text),
+        sa.column(hash_column, sa.String),
+    )
+    op.execute(
+        table.update().values({
+            text_column: sa.select(text_blobs.c.content)
+            .where(text_blobs.c.sha256 == table.c[hash_column])
+            .scalar_subquery()
+        })
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('text_blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.add_column('raw_documents', sa.Column('pdf_raw_sha256', sa.String(length=64), nullable=True))
+    op.add_column('documents', sa.Column('raw_content_sha256', sa.String(length=64), nullable=True))
+
+    _move_text_to_blobs('raw_documents', 'pdf_raw', 'pdf_raw_sha256')
+    _move_text_to_blobs('documents', 'raw_content', 'raw_content_sha256')
+
+    with op.batch_alter_table('raw_documents') as batch_op:
+        batch_op.alter_column('pdf_raw_sha256', existing_type=sa.String(length=64), nullable=False)
+        batch_op.create_index(batch_op.f('ix_raw_documents_pdf_raw_sha256'), ['pdf_raw_sha256'], unique=False)
+        batch_op.create_foreign_key('fk_raw_documents_pdf_raw_sha256', 'text_blobs', ['pdf_raw_sha256'], ['sha256'])
+        batch_op.drop_column('pdf_raw')
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.alter_column('raw_content_sha256', existing_type=sa.String(length=64), nullable=False)
+        batch_op.create_index(batch_op.f('ix_documents_raw_content_sha256'), ['raw_content_sha256'], unique=False)
+        batch_op.create_foreign_key('fk_documents_raw_content_sha256', 'text_blobs', ['raw_content_sha256'], ['sha256'])
+        batch_op.drop_column('raw_content')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('documents', sa.Column('raw_content', sa.Text(), nullable=True))
+    op.add_column('raw_documents', sa.Column('pdf_raw', sa.Text(), nullable=True))
+
+    _restore_text_from_blobs('documents', 'raw_content', 'raw_content_sha256')
+    _restore_text_from_blobs('raw_documents', 'pdf_raw', 'pdf_raw_sha256')
+
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.alter_column('raw_content', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_constraint('fk_documents_raw_content_sha256', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_documents_raw_content_sha256'))
+        batch_op.drop_column('raw_content_sha256')
+    with op.batch_alter_table('raw_documents') as batch_op:
+        batch_op.alter_column('pdf_raw', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_constraint('fk_raw_documents_pdf_raw_sha256', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_raw_documents_pdf_raw_sha256'))
+        batch_op.drop_column('pdf_raw_sha256')
+    op.drop_table('text_blobs')
@@ -0,0 +1,46 @@
+"""Document chunked marker
+
+Revision ID: a9d2e4f7c813
+Revises: f8cfc958e123
+Create Date: 2026-10-17 18:05:12.408517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d2e4f7c813'
+down_revision: Union[str, Sequence[str], None] = 'f8cfc958e123'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.add_column(sa.Column('chunked_at', sa.DateTime(), nullable=True))
+
+    # Documents that already have chunks are chunked; everything else is picked up by the next run.
+    op.execute(
+        "UPDATE documents SET chunked_at = CURRENT_TIMESTAMP WHERE EXISTS ("
+        "SELECT 1 FROM chunks WHERE chunks.document_id = documents.id)"
+    )
+    op.create_index(
+        'ix_documents_unchunked', 'documents', ['id'], unique=False,
+        postgresql_where=sa.text("chunked_at IS NULL"),
+        sqlite_where=sa.text("chunked_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        'ix_documents_unchunked', table_name='documents',
+        postgresql_where=sa.text("chunked_at IS NULL"),
+        sqlite_where=sa.text("chunked_at IS NULL"),
+    )
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.drop_column('chunked_at')
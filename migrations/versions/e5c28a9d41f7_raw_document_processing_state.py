@@ -0,0 +1,52 @@
+"""RawDocument processing state
+
+Revision ID: e5c28a9d41f7
+Revises: b81d3f6a02c9
+Create Date: 2026-10-17 13:24:09.551872
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c28a9d41f7'
+down_revision: Union[str, Sequence[str], None] = 'b81d3f6a02c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('raw_documents') as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=20), server_default='pending', nullable=False))
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('last_error', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('processed_at', sa.DateTime(), nullable=True))
+
+    # Raw documents that already produced a Document are done; everything else is queued.
+    op.execute(
+        "UPDATE raw_documents SET status = 'done' WHERE EXISTS ("
+        "SELECT 1 FROM documents WHERE documents.raw_content_sha256 = raw_documents.pdf_raw_sha256)"
+    )
+    op.create_index(
+        'ix_raw_documents_pending', 'raw_documents', ['id'], unique=False,
+        postgresql_where=sa.text("status = 'pending'"),
+        sqlite_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        'ix_raw_documents_pending', table_name='raw_documents',
+        postgresql_where=sa.text("status = 'pending'"),
+        sqlite_where=sa.text("status = 'pending'"),
+    )
+    with op.batch_alter_table('raw_documents') as batch_op:
+        batch_op.drop_column('processed_at')
+        batch_op.drop_column('last_error')
+        batch_op.drop_column('attempts')
+        batch_op.drop_column('status')
@@ -0,0 +1,265 @@
+import os
+import sys
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "app")
+# The package (app.*) and the leaf modules' bare imports (logger_config, pdf_cache...) both have to resolve
+sys.path[:0] = [ROOT, APP_DIR]
+
+# Point everything that touches the disk at a scratch directory before any app module reads its settings
+_SCRATCH = tempfile.mkdtemp(prefix="scrapper-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_SCRATCH, 'default.db')}"
+os.environ["PDF_CACHE_DIR"] = os.path.join(_SCRATCH, "pdfs")
+os.environ["GEMINI_GOVERNOR_PATH"] = os.path.join(_SCRATCH, "governor.db")
+os.environ["VECTOR_STORE_DIR"] = os.path.join(_SCRATCH, "vectors")
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["FAKE_LLM_LATENCY_MEDIAN_MS"] = "1"
+os.environ["FAKE_LLM_SEED"] = "1947"
+
+# metadata_chunks has a composite primary key with an autoincrement id, which SQLite can't create
+# from the model; this is its SQLite equivalent.
+METADATA_CHUNKS_DDL = """
+CREATE TABLE metadata_chunks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chunk_id INTEGER NOT NULL REFERENCES chunks (id) ON DELETE CASCADE,
+    doc_type VARCHAR(100) NOT NULL,
+    jurisdiction VARCHAR(100) NOT NULL,
+    citation VARCHAR(255) NOT NULL,
+    year INTEGER NOT NULL,
+    court VARCHAR(150) NOT NULL,
+    authority_level VARCHAR(100) NOT NULL,
+    tags VARCHAR(500),
+    UNIQUE (chunk_id, id)
+)
+"""
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A fresh SQLite database with every table, bound to the app's sessions for one test."""
+    from sqlalchemy import create_engine
+    from app.database import Base, SessionLocal
+    import app.models  # noqa: F401
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(
+        engine, tables=[table for name, table in Base.metadata.tables.items() if name != "metadata_chunks"]
+    )
+    with engine.begin() as conn:
+        conn.exec_driver_sql(METADATA_CHUNKS_DDL)
+    previous = SessionLocal.kw["bind"]
+    SessionLocal.configure(bind=engine)
+    yield engine
+    SessionLocal.configure(bind=previous)
+    engine.dispose()
+
+
+def make_pdf(pages: int = 2, seed: int = 1, layout: str = "single") -> bytes:
+    """A small valid PDF with text on every page (the extraction benchmark's generator)."""
+    from benchmarks.pdf_extraction import make_pdf as _make_pdf
+
+    return _make_pdf(random.Random(seed), pages, layout)
+
+
+class PdfServer:
+    """
+    Local HTTP server for download tests.
+    - serve() publishes a body under a path, with an ETag and Last-Modified.
+    - Honours Range only while If-Range matches, like a real server; ranges can be switched off.
+    - drop_after() makes the next response for a path close the connection after that many bytes.
+    - stall_after() makes it wait after that many bytes until `resume` is set.
+    - Records each request's headers and the peak number of requests in flight.
+    """
+
+    def __init__(self):
+        self.files: dict[str, dict] = {}
+        self.requests: list[tuple[str, dict]] = []
+        self.drops: dict[str, int] = {}
+        self.stalls: dict[str, int] = {}
+        self.resume = threading.Event()
+        self.delay = 0.0
+        self.in_flight = self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests.append((self.path, dict(self.headers)))
+                    server.in_flight += 1
+                    server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+                try:
+                    server._respond(self)
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def serve(self, path: str, body: bytes, etag: str = '"v1"', content_type: str = "application/pdf",
+              status: int = 200, ranges: bool = True) -> str:
+        self.files[path] = {"body": body, "etag": etag, "content_type": content_type,
+                            "status": status, "ranges": ranges}
+        return self.url(path)
+
+    def drop_after(self, path: str, size: int) -> None:
+        self.drops[path] = size
+
+    def stall_after(self, path: str, size: int) -> None:
+        self.stalls[path] = size
+
+    def requests_for(self, path: str) -> list[dict]:
+        return [headers for p, headers in self.requests if p == path]
+
+    def _respond(self, handler: BaseHTTPRequestHandler) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        entry = self.files.get(handler.path)
+        if entry is None:
+            handler.send_response(404)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+        body, etag = entry["body"], entry["etag"]
+        if etag and handler.headers.get("If-None-Match") == etag:
+            handler.send_response(304)
+            handler.send_header("ETag", etag)
+            handler.end_headers()
+            return
+
+        status, start = entry["status"], 0
+        byte_range = handler.headers.get("Range")
+        if byte_range and entry["ranges"] and handler.headers.get("If-Range") in (None, etag):
+            start = int(byte_range.split("=")[1].split("-")[0])
+            if start >= len(body):
+                handler.send_response(416)
+                handler.send_header("Content-Length", "0")
+                handler.end_headers()
+                return
+            status = 206
+        payload = body[start:]
+        handler.send_response(status)
+        handler.send_header("Content-Type", entry["content_type"])
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.send_header("Accept-Ranges", "bytes" if entry["ranges"] else "none")
+        handler.send_header("Last-Modified", "Mon, 06 Oct 2025 10:00:00 GMT")
+        if etag:
+            handler.send_header("ETag", etag)
+        if status == 206:
+            handler.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        handler.end_headers()
+
+        cut = self.drops.pop(handler.path, None)
+        if cut is not None:
+            handler.wfile.write(payload[:cut])
+            handler.wfile.flush()
+            handler.close_connection = True
+            handler.connection.shutdown(2)
+            return
+        cut = self.stalls.pop(handler.path, None)
+        if cut is not None:
+            handler.wfile.write(payload[:cut])
+            handler.wfile.flush()
+            self.resume.wait(10)
+            payload = payload[cut:]
+        handler.wfile.write(payload)
+
+    def close(self) -> None:
+        self.resume.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def pdf_server():
+    server = PdfServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def pdf_cache(tmp_path, monkeypatch):
+    """A private PDF cache that the collector uses instead of the shared one."""
+    import app.pdf_collector as pdf_collector
+
+    cache = pdf_collector.PdfCache(root=str(tmp_path / "pdfs"))
+    monkeypatch.setattr(pdf_collector, "get_pdf_cache", lambda: cache)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def no_pdf_cache(monkeypatch):
+    import app.pdf_collector as pdf_collector
+
+    monkeypatch.setattr(pdf_collector, "get_pdf_cache", lambda: None)
+
+
+def add_raw_documents(items: list[tuple[object, str]], fetch_uri: str = "https://example.test/list") -> list[int]:
+    """Stores RawDocuments from (payload, pdf text) pairs; a str payload is stored as is. Returns their ids."""
+    import json
+    from app.database import get_session
+    from app.models import MetadataRaw, RawDocument
+
+    with get_session() as session:
+        metadata = MetadataRaw(fetch_uri=fetch_uri, structure=["Case No", "Citation"], delimiter=",")
+        session.add(metadata)
+        session.flush()
+        docs = [
+            RawDocument(
+                metadata_id=metadata.id,
+                payload=payload if isinstance(payload, str) else json.dumps(payload),
+                pdf_uri=f"https://example.test/{i}.pdf",
+                pdf_raw=text,
+            )
+            for i, (payload, text) in enumerate(items)
+        ]
+        session.add_all(docs)
+        session.flush()
+        return [doc.id for doc in docs]
+
+
+def add_documents(items: list[dict]) -> list[int]:
+    """Stores Documents; each item gives `text` plus any columns to override. Returns their ids."""
+    from app.database import get_session
+    from app.models import Document
+
+    defaults = {
+        "title": "Appellant v. The State",
+        "doc_type": "Judgment",
+        "jurisdiction": "Pakistan",
+        "court": "Supreme Court of Pakistan",
+        "authority_level": "Apex Court",
+        "citation": "2021 SCMR 45",
+        "year": 2021,
+        "raw_content_uri": "https://example.test/doc.pdf",
+        "legal_status": "Reported",
+    }
+    with get_session() as session:
+        docs = []
+        for i, item in enumerate(items):
+            columns = {**defaults, "reference_id": f"C.P. {i + 1}/2021", **item}
+            text = columns.pop("text")
+            docs.append(Document(**columns, raw_content=text))
+        session.add_all(docs)
+        session.flush()
+        return [doc.id for doc in docs]
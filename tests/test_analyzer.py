@@ -0,0 +1,190 @@
+import importlib.util
+import os
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import select
+
+from app import analyzer, llm_cache
+from app.analyzer import ANALYZER_MAX_ATTEMPTS, process_raw_documents
+from app.database import get_session
+from app.gemini import build_prompt, prompt_cache_key
+from app.models import Document, RawDocument
+from tests.conftest import ROOT, add_raw_documents
+
+TEXT = "IN THE SUPREME COURT OF PAKISTAN\nJUDGMENT\nThe petition is dismissed.\n"
+
+
+def _payload(case_no: str) -> dict:
+    return {"Case No": case_no, "Citation": "2021 SCMR 45", "Topic": "Bail"}
+
+
+def _load_migration(filename: str):
+    spec = importlib.util.spec_from_file_location(filename, os.path.join(ROOT, "migrations", "versions", filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _statuses(ids: list[int]) -> list[tuple[str, int]]:
+    with get_session() as session:
+        rows = session.execute(
+            select(RawDocument.id, RawDocument.status, RawDocument.attempts).where(RawDocument.id.in_(ids))
+        ).all()
+    by_id = {raw_id: (status, attempts) for raw_id, status, attempts in rows}
+    return [by_id[raw_id] for raw_id in ids]
+
+
+def test_duplicates_within_a_batch_and_already_stored_are_skipped(db):
+    first = add_raw_documents([(_payload("C.P. 3/2020"), TEXT + "earlier")])
+    assert process_raw_documents(cache_mode="bypass") == 1
+
+    ids = add_raw_documents([
+        (_payload("C.P. 1/2020"), TEXT + "one"),
+        (_payload("C.P. 1/2020"), TEXT + "one again"),
+        (_payload("C.P. 2/2020"), TEXT + "two"),
+        (_payload("C.P. 3/2020"), TEXT + "three"),
+    ], fetch_uri="https://example.test/second")
+
+    assert process_raw_documents(cache_mode="bypass") == 2
+    assert _statuses(first + ids) == [
+        ("done", 0), ("done", 0), ("duplicate", 0), ("done", 0), ("duplicate", 0)
+    ]
+    with get_session() as session:
+        assert sorted(session.scalars(select(Document.reference_id))) == ["C.P. 1/2020", "C.P. 2/2020", "C.P. 3/2020"]
+
+
+def test_documents_share_the_raw_documents_text_blob(db):
+    add_raw_documents([(_payload("C.P. 1/2020"), TEXT)])
+    process_raw_documents(cache_mode="bypass")
+
+    with get_session() as session:
+        raw_doc = session.scalars(select(RawDocument)).one()
+        document = session.scalars(select(Document)).one()
+        assert document.raw_content_sha256 == raw_doc.pdf_raw_sha256
+        assert document.raw_content == TEXT
+
+
+def test_a_bad_record_only_fails_itself_until_its_attempts_run_out(db):
+    ids = add_raw_documents([("{not json", TEXT), (_payload("C.P. 1/2020"), TEXT)])
+
+    assert process_raw_documents(cache_mode="bypass") == 1
+    assert _statuses(ids) == [("pending", 1), ("done", 0)]
+    for _ in range(ANALYZER_MAX_ATTEMPTS - 1):
+        process_raw_documents(cache_mode="bypass")
+    assert _statuses(ids) == [("failed", ANALYZER_MAX_ATTEMPTS), ("done", 0)]
+
+
+def test_a_batch_job_streams_the_queue_and_keeps_only_prompts(db, monkeypatch):
+    monkeypatch.setattr(analyzer, "ANALYZER_BATCH_SIZE", 2)
+    queued = []
+    monkeypatch.setattr(analyzer, "submit_batch_job", lambda requests, display_name: queued.extend(requests) or "job")
+    long_text = TEXT + "The learned counsel argued at length. " * 2000
+    ids = add_raw_documents([(_payload(f"C.P. {i}/2020"), long_text) for i in range(5)])
+    # An answer already in the LLM cache is not queued again
+    cached_key = prompt_cache_key(build_prompt(_payload("C.P. 3/2020"), long_text, analyzer._llm_fields(
+        analyzer._fast_path(_payload("C.P. 3/2020"), long_text))))
+    llm_cache.store_many({cached_key: {"title": "Cached"}}, "use")
+
+    assert analyzer.submit_extraction_job() == "job"
+
+    assert len(queued) == 4 and cached_key not in dict(queued)
+    for (key, prompt), i in zip(queued, [0, 1, 2, 4]):
+        assert f"C.P. {i}/2020" in prompt and key == prompt_cache_key(prompt)
+        assert len(prompt) < len(long_text) // 10
+    assert _statuses(ids) == [("pending", 0)] * 5
+
+
+###############
+# Processing state
+###############
+
+def test_a_run_stopped_part_way_restarts_where_it_left_off(db, monkeypatch):
+    monkeypatch.setattr(analyzer, "ANALYZER_BATCH_SIZE", 2)
+    ids = add_raw_documents([(_payload(f"C.P. {i}/2020"), TEXT + str(i)) for i in range(5)])
+    extract_all = analyzer._extract_all
+    batches = []
+
+    def crash_on_second_batch(pending, cache_mode):
+        batches.append([raw_doc.id for raw_doc, _ in pending])
+        if len(batches) == 2:
+            raise RuntimeError("killed")
+        return extract_all(pending, cache_mode)
+
+    monkeypatch.setattr(analyzer, "_extract_all", crash_on_second_batch)
+
+    assert process_raw_documents(cache_mode="bypass") == 2
+    # The first batch committed; the one in flight rolled back untouched
+    assert _statuses(ids) == [("done", 0)] * 2 + [("pending", 0)] * 3
+
+    assert process_raw_documents(cache_mode="bypass") == 3
+    assert batches[2:] == [ids[2:4], ids[4:]]
+    assert _statuses(ids) == [("done", 0)] * 5
+    assert process_raw_documents(cache_mode="bypass") == 0
+
+
+def test_a_limited_run_takes_the_oldest_pending_documents(db):
+    ids = add_raw_documents([(_payload(f"C.P. {i}/2020"), TEXT + str(i)) for i in range(4)])
+
+    assert process_raw_documents(inserted_record_count=3, cache_mode="bypass") == 3
+
+    assert [status for status, _ in _statuses(ids)] == ["done", "done", "done", "pending"]
+
+
+def test_failures_record_their_error_and_leave_the_queue_at_the_cap(db, monkeypatch):
+    ids = add_raw_documents([(_payload("C.P. 1/2020"), TEXT)])
+    monkeypatch.setattr(analyzer, "extract_many_from_gemini", lambda items: [RuntimeError("503 overloaded")] * len(items))
+
+    for attempt in range(1, ANALYZER_MAX_ATTEMPTS + 1):
+        assert process_raw_documents(cache_mode="bypass") == 0
+        expected = "failed" if attempt == ANALYZER_MAX_ATTEMPTS else "pending"
+        assert _statuses(ids) == [(expected, attempt)]
+    with get_session() as session:
+        raw_doc = session.get(RawDocument, ids[0])
+        assert raw_doc.last_error == "503 overloaded" and raw_doc.processed_at is not None
+
+    # Failed rows are no longer picked up
+    monkeypatch.undo()
+    assert process_raw_documents(cache_mode="bypass") == 0
+    assert _statuses(ids) == [("failed", ANALYZER_MAX_ATTEMPTS)]
+
+
+def test_a_success_after_a_failure_clears_the_error(db, monkeypatch):
+    ids = add_raw_documents([(_payload("C.P. 1/2020"), TEXT)])
+    monkeypatch.setattr(analyzer, "extract_many_from_gemini", lambda items: [RuntimeError("timeout")] * len(items))
+    process_raw_documents(cache_mode="bypass")
+    monkeypatch.undo()
+
+    assert process_raw_documents(cache_mode="bypass") == 1
+
+    with get_session() as session:
+        raw_doc = session.get(RawDocument, ids[0])
+        assert (raw_doc.status, raw_doc.attempts, raw_doc.last_error) == ("done", 1, None)
+
+
+def test_the_migration_marks_rows_with_a_document_done(tmp_path):
+    migration = _load_migration("e5c28a9d41f7_raw_document_processing_state.py")
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE raw_documents (id INTEGER PRIMARY KEY, pdf_raw_sha256 VARCHAR(64) NOT NULL)")
+        conn.exec_driver_sql("CREATE TABLE documents (id INTEGER PRIMARY KEY, raw_content_sha256 VARCHAR(64) NOT NULL)")
+        conn.exec_driver_sql("INSERT INTO raw_documents (id, pdf_raw_sha256) VALUES (1, 'a'), (2, 'b'), (3, 'a'), (4, 'c')")
+        conn.exec_driver_sql("INSERT INTO documents (id, raw_content_sha256) VALUES (1, 'a'), (2, 'c')")
+
+        with Operations.context(MigrationContext.configure(conn)):
+            migration.upgrade()
+
+        rows = conn.execute(sa.text("SELECT id, status, attempts, last_error FROM raw_documents ORDER BY id")).all()
+        assert [tuple(row) for row in rows] == [
+            (1, "done", 0, None), (2, "pending", 0, None), (3, "done", 0, None), (4, "done", 0, None)
+        ]
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT id FROM raw_documents WHERE status = 'pending' ORDER BY id"
+        ).all()
+        assert "ix_raw_documents_pending" in " ".join(str(row) for row in plan)
+
+        with Operations.context(MigrationContext.configure(conn)):
+            migration.downgrade()
+        assert [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(raw_documents)")] == ["id", "pdf_raw_sha256"]
+    engine.dispose()
@@ -0,0 +1,204 @@
+import importlib.util
+import os
+import random
+
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import func, select
+
+from app.chunker import _Pieces, chunk_documents, reset_chunks, split_text
+from app.database import get_session
+from app.models import Chunk, Document, MetadataChunk
+from app.prompt_builder import count_tokens
+from tests.conftest import ROOT, add_documents
+
+WORDS = ("petition appeal respondent court judgment order section evidence witness bail "
+         "conviction sentence dismissed allowed impugned jurisdiction learned counsel").split()
+
+
+def _judgment(seed: int = 1, paragraphs: int = 30) -> str:
+    rng = random.Random(seed)
+    parts = ["IN THE SUPREME COURT OF PAKISTAN", "JUDGMENT"]
+    for i in range(paragraphs):
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 25))).capitalize() + "."
+            for _ in range(rng.randint(1, 6))
+        ]
+        parts.append(f"{i + 1}. " + " ".join(sentences))
+        if i == paragraphs // 2:
+            parts.append("ORDER")
+    return "\n\n".join(parts)
+
+
+def _check_spans(text: str, spans, max_tokens: int) -> None:
+    pieces = _Pieces(text)
+    for span in spans:
+        chunk = text[span.start:span.end]
+        assert chunk and chunk == chunk.strip()
+        assert span.token_count == pieces.tokens(span.start, span.end) <= max_tokens
+    # Every piece of text lands in some chunk
+    covered = [False] * len(pieces.starts)
+    for span in spans:
+        for i in range(pieces.index(span.start), pieces.index(span.end)):
+            covered[i] = True
+    assert all(covered)
+    assert [s.start for s in spans] == sorted(s.start for s in spans)
+
+
+@pytest.mark.parametrize("max_tokens, overlap", [(400, 60), (120, 30), (50, 0)])
+def test_chunks_cover_the_text_within_the_token_limit(max_tokens, overlap):
+    text = _judgment()
+    spans = split_text(text, max_tokens=max_tokens, overlap_tokens=overlap, min_tokens=max_tokens // 4)
+
+    assert len(spans) > 1
+    _check_spans(text, spans, max_tokens)
+
+
+def test_consecutive_chunks_overlap_by_at_most_the_overlap():
+    text = _judgment(paragraphs=60)
+    pieces = _Pieces(text)
+    spans = split_text(text, max_tokens=150, overlap_tokens=40, min_tokens=40)
+
+    overlaps = [pieces.tokens(b.start, a.end) for a, b in zip(spans, spans[1:]) if b.start < a.end]
+    assert overlaps and max(overlaps) <= 40
+    for a, b in zip(spans, spans[1:]):
+        # Chunks start on a word, never inside one
+        assert not (text[b.start - 1].isalnum() and text[b.start].isalnum())
+
+
+def test_the_overlap_starts_at_a_sentence_where_possible():
+    paragraph = " ".join(["alpha"] * 40).capitalize() + ". The short closing sentence."
+    text = "\n\n".join([paragraph] * 6)
+    spans = split_text(text, max_tokens=100, overlap_tokens=20, min_tokens=10)
+
+    repeated = [text[b.start:a.end] for a, b in zip(spans, spans[1:]) if b.start < a.end]
+    assert repeated and all(r == "The short closing sentence." for r in repeated)
+
+
+def test_a_heading_starts_a_new_chunk_without_overlap():
+    text = _judgment(paragraphs=20)
+    spans = split_text(text, max_tokens=400, overlap_tokens=60, min_tokens=50)
+
+    order = text.index("\n\nORDER") + 2
+    assert order in [span.start for span in spans]
+    before = next(span for span in spans if span.end <= order and span.end > order - 200)
+    assert before.end < order
+
+
+def test_a_long_paragraph_without_sentences_is_hard_split():
+    text = " ".join(["word"] * 1000)
+    spans = split_text(text, max_tokens=100, overlap_tokens=0)
+
+    _check_spans(text, spans, 100)
+    assert "".join(text[s.start:s.end] + " " for s in spans).split() == text.split()
+
+
+def test_pieces_count_tokens_like_the_prompt_builder():
+    text = _judgment(seed=5, paragraphs=4) + " Sub-section (2) of s.497, Cr.P.C.—bail."
+    pieces = _Pieces(text)
+
+    assert pieces.tokens(0, len(text)) == count_tokens(text)
+
+
+def test_empty_text_has_no_chunks():
+    assert split_text("") == []
+    assert split_text("   \n\n  ") == []
+
+
+###############
+# Storage
+###############
+
+def test_chunk_documents_stores_chunks_and_metadata_once(db):
+    texts = [_judgment(seed=1), _judgment(seed=2, paragraphs=5)]
+    ids = add_documents([{"text": texts[0], "year": 2019}, {"text": texts[1], "tags": "x" * 600}])
+
+    inserted = chunk_documents(workers=0)
+
+    assert inserted > 2
+    assert chunk_documents(workers=0) == 0
+    with get_session() as session:
+        chunks = session.scalars(select(Chunk).order_by(Chunk.id)).all()
+        assert len(chunks) == inserted
+        for chunk in chunks:
+            text = texts[ids.index(chunk.document_id)]
+            assert chunk.chunk_text == text[chunk.char_start:chunk.char_end]
+        metadata = {row.chunk_id: row for row in session.scalars(select(MetadataChunk))}
+        assert set(metadata) == {chunk.id for chunk in chunks}
+        first = next(c for c in chunks if c.document_id == ids[0])
+        assert metadata[first.id].year == 2019
+        # Longer values than the column holds are cut to fit
+        second = next(c for c in chunks if c.document_id == ids[1])
+        assert len(metadata[second.id].tags) == 500
+
+
+def test_chunking_resumes_and_can_be_redone(db):
+    ids = add_documents([{"text": _judgment(seed=i, paragraphs=3)} for i in range(5)])
+
+    chunk_documents(limit=2, workers=0)
+    with get_session() as session:
+        assert set(session.scalars(select(Chunk.document_id))) == set(ids[:2])
+    chunk_documents(workers=0)
+    reset_chunks([ids[0]])
+    with get_session() as session:
+        assert set(session.scalars(select(Chunk.document_id))) == set(ids[1:])
+        count = session.scalar(select(func.count()).select_from(Chunk))
+    chunk_documents(workers=0)
+    with get_session() as session:
+        assert session.scalar(select(func.count()).select_from(Chunk)) > count
+        assert session.scalar(select(func.count()).select_from(MetadataChunk)) == \
+            session.scalar(select(func.count()).select_from(Chunk))
+
+
+def test_documents_without_chunks_are_split_only_once(db, monkeypatch):
+    import app.chunker as chunker
+
+    ids = add_documents([{"text": " \n\n \t"}, {"text": _judgment(seed=3, paragraphs=2)}])
+    split = []
+    chunk_document = chunker._chunk_document
+    monkeypatch.setattr(chunker, "_chunk_document", lambda item: split.append(item[0]) or chunk_document(item))
+
+    assert chunk_documents(workers=0) > 0
+    assert chunk_documents(workers=0) == 0
+
+    assert split == ids
+    with get_session() as session:
+        assert set(session.scalars(select(Chunk.document_id))) == {ids[1]}
+        assert None not in session.scalars(select(Document.chunked_at)).all()
+
+    # Resetting clears the mark, so the document is split again
+    reset_chunks([ids[0]])
+    chunk_documents(workers=0)
+    assert split == ids + [ids[0]]
+
+
+###############
+# Migration
+###############
+
+def test_the_migration_marks_documents_with_chunks_as_chunked(tmp_path):
+    path = os.path.join(ROOT, "migrations", "versions", "a9d2e4f7c813_document_chunked_marker.py")
+    spec = importlib.util.spec_from_file_location("chunked_migration", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE documents (id INTEGER PRIMARY KEY, title TEXT)")
+        conn.exec_driver_sql("CREATE TABLE chunks (id INTEGER PRIMARY KEY, document_id INTEGER NOT NULL)")
+        conn.exec_driver_sql("INSERT INTO documents (id, title) VALUES (1, 'a'), (2, 'b'), (3, 'c')")
+        conn.exec_driver_sql("INSERT INTO chunks (id, document_id) VALUES (1, 1), (2, 1), (3, 3)")
+
+        with Operations.context(MigrationContext.configure(conn)):
+            migration.upgrade()
+
+        rows = conn.exec_driver_sql("SELECT id, chunked_at IS NOT NULL FROM documents ORDER BY id").all()
+        assert [tuple(row) for row in rows] == [(1, 1), (2, 0), (3, 1)]
+        plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN SELECT id FROM documents WHERE chunked_at IS NULL").all()
+        assert "ix_documents_unchunked" in " ".join(str(row) for row in plan)
+
+        with Operations.context(MigrationContext.configure(conn)):
+            migration.downgrade()
+        assert [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(documents)")] == ["id", "title"]
+    engine.dispose()
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import select
+
+from app.database import get_session, insert_ignore
+from app.models import LlmExtraction
+
+
+def _rows(*keys):
+    return [{"cache_key": key, "model": "m", "prompt_version": "1", "result": {}, "hit_count": 0} for key in keys]
+
+
+@pytest.fixture(params=["sqlite", "generic"])
+def dialect(request, db, monkeypatch):
+    """Runs a test on SQLite's ON CONFLICT path and on the fallback used by other dialects."""
+    if request.param == "generic":
+        monkeypatch.setattr(db.dialect, "name", "generic")
+    return request.param
+
+
+def test_insert_ignore_skips_existing_and_repeated_keys(dialect):
+    with get_session() as session:
+        insert_ignore(session, LlmExtraction, _rows("a"), ["cache_key"])
+    with get_session() as session:
+        inserted = insert_ignore(session, LlmExtraction, _rows("a", "b", "c", "b"), ["cache_key"],
+                                 returning=["cache_key"])
+
+    assert sorted(inserted) == [("b",), ("c",)]
+    with get_session() as session:
+        assert sorted(session.scalars(select(LlmExtraction.cache_key))) == ["a", "b", "c"]
+
+
+def test_insert_ignore_spans_several_statements(dialect):
+    keys = [str(i) for i in range(1200)]
+    with get_session() as session:
+        inserted = insert_ignore(session, LlmExtraction, _rows(*keys, "5", "1100"), ["cache_key"],
+                                 returning=["cache_key"])
+
+    assert sorted(key for key, in inserted) == sorted(keys)
+
+
+def test_insert_ignore_without_rows_is_a_no_op(db):
+    with get_session() as session:
+        assert insert_ignore(session, LlmExtraction, [], ["cache_key"], returning=["cache_key"]) == []
+        assert insert_ignore(session, LlmExtraction, [], ["cache_key"]) is None
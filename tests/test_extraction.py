@@ -0,0 +1,127 @@
+import io
+import multiprocessing
+import time
+
+import pytest
+from pypdf import PdfReader
+
+import app.pdf_collector as pdf_collector
+from tests.conftest import make_pdf
+
+
+def _hanging_extract(url, source, max_pages, per_page):
+    """Worker task that never finishes for URLs containing 'hang'."""
+    if "hang" in url:
+        time.sleep(600)
+    return pdf_collector._extract_pdf_text(url, source, max_pages, per_page)
+
+
+class _HangingExecutor(pdf_collector.ExtractionExecutor):
+    task = staticmethod(_hanging_extract)
+
+
+@pytest.fixture
+def executor():
+    executor = _HangingExecutor(workers=1, timeout=60, max_pages=None)
+    yield executor
+    executor._kill_pool()
+
+
+###############
+# Executor
+###############
+
+def test_a_document_past_the_timeout_fails_alone_and_the_pool_recovers(executor):
+    others = {child.pid for child in multiprocessing.active_children()}
+    # The first call pays for spawning the worker, so the short timeout only applies afterwards
+    assert executor.extract("warm-up", make_pdf(pages=1)).pages == 1
+    executor.timeout = 2
+    hung = {child.pid for child in multiprocessing.active_children()} - others
+    assert len(hung) == 1
+
+    results = executor.extract_many([
+        ("a", make_pdf(pages=2, seed=1)),
+        ("hang", make_pdf(pages=1)),
+        ("b", make_pdf(pages=3, seed=2)),
+    ])
+
+    assert isinstance(results[0], pdf_collector.PdfText) and results[0].pages == 2
+    assert isinstance(results[1], pdf_collector.ExtractionTimeoutError)
+    assert isinstance(results[2], pdf_collector.PdfText) and results[2].pages == 3
+    # The stuck worker was killed rather than left running
+    deadline = time.monotonic() + 5
+    while hung & {child.pid for child in multiprocessing.active_children()} and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not hung & {child.pid for child in multiprocessing.active_children()}
+    executor.timeout = 60
+    assert executor.extract("next", make_pdf(pages=2)).text.strip()
+
+
+def test_only_the_first_max_pages_are_extracted():
+    executor = pdf_collector.ExtractionExecutor(workers=1, max_pages=2)
+    try:
+        full = pdf_collector._extract_pdf_text("doc", make_pdf(pages=5), max_pages=None)
+        capped = executor.extract("doc", make_pdf(pages=5))
+    finally:
+        executor.shutdown()
+
+    assert capped.pages == 5 and len(capped.page_engines) == 2
+    assert full.text.startswith(capped.text) and len(capped.text) < len(full.text)
+
+
+def test_results_keep_the_input_order():
+    executor = pdf_collector.ExtractionExecutor(workers=2, max_pages=None)
+    items = [(f"doc-{pages}", make_pdf(pages=pages, seed=pages)) for pages in (6, 1, 4, 2)]
+    try:
+        results = executor.extract_many(items)
+    finally:
+        executor.shutdown()
+
+    assert [(r.url, r.pages) for r in results] == [("doc-6", 6), ("doc-1", 1), ("doc-4", 4), ("doc-2", 2)]
+
+
+###############
+# Per-page fallback
+###############
+
+def test_pdfminer_only_reruns_the_pages_pypdf_failed_on(monkeypatch):
+    source = make_pdf(pages=5, seed=3)
+    expected = pdf_collector._pdfminer_pages(io.BytesIO(source))
+    reader = PdfReader(io.BytesIO(source))
+    for i, broken in ((1, ""), (3, "��� ?? �")):
+        monkeypatch.setattr(reader.pages[i], "extract_text", lambda broken=broken: broken)
+    calls = []
+    pdfminer_pages = pdf_collector._pdfminer_pages
+
+    def spy(stream, page_numbers=None, max_pages=None):
+        calls.append(page_numbers)
+        return pdfminer_pages(stream, page_numbers, max_pages)
+
+    monkeypatch.setattr(pdf_collector, "_pdfminer_pages", spy)
+
+    texts, engines = pdf_collector._extract_pages_hybrid(reader, io.BytesIO(source))
+
+    assert calls == [[1, 3]]
+    assert engines == ["pypdf", "pdfminer", "pypdf", "pdfminer", "pypdf"]
+    assert texts[1] == expected[1] and texts[3] == expected[3]
+    # Pages pypdf read are kept as it read them, in place
+    assert texts[2] == PdfReader(io.BytesIO(source)).pages[2].extract_text()
+
+
+def test_pages_neither_engine_reads_are_marked_none(monkeypatch):
+    source = make_pdf(pages=3, seed=4)
+    reader = PdfReader(io.BytesIO(source))
+    monkeypatch.setattr(reader.pages[2], "extract_text", lambda: "")
+    monkeypatch.setattr(pdf_collector, "_pdfminer_pages", lambda stream, page_numbers=None, max_pages=None: [" \n"])
+
+    texts, engines = pdf_collector._extract_pages_hybrid(reader, io.BytesIO(source))
+
+    assert engines == ["pypdf", "pypdf", "none"] and texts[2] == ""
+
+
+def test_a_page_pypdf_reads_well_never_reaches_pdfminer(monkeypatch):
+    monkeypatch.setattr(pdf_collector, "_pdfminer_pages", lambda *args, **kwargs: pytest.fail("pdfminer was called"))
+
+    result = pdf_collector._extract_pdf_text("doc", make_pdf(pages=4, seed=5), max_pages=None, per_page=True)
+
+    assert result.page_engines == ["pypdf"] * 4 and result.text.strip()
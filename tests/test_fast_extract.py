@@ -0,0 +1,162 @@
+import pytest
+from sqlalchemy import select
+
+from app import analyzer
+from app.analyzer import process_raw_documents
+from app.database import get_session
+from app.fast_extract import COURTS, FAST_PATH_DEFAULTS, fast_extract
+from app.models import Document
+from tests.conftest import add_raw_documents
+
+HEADER = """IN THE SUPREME COURT OF PAKISTAN
+(Appellate Jurisdiction)
+
+Present: Mr. Justice A, HCJ
+Mr. Justice B
+
+Criminal Petition No. 123 of 2019
+
+Muhammad Aslam ---- Petitioner
+Versus
+The State through Prosecutor General Punjab ---- Respondent
+
+For the Petitioner: Mr. C, ASC
+Date of hearing: 12th March, 2019
+
+JUDGMENT
+
+The petitioner seeks post-arrest bail in a case under section 302 PPC.
+"""
+
+PAYLOAD = {"Case No": "Crl.P. 123/2019", "Citation": "2019 SCMR 1234", "Topic": "Bail, Murder"}
+
+
+###############
+# Rules
+###############
+
+def test_a_supreme_court_judgment_is_filled_completely():
+    result = fast_extract(PAYLOAD, HEADER)
+
+    assert result.complete and result.missing() == []
+    assert result.confident() == {
+        "reference_id": "Crl.P. 123/2019",
+        "tags": "Bail, Murder",
+        "citation": "2019 SCMR 1234",
+        "year": 2019,
+        "court": "Supreme Court of Pakistan",
+        "jurisdiction": "Pakistan",
+        "authority_level": "Apex Court",
+        "doc_type": "Judgment",
+        "title": "Muhammad Aslam v. The State through Prosecutor General Punjab",
+        "date": "2019-03-12",
+    }
+    assert result.filled()["legal_status"] == FAST_PATH_DEFAULTS["legal_status"]
+
+
+@pytest.mark.parametrize("citation, expected, year, court", [
+    ("PLD 2019 SC 123", "PLD 2019 SC 123", 2019, "Supreme Court of Pakistan"),
+    ("PLD 2020 Lahore 10", "PLD 2020 Lahore 10", 2020, "Lahore High Court"),
+    ("2021 P.Cr.L.J. 45", "2021 P.Cr.L.J. 45", 2021, None),
+    ("2018  S C M R  77", "2018 S C M R 77", 2018, "Supreme Court of Pakistan"),
+])
+def test_citations_give_the_year_and_court(citation, expected, year, court):
+    result = fast_extract({"Citation": citation}, "")
+
+    assert (result.fields["citation"], result.fields["year"]) == (expected, year)
+    assert result.fields.get("court") == court
+
+
+def test_a_citation_found_only_in_the_text_is_less_certain():
+    result = fast_extract({}, "Reported as PLD 2017 Peshawar 55 in the law reports.")
+
+    assert result.fields["citation"] == "PLD 2017 Peshawar 55"
+    assert result.confidence["citation"] < 1.0
+    assert result.fields["court"] == "Peshawar High Court"
+
+
+@pytest.mark.parametrize("header, court, jurisdiction", [
+    ("IN THE HIGH COURT OF SINDH, KARACHI", "Sindh High Court", "Sindh"),
+    ("IN THE LAHORE HIGH COURT, LAHORE", "Lahore High Court", "Punjab"),
+    ("IN THE ISLAMABAD HIGH COURT, ISLAMABAD", "Islamabad High Court", "Islamabad Capital Territory"),
+    ("IN THE FEDERAL SHARIAT COURT", "Federal Shariat Court", "Pakistan"),
+])
+def test_the_court_header_gives_court_and_jurisdiction(header, court, jurisdiction):
+    result = fast_extract({}, f"{header}\n\nORDER\n\nDisposed of.")
+
+    assert result.confident() == {
+        "court": court, "jurisdiction": jurisdiction, "authority_level": COURTS[court][1], "doc_type": "Order",
+    }
+
+
+@pytest.mark.parametrize("line, date", [
+    ("Date of hearing: 12th March, 2019", "2019-03-12"),
+    ("Date of decision - 1 January 2020", "2020-01-01"),
+    ("Date of Judgment: 05.06.2021", "2021-06-05"),
+    ("Date of order: 5-6-2021", "2021-06-05"),
+    ("Date of hearing: 31.02.2021", None),
+])
+def test_dated_header_lines(line, date):
+    result = fast_extract({}, f"JUDGMENT\n{line}\n")
+
+    assert result.fields.get("date") == date
+    if date:
+        assert result.fields["year"] == int(date[:4])
+
+
+def test_missing_parts_are_left_to_gemini():
+    result = fast_extract({"Case No": "C.P. 1/2020"}, "Some text without a header.")
+
+    assert not result.complete
+    assert "legal_status" not in result.missing()
+    assert set(result.missing()) == {"title", "doc_type", "jurisdiction", "court", "authority_level", "citation"}
+
+
+###############
+# Analyzer
+###############
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Every document sent to Gemini by the analyzer, as (payload, pdf_text, fields)."""
+    calls = []
+    extract = analyzer.extract_many_from_gemini
+
+    def spy(items):
+        calls.extend(items)
+        return extract(items)
+
+    monkeypatch.setattr(analyzer, "extract_many_from_gemini", spy)
+    return calls
+
+
+def test_a_complete_document_skips_the_backend(db, llm_calls):
+    add_raw_documents([(PAYLOAD, HEADER), ({"Case No": "C.P. 9/2020"}, "Unstructured text.")])
+
+    assert process_raw_documents(cache_mode="bypass") == 2
+
+    assert [payload["Case No"] for payload, _, _ in llm_calls] == ["C.P. 9/2020"]
+    with get_session() as session:
+        document = session.scalars(select(Document).where(Document.reference_id == "Crl.P. 123/2019")).one()
+        assert (document.court, document.citation, document.year) == ("Supreme Court Of Pakistan", "2019 SCMR 1234", 2019)
+        assert document.legal_status == FAST_PATH_DEFAULTS["legal_status"]
+
+
+def test_a_partly_filled_document_asks_for_the_defaulted_fields_too(db, llm_calls):
+    add_raw_documents([({"Case No": "C.P. 9/2020", "Citation": "2019 SCMR 1"}, "Unstructured text.")])
+
+    process_raw_documents(cache_mode="bypass")
+
+    (_, _, fields), = llm_calls
+    assert "legal_status" in fields and "citation" not in fields
+
+
+def test_complete_documents_are_not_queued_as_a_batch_job(db, monkeypatch):
+    queued = []
+    monkeypatch.setattr(analyzer, "submit_batch_job", lambda requests, display_name: queued.extend(requests))
+    add_raw_documents([(PAYLOAD, HEADER), ({"Case No": "C.P. 9/2020"}, "Unstructured text.")])
+
+    analyzer.submit_extraction_job()
+
+    (_, prompt), = queued
+    assert "C.P. 9/2020" in prompt
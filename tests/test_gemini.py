@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+
+import gemini
+import llm_backends
+import rate_governor
+from llm_backends import FakeBackend
+from rate_governor import RateGovernor
+
+ITEMS = [({"Case No": f"C.P. {i}/2020"}, f"JUDGMENT\nThe petition {i} is dismissed.") for i in range(20)]
+
+
+@pytest.fixture
+def governor(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_governor, "BACKOFF_BASE", 0.001)
+    governor = RateGovernor(str(tmp_path / "governor.db"), rpm=0, tpm=0, circuit_threshold=10**6)
+    yield governor
+    governor.close()
+
+
+class _RecordingBackend(FakeBackend):
+    """Fails half its requests and records, in call order, which ones failed."""
+
+    def __init__(self):
+        super().__init__(latency_median_ms=0, error_rate=0.5)
+        self.outcomes = []
+
+    def _answer(self, prompt):
+        try:
+            response = super()._answer(prompt)
+        except llm_backends.LLMBackendError:
+            self.outcomes.append(False)
+            raise
+        self.outcomes.append(True)
+        return response
+
+
+@pytest.fixture
+def created(monkeypatch):
+    """Every backend extract_many_from_gemini builds."""
+    backends = []
+
+    def create_backend(model, system_instruction):
+        backends.append(_RecordingBackend())
+        return backends[-1]
+
+    monkeypatch.setattr(gemini, "create_backend", create_backend)
+    return backends
+
+
+###############
+# Fake backend
+###############
+
+def test_unseeded_fake_backends_share_the_process_rng():
+    assert FakeBackend().rng is FakeBackend().rng is llm_backends._fake_rng
+    seeded = [FakeBackend(seed=7, latency_median_ms=100) for _ in range(2)]
+    assert seeded[0].rng is not seeded[1].rng
+    assert seeded[0]._latency() == seeded[1]._latency()
+
+
+def test_successive_batches_do_not_replay_the_injected_failures(created, governor):
+    def batch():
+        return asyncio.run(gemini.extract_many_from_gemini_async(ITEMS, governor=governor, max_retries=1))
+
+    batch()
+    batch()
+
+    first, second = (backend.outcomes for backend in created)
+    assert len(first) == len(second) == len(ITEMS)
+    assert 0 < sum(first) < len(ITEMS) and first != second
+
+
+###############
+# Sync batches
+###############
+
+def test_a_thread_reuses_its_backend_across_batches(created, governor, monkeypatch):
+    monkeypatch.setattr(gemini, "get_rate_governor", lambda: governor)
+    monkeypatch.setattr(gemini, "_batch_runtime", threading.local())
+    monkeypatch.setattr(gemini, "_batch_runners", [])
+    closed = []
+    monkeypatch.setattr(FakeBackend, "aclose", lambda self: asyncio.sleep(0, closed.append(self)))
+
+    gemini.extract_many_from_gemini(ITEMS, max_retries=1)
+    gemini.extract_many_from_gemini(ITEMS, max_retries=1)
+    assert len(created) == 1 and closed == []
+    assert len(created[0].outcomes) == 2 * len(ITEMS)
+
+    other = threading.Thread(target=gemini.extract_many_from_gemini, args=(ITEMS[:2],))
+    other.start()
+    other.join()
+    assert len(created) == 2
+
+    gemini._close_batch_runners()
+    assert set(map(id, closed)) == set(map(id, created))
@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import select
+
+from app import llm_cache
+from app.database import get_session
+from app.gemini import extraction_cache_key
+from app.models import LlmExtraction
+
+PAYLOAD = {"Case No": "C.P. 12/2020", "Citation": "2021 SCMR 45", "Topic": "Bail"}
+TEXT = "IN THE SUPREME COURT OF PAKISTAN\nJUDGMENT\nThe petition is dismissed."
+
+
+def test_cache_key_changes_with_every_prompt_input():
+    key = extraction_cache_key(PAYLOAD, TEXT)
+
+    assert key == extraction_cache_key(dict(PAYLOAD), TEXT)
+    assert key != extraction_cache_key({**PAYLOAD, "Topic": "Murder"}, TEXT)
+    assert key != extraction_cache_key(PAYLOAD, TEXT + " Appeal allowed.")
+    assert key != extraction_cache_key(PAYLOAD, TEXT, ["citation"])
+
+
+def test_stored_results_are_served_and_counted(db):
+    llm_cache.store_many({"k1": {"court": "Supreme Court of Pakistan"}})
+
+    assert llm_cache.lookup_many(["k1", "k2"]) == {"k1": {"court": "Supreme Court of Pakistan"}}
+    llm_cache.lookup_many(["k1"])
+    with get_session() as session:
+        assert session.scalar(select(LlmExtraction.hit_count).where(LlmExtraction.cache_key == "k1")) == 2
+
+
+def test_use_mode_keeps_the_first_answer(db):
+    llm_cache.store_many({"k1": {"year": 2020}})
+    llm_cache.store_many({"k1": {"year": 2021}})
+
+    assert llm_cache.lookup_many(["k1"]) == {"k1": {"year": 2020}}
+
+
+def test_refresh_mode_ignores_and_overwrites_cached_answers(db):
+    llm_cache.store_many({"k1": {"year": 2020}})
+
+    assert llm_cache.lookup_many(["k1"], "refresh") == {}
+    llm_cache.store_many({"k1": {"year": 2021}}, "refresh")
+    assert llm_cache.lookup_many(["k1"]) == {"k1": {"year": 2021}}
+
+
+def test_bypass_mode_neither_reads_nor_writes(db):
+    llm_cache.store_many({"k1": {"year": 2020}})
+
+    assert llm_cache.lookup_many(["k1"], "bypass") == {}
+    llm_cache.store_many({"k2": {"year": 2021}}, "bypass")
+    assert llm_cache.lookup_many(["k2"]) == {}
+
+
+def test_unknown_modes_are_rejected():
+    with pytest.raises(ValueError):
+        llm_cache.resolve_mode("sometimes")
+
+
+def test_purge_stale_drops_other_prompt_versions_and_models(db):
+    llm_cache.store_many({"current": {"year": 2020}})
+    with get_session() as session:
+        session.add(LlmExtraction(cache_key="old-prompt", model=llm_cache.CACHE_MODEL, prompt_version="0", result={}))
+        session.add(LlmExtraction(cache_key="old-model", model="retired", prompt_version=llm_cache.PROMPT_VERSION,
+                                  result={}))
+
+    assert llm_cache.purge_stale() == 2
+    assert set(llm_cache.lookup_many(["current", "old-prompt", "old-model"])) == {"current"}
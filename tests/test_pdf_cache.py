@@ -0,0 +1,138 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app.pdf_collector as pdf_collector
+from tests.conftest import make_pdf
+
+PdfCache = pdf_collector.PdfCache
+
+
+def _store(cache, url, body, etag=None):
+    return cache.store(url, io.BytesIO(body), etag, None)
+
+
+def test_identical_bodies_share_one_blob(tmp_path):
+    cache = PdfCache(root=str(tmp_path))
+    first = _store(cache, "http://a/1.pdf", b"%PDF same body")
+    second = _store(cache, "http://mirror/1.pdf", b"%PDF same body")
+
+    assert first.sha256 == second.sha256
+    blobs = [name for _, _, names in os.walk(tmp_path / "blobs") for name in names]
+    assert blobs == [f"{first.sha256}.pdf"]
+    assert cache.total_bytes() == len(b"%PDF same body")
+
+
+def test_least_recently_used_urls_are_evicted(tmp_path, monkeypatch):
+    cache = PdfCache(root=str(tmp_path), max_bytes=250)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr("pdf_cache.time.time", lambda: next(clock))
+    _store(cache, "http://a", b"a" * 100)
+    _store(cache, "http://b", b"b" * 100)
+    cache.touch("http://a")
+    _store(cache, "http://c", b"c" * 100)
+
+    assert cache.lookup("http://b") is None
+    assert cache.lookup("http://a") is not None and cache.lookup("http://c") is not None
+    assert cache.total_bytes() == 200
+
+
+def test_the_entry_just_written_survives_even_above_the_cap(tmp_path):
+    cache = PdfCache(root=str(tmp_path), max_bytes=10)
+    _store(cache, "http://small", b"s" * 5)
+    _store(cache, "http://big", b"b" * 50)
+
+    assert cache.lookup("http://small") is None
+    assert cache.lookup("http://big").size == 50
+
+
+def test_eviction_sums_the_blobs_once_and_counts_only_freed_ones(tmp_path, monkeypatch):
+    cache = PdfCache(root=str(tmp_path), max_bytes=250)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr("pdf_cache.time.time", lambda: next(clock))
+    _store(cache, "http://a", b"a" * 100)
+    _store(cache, "http://mirror", b"a" * 100)
+    _store(cache, "http://b", b"b" * 100)
+    sums = []
+    total_bytes = cache.total_bytes
+    monkeypatch.setattr(cache, "total_bytes", lambda: sums.append(1) or total_bytes())
+
+    _store(cache, "http://c", b"c" * 100)
+
+    assert len(sums) == 1
+    # Dropping http://a alone frees nothing while its mirror still points at the blob
+    assert [url for url in ("http://a", "http://mirror", "http://b", "http://c") if cache.lookup(url)] == [
+        "http://b", "http://c"
+    ]
+    assert total_bytes() == 200
+
+
+def test_partial_locks_claimed_and_released_from_many_threads(tmp_path):
+    cache = PdfCache(root=str(tmp_path))
+    urls = [f"http://a/{i}.pdf" for i in range(50)]
+
+    def cycle(url):
+        for _ in range(20):
+            assert cache.claim_partial(url)
+            cache.release_partial(url)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(cycle, urls))
+
+    assert cache._partial_locks == {}
+    assert not [name for name in os.listdir(tmp_path / "partial") if name.endswith(".lock")]
+
+
+def test_entries_whose_blob_vanished_are_dropped(tmp_path):
+    cache = PdfCache(root=str(tmp_path))
+    entry = _store(cache, "http://a", b"%PDF body")
+    os.remove(cache.blob_path(entry.sha256))
+
+    assert cache.lookup("http://a") is None
+
+
+def test_cached_copies_are_revalidated_with_their_etag(pdf_server, pdf_cache):
+    body = make_pdf(pages=1)
+    url = pdf_server.serve("/doc.pdf", body, etag='"abc"')
+
+    with pdf_collector._download_pdf(url) as first:
+        assert first.read() == body
+    with pdf_collector._download_pdf(url) as second:
+        assert second.read() == body
+
+    revalidation = pdf_server.requests_for("/doc.pdf")[1]
+    assert revalidation["If-None-Match"] == '"abc"'
+    assert len(pdf_server.requests_for("/doc.pdf")) == 2
+
+
+def test_a_changed_document_replaces_the_cached_copy(pdf_server, pdf_cache):
+    url = pdf_server.serve("/doc.pdf", make_pdf(pages=1, seed=1), etag='"v1"')
+    pdf_collector._download_pdf(url).close()
+    new_body = make_pdf(pages=1, seed=2)
+    pdf_server.serve("/doc.pdf", new_body, etag='"v2"')
+
+    with pdf_collector._download_pdf(url) as f:
+        assert f.read() == new_body
+    assert pdf_cache.lookup(url).etag == '"v2"'
+
+
+def test_fresh_entries_are_served_without_a_request(pdf_server, pdf_cache):
+    pdf_cache.max_age = 3600
+    url = pdf_server.serve("/doc.pdf", make_pdf(pages=1))
+    pdf_collector._download_pdf(url).close()
+    pdf_collector._download_pdf(url).close()
+
+    assert len(pdf_server.requests_for("/doc.pdf")) == 1
+
+
+def test_offline_mode_serves_hits_and_raises_on_misses(pdf_server, pdf_cache):
+    url = pdf_server.serve("/doc.pdf", make_pdf(pages=1))
+    pdf_collector._download_pdf(url).close()
+    pdf_cache.offline = True
+
+    pdf_collector._download_pdf(url).close()
+    with pytest.raises(pdf_collector.CacheMissError):
+        pdf_collector._download_pdf(pdf_server.url("/other.pdf"))
+    assert len(pdf_server.requests) == 1
@@ -0,0 +1,243 @@
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+import app.pdf_collector as pdf_collector
+from tests.conftest import make_pdf
+
+
+###############
+# Batch fetch
+###############
+
+def test_fetch_pdf_texts_keeps_input_order_and_isolates_failures(pdf_server, no_pdf_cache):
+    urls = [
+        pdf_server.serve("/a.pdf", make_pdf(pages=2, seed=1)),
+        pdf_server.url("/missing.pdf"),
+        pdf_server.serve("/page.html", b"<html>not a pdf</html>", content_type="text/html"),
+        pdf_server.serve("/b.pdf", make_pdf(pages=3, seed=2)),
+    ]
+
+    results = pdf_collector.fetch_pdf_texts(urls)
+
+    assert [type(r) for r in results] == [
+        pdf_collector.PdfText, httpx.HTTPStatusError, ValueError, pdf_collector.PdfText
+    ]
+    assert (results[0].url, results[0].pages) == (urls[0], 2)
+    assert (results[3].url, results[3].pages) == (urls[3], 3)
+    assert results[0].text.strip() and results[3].text.strip()
+
+
+@pytest.mark.parametrize("max_concurrency, per_host_limit, peak", [(6, 2, 2), (3, 6, 3), (6, 1, 1)])
+def test_fetch_pdf_texts_respects_the_per_host_limit(pdf_server, no_pdf_cache, max_concurrency, per_host_limit, peak):
+    pdf_server.delay = 0.1
+    urls = [pdf_server.serve(f"/{i}.pdf", make_pdf(pages=1, seed=i)) for i in range(6)]
+
+    results = pdf_collector.fetch_pdf_texts(urls, max_concurrency=max_concurrency, per_host_limit=per_host_limit)
+
+    assert all(isinstance(r, pdf_collector.PdfText) for r in results)
+    assert pdf_server.peak_in_flight == peak
+
+
+###############
+# Body checks
+###############
+
+@pytest.mark.parametrize("body", [
+    b"<html><body>Session expired, please log in again.</body></html>" * 40,
+    b"<html>short</html>",
+    b"",
+])
+def test_a_body_that_is_not_a_pdf_is_rejected_whatever_its_content_type(pdf_server, pdf_cache, body):
+    url = pdf_server.serve("/login.pdf", body, content_type="application/pdf")
+
+    with pytest.raises(ValueError, match="not a PDF"):
+        _read(url)
+    async_result, = pdf_collector.fetch_pdf_texts([url])
+    assert isinstance(async_result, ValueError)
+    # Nothing was cached or kept for a resume
+    assert pdf_cache.lookup(url) is None
+    assert not os.path.exists(pdf_cache.partial_path(url))
+
+
+def test_a_little_junk_before_the_pdf_header_is_tolerated(pdf_server, no_pdf_cache):
+    body = b"\r\n" * 100 + make_pdf(pages=1)
+    url = pdf_server.serve("/junk.pdf", body, content_type="application/octet-stream")
+
+    assert _read(url) == body
+
+
+@pytest.mark.parametrize("pages, rolled", [(1, False), (30, True)])
+def test_the_spool_holds_small_bodies_in_memory_and_spills_large_ones(pdf_server, no_pdf_cache, monkeypatch,
+                                                                      pages, rolled):
+    monkeypatch.setattr(pdf_collector, "PDF_SPOOL_THRESHOLD", 16 * 1024)
+    body = make_pdf(pages=pages)
+    assert (len(body) > pdf_collector.PDF_SPOOL_THRESHOLD) == rolled
+    url = pdf_server.serve("/doc.pdf", body)
+
+    with pdf_collector._download_pdf(url) as f:
+        assert f._rolled == rolled
+        assert f.read() == body
+
+
+def test_the_spool_enforces_the_size_limit(monkeypatch):
+    monkeypatch.setattr(pdf_collector, "MAX_DOWNLOAD_SIZE", 4096)
+    spool = pdf_collector._PdfSpool()
+    spool.feed(b"%PDF-1.7\n" + b"0" * 3000)
+
+    with pytest.raises(ValueError, match="size limit"):
+        spool.feed(b"0" * 2000)
+    spool.close()
+
+
+###################
+# Resumable downloads
+###################
+
+@pytest.fixture
+def no_retry_sleep(monkeypatch):
+    monkeypatch.setattr(pdf_collector.time, "sleep", lambda seconds: None)
+
+
+def _read(url: str) -> bytes:
+    with pdf_collector._download_pdf(url) as f:
+        return f.read()
+
+
+def test_a_dropped_download_resumes_with_range_and_if_range(pdf_server, pdf_cache, no_retry_sleep):
+    body = make_pdf(pages=20)
+    url = pdf_server.serve("/big.pdf", body, etag='"v1"')
+    pdf_server.drop_after("/big.pdf", 3000)
+
+    assert _read(url) == body
+    retry = pdf_server.requests_for("/big.pdf")[1]
+    assert retry["Range"] == "bytes=3000-"
+    assert retry["If-Range"] == '"v1"'
+    assert not os.path.exists(pdf_cache.partial_path(url))
+
+
+def test_a_partial_download_survives_for_the_next_run(pdf_server, pdf_cache, no_retry_sleep, monkeypatch):
+    body = make_pdf(pages=20)
+    url = pdf_server.serve("/big.pdf", body)
+    pdf_server.drop_after("/big.pdf", 3000)
+    monkeypatch.setattr(pdf_collector, "DOWNLOAD_ATTEMPTS", 1)
+
+    with pytest.raises(httpx.TransportError):
+        _read(url)
+    assert os.path.getsize(pdf_cache.partial_path(url)) == 3000
+
+    assert _read(url) == body
+    assert pdf_server.requests_for("/big.pdf")[1]["Range"] == "bytes=3000-"
+
+
+def test_a_changed_document_restarts_from_byte_zero(pdf_server, pdf_cache, no_retry_sleep, monkeypatch):
+    url = pdf_server.serve("/big.pdf", make_pdf(pages=20, seed=1), etag='"v1"')
+    pdf_server.drop_after("/big.pdf", 3000)
+    monkeypatch.setattr(pdf_collector, "DOWNLOAD_ATTEMPTS", 1)
+    with pytest.raises(httpx.TransportError):
+        _read(url)
+
+    # If-Range no longer matches, so the server answers 200 with the whole new body
+    new_body = make_pdf(pages=20, seed=2)
+    pdf_server.serve("/big.pdf", new_body, etag='"v2"')
+    assert _read(url) == new_body
+
+
+def test_a_server_ignoring_ranges_restarts_the_download(pdf_server, pdf_cache, no_retry_sleep):
+    body = make_pdf(pages=20)
+    url = pdf_server.serve("/big.pdf", body, ranges=False)
+    pdf_server.drop_after("/big.pdf", 3000)
+
+    assert _read(url) == body
+
+
+def test_without_the_cache_retries_resume_into_the_spool(pdf_server, no_pdf_cache, no_retry_sleep):
+    body = make_pdf(pages=20)
+    url = pdf_server.serve("/big.pdf", body)
+    pdf_server.drop_after("/big.pdf", 3000)
+
+    assert _read(url) == body
+    assert pdf_server.requests_for("/big.pdf")[1]["Range"] == "bytes=3000-"
+
+
+def test_a_concurrent_download_of_the_same_url_leaves_the_partial_file_alone(pdf_server, pdf_cache):
+    body = make_pdf(pages=5)
+    url = pdf_server.serve("/doc.pdf", body)
+    # Another download (here: another process's cache instance) owns the .part
+    owner = pdf_collector.PdfCache(root=pdf_cache.root)
+    assert owner.claim_partial(url)
+    part = owner.partial_path(url)
+    with open(part, "wb") as f:
+        f.write(body[:100])
+
+    assert _read(url) == body
+    assert "Range" not in pdf_server.requests_for("/doc.pdf")[0]
+    with open(part, "rb") as f:
+        assert f.read() == body[:100]
+    assert pdf_cache.lookup(url).size == len(body)
+    owner.release_partial(url)
+    owner.close()
+
+
+def test_a_lock_left_by_a_dead_process_is_taken_over(pdf_server, pdf_cache):
+    body = make_pdf(pages=5)
+    url = pdf_server.serve("/doc.pdf", body)
+    part = pdf_cache.partial_path(url)
+    os.makedirs(os.path.dirname(part), exist_ok=True)
+    with open(part, "wb") as f:
+        f.write(body[:100])
+    pdf_cache.save_partial(url, '"v1"', None)
+    with open(f"{part}.lock", "w") as f:
+        f.write("999999999")
+
+    assert _read(url) == body
+    assert pdf_server.requests_for("/doc.pdf")[0]["Range"] == "bytes=100-"
+    assert not os.path.exists(f"{part}.lock")
+
+
+def test_concurrent_batch_downloads_of_one_url_agree(pdf_server, pdf_cache):
+    body = make_pdf(pages=10)
+    url = pdf_server.serve("/doc.pdf", body)
+    pdf_server.delay = 0.05
+
+    results = pdf_collector.fetch_pdf_texts([url] * 4)
+
+    assert all(isinstance(r, pdf_collector.PdfText) for r in results)
+    assert len({r.text for r in results}) == 1
+    with pdf_cache.open(pdf_cache.lookup(url)) as f:
+        assert f.read() == body
+    assert not os.listdir(os.path.dirname(pdf_cache.partial_path(url)))
+
+
+def test_a_cancelled_async_download_keeps_its_partial_body_and_gives_up_the_claim(pdf_server, pdf_cache, monkeypatch):
+    monkeypatch.setattr(pdf_collector, "ASYNC_WRITE_BUFFER", 1024)
+    body = make_pdf(pages=40)
+    url = pdf_server.serve("/big.pdf", body)
+    pdf_server.stall_after("/big.pdf", 100_000)
+    part = pdf_cache.partial_path(url)
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            task = asyncio.create_task(pdf_collector._download_pdf_async(url, client))
+            deadline = time.monotonic() + 5
+            while not (os.path.exists(part) and os.path.getsize(part) >= 50_000) and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            while os.path.exists(f"{part}.lock") and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            pdf_server.resume.set()
+            kept = os.path.getsize(part)
+
+            with await pdf_collector._download_pdf_async(url, client) as f:
+                return kept, f.read()
+
+    kept, received = asyncio.run(run())
+
+    assert received == body
+    assert 50_000 <= kept <= 100_000
+    assert pdf_server.requests_for("/big.pdf")[1]["Range"] == f"bytes={kept}-"
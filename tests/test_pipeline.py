@@ -0,0 +1,149 @@
+import io
+import threading
+import time
+
+import pytest
+from sqlalchemy import select
+
+from app import service
+from app.database import get_session
+from app.models import Document, RawDocument
+from app.pipeline import Pipeline, Stage
+from tests.conftest import make_pdf
+
+
+def _collect(sink: list):
+    """A last stage appending every item it gets to `sink`."""
+    lock = threading.Lock()
+
+    def append(item):
+        with lock:
+            sink.append(item)
+
+    return append
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+###############
+# Pipeline
+###############
+
+def test_close_drains_every_stage_before_returning():
+    sink = []
+
+    def slow_double(item):
+        time.sleep(0.001)
+        return item * 2
+
+    pipeline = Pipeline([
+        Stage("double", slow_double, workers=3),
+        Stage("batch", lambda items: items, batch_size=4, batch_timeout=30),
+        Stage("sink", _collect(sink)),
+    ], report_interval=0).start()
+    for i in range(50):
+        pipeline.put(i)
+
+    started = time.monotonic()
+    counts = pipeline.close()
+
+    # The partial batch left behind _STOP is flushed rather than waiting out batch_timeout
+    assert time.monotonic() - started < 10
+    assert sorted(sink) == [i * 2 for i in range(50)]
+    assert {name: c["processed"] for name, c in counts.items()} == {"double": 50, "batch": 50, "sink": 50}
+    assert not any(thread.is_alive() for thread in pipeline._threads)
+    with pytest.raises(RuntimeError):
+        pipeline.put(1)
+
+
+def test_a_full_queue_blocks_the_stage_feeding_it():
+    release = threading.Event()
+    fed = []
+    pipeline = Pipeline([Stage("blocked", lambda item: release.wait(), queue_size=2)], report_interval=0).start()
+
+    def feed():
+        for i in range(10):
+            pipeline.put(i)
+            fed.append(i)
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    # One item is held by the worker and two fill the queue; the fourth put() waits
+    _wait_for(lambda: len(fed) == 3 and pipeline.stages[0].busy == 1)
+    time.sleep(0.2)
+    assert len(fed) == 3 and pipeline.stages[0].depth == 2
+
+    release.set()
+    feeder.join(5)
+    assert pipeline.close()["blocked"]["processed"] == 10
+
+
+def test_a_failing_item_is_counted_and_the_rest_keep_flowing():
+    sink = []
+
+    def parse(item):
+        if item == 3:
+            raise ValueError("bad row")
+        return item
+
+    pipeline = Pipeline([Stage("parse", parse), Stage("sink", _collect(sink))], report_interval=0).start()
+    for i in range(6):
+        pipeline.put(i)
+    counts = pipeline.close()
+
+    assert sink == [0, 1, 2, 4, 5]
+    assert (counts["parse"]["processed"], counts["parse"]["failed"]) == (5, 1)
+
+
+@pytest.mark.parametrize("retry_items, saved, failed", [(False, [], 4), (True, [1, 2, 4], 1)])
+def test_a_failing_batch_is_dropped_unless_its_items_are_retried(retry_items, saved, failed):
+    sink = []
+    calls = []
+
+    def save(batch):
+        calls.append(list(batch))
+        if 3 in batch:
+            raise ValueError("constraint violated")
+        return batch
+
+    pipeline = Pipeline([
+        Stage("save", save, batch_size=4, batch_timeout=30, retry_items=retry_items),
+        Stage("sink", _collect(sink)),
+    ], report_interval=0).start()
+    for i in (1, 2, 3, 4):
+        pipeline.put(i)
+    counts = pipeline.close()
+
+    assert sink == saved
+    assert counts["save"]["failed"] == failed
+    assert counts["save"]["processed"] == len(saved)
+    if retry_items:
+        assert calls == [[1, 2, 3, 4], [1], [2], [3], [4]]
+
+
+###############
+# Crawl pipeline
+###############
+
+def test_a_bad_row_in_a_crawl_does_not_drop_the_rows_saved_with_it(db, monkeypatch):
+    monkeypatch.setattr(service, "_download_pdf", lambda url: io.BytesIO(make_pdf(pages=1, seed=len(url))))
+    monkeypatch.setattr(service, "get_extraction_executor", lambda: None)
+    metadata_id = service.store_raw_metadata("https://example.test/list", ",", ["Case No", "Judgement"])
+    records = [{"Case No": f"C.P. {i}/2020", "Judgement": f"https://example.test/{i}.pdf"} for i in range(4)]
+    # Not JSON serialisable, so storing this row raises
+    records[2]["Topic"] = object()
+
+    pipeline = service.start_crawl_pipeline(metadata_id, "Judgement", save_interval=10, cache_mode="bypass")
+    for record in records:
+        pipeline.put(record)
+    counts = pipeline.close()
+
+    assert (counts["persist_raw"]["processed"], counts["persist_raw"]["failed"]) == (3, 1)
+    with get_session() as session:
+        assert set(session.scalars(select(RawDocument.pdf_uri))) == {records[i]["Judgement"] for i in (0, 1, 3)}
+        assert len(session.scalars(select(Document.id)).all()) == 3
@@ -0,0 +1,71 @@
+import pytest
+
+from app.prompt_builder import GAP_MARKER, PROMPT_HEAD_SHARE, count_tokens, select_text
+
+HEAD = [
+    "IN THE SUPREME COURT OF PAKISTAN (Appellate Jurisdiction)",
+    "Present: Mr. Justice A, HCJ and Mr. Justice B",
+    "Criminal Petition No. 123 of 2019",
+    "Muhammad Aslam ---- Petitioner Versus The State ---- Respondent",
+]
+FILLER = "The learned counsel read the statements of the witnesses recorded during the trial at some length. "
+SIGNAL = "Reliance was placed on 2017 SCMR 1189 where the same question was settled."
+OPERATIVE = "For the foregoing reasons the petition is dismissed and leave to appeal is refused."
+
+
+def _judgment(filler_paragraphs: int = 40) -> str:
+    middle = [f"{i + 1}. " + FILLER * 3 for i in range(filler_paragraphs)]
+    middle.insert(filler_paragraphs // 2, SIGNAL)
+    return "\n\n".join([*HEAD, *middle, OPERATIVE])
+
+
+def _selected_tokens(selected: str) -> int:
+    return sum(count_tokens(part) for part in selected.split("\n\n") if part != GAP_MARKER)
+
+
+###############
+# select_text
+###############
+
+@pytest.mark.parametrize("budget", [120, 200, 400, 800])
+def test_the_selection_stays_within_the_budget(budget):
+    text = _judgment()
+    assert count_tokens(text) > budget
+
+    selected = select_text(text, budget)
+
+    assert _selected_tokens(selected) <= budget
+    assert len(selected) < len(text)
+
+
+def test_the_header_and_the_operative_order_survive_truncation():
+    selected = select_text(_judgment(), 200)
+    parts = selected.split("\n\n")
+
+    assert parts[:len(HEAD)] == HEAD
+    assert parts[-1] == OPERATIVE
+    assert SIGNAL in parts
+    # Segments keep document order, and skipped filler shows as gaps
+    assert parts.index(HEAD[-1]) < parts.index(SIGNAL) < parts.index(OPERATIVE)
+    assert parts.count(GAP_MARKER) == 2
+    # Only the head and tail shares reach into the filler, clipped on a word boundary
+    filler = [part for part in parts if "learned counsel" in part]
+    assert len(filler) == 2 and all(len(part) < len(FILLER) * 3 for part in filler)
+
+
+def test_an_oversized_first_paragraph_is_clipped_and_leaves_room_for_the_tail():
+    opening = "IN THE LAHORE HIGH COURT " + "the facts are narrated here in detail " * 200
+    selected = select_text(f"{opening}\n\n{FILLER * 20}\n\n{OPERATIVE}", 150)
+    first, *_, last = selected.split("\n\n")
+
+    assert first.startswith("IN THE LAHORE HIGH COURT")
+    assert count_tokens(first) <= int(150 * PROMPT_HEAD_SHARE)
+    assert last == OPERATIVE
+    assert _selected_tokens(selected) <= 150
+
+
+def test_a_text_within_the_budget_is_only_normalised():
+    text = "\n\n".join(HEAD) + "\n\n\n" + OPERATIVE
+
+    assert select_text(text, 800) == "\n\n".join([*HEAD, OPERATIVE])
+    assert select_text("", 800) == ""
@@ -0,0 +1,152 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import rate_governor
+from rate_governor import RateGovernor
+
+
+class _Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class _ApiError(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(rate_governor, "time", clock)
+    monkeypatch.setattr(rate_governor.random, "uniform", lambda a, b: (a + b) / 2)
+    return clock
+
+
+@pytest.fixture
+def governor_path(tmp_path):
+    return str(tmp_path / "governor.db")
+
+
+def test_requests_per_minute_are_shared_between_instances(governor_path, clock):
+    first = RateGovernor(governor_path, rpm=2, tpm=0)
+    second = RateGovernor(governor_path, rpm=2, tpm=0)
+
+    assert first.reserve(10) == 0
+    assert second.reserve(10) == 0
+    assert first.reserve(10) == pytest.approx(30.0)
+    clock.sleep(30)
+    assert second.reserve(10) == 0
+
+
+def test_a_request_waits_for_enough_tokens(governor_path, clock):
+    governor = RateGovernor(governor_path, rpm=0, tpm=600)
+
+    assert governor.reserve(500) == 0
+    assert governor.reserve(200) == pytest.approx(10.0)
+
+
+def test_rate_limits_back_off_every_worker_and_slow_the_rate(governor_path, clock):
+    governor = RateGovernor(governor_path, rpm=60, tpm=0)
+
+    assert governor.record_failure(_ApiError(429)) is True
+    assert governor.reserve(1) == pytest.approx(rate_governor.BACKOFF_BASE)
+    clock.sleep(rate_governor.BACKOFF_BASE)
+    assert governor.reserve(1) == 0
+    row = sqlite3.connect(governor_path).execute("SELECT rate_factor FROM governor").fetchone()
+    assert row[0] == pytest.approx(0.5)
+
+
+def test_other_errors_leave_the_shared_state_alone(governor_path, clock):
+    governor = RateGovernor(governor_path, rpm=60, tpm=0)
+
+    assert governor.record_failure(ValueError("unparseable answer")) is False
+    assert governor.record_failure(_ApiError(400)) is False
+    assert governor.reserve(1) == 0
+
+
+def test_the_circuit_opens_then_lets_one_probe_through(governor_path, clock):
+    governor = RateGovernor(governor_path, rpm=0, tpm=0, circuit_threshold=3)
+    for _ in range(3):
+        governor.record_failure(_ApiError(503))
+
+    assert governor.reserve(1) == pytest.approx(rate_governor.CIRCUIT_COOLDOWN)
+    clock.sleep(rate_governor.CIRCUIT_COOLDOWN)
+    assert governor.reserve(1) == 0  # the probe
+    assert governor.reserve(1) > 0  # everyone else waits for its verdict
+
+    governor.record_usage(1)
+    assert governor.reserve(1) == 0
+
+
+def test_a_failed_probe_reopens_the_circuit_for_longer(governor_path, clock):
+    governor = RateGovernor(governor_path, rpm=0, tpm=0, circuit_threshold=2)
+    for _ in range(2):
+        governor.record_failure(_ApiError(503))
+    clock.sleep(rate_governor.CIRCUIT_COOLDOWN)
+    assert governor.reserve(1) == 0
+
+    governor.record_failure(_ApiError(503))
+    assert governor.reserve(1) == pytest.approx(2 * rate_governor.CIRCUIT_COOLDOWN)
+
+
+def test_acquire_does_not_block_the_event_loop_while_the_file_is_locked(governor_path):
+    governor = RateGovernor(governor_path, rpm=1000, tpm=0)
+    holder = sqlite3.connect(governor_path, isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.5, lambda: holder.execute("COMMIT")).start()
+
+    acquired = asyncio.Event()
+
+    async def longest_stall() -> float:
+        longest, last = 0.0, time.monotonic()
+        while not acquired.is_set():
+            await asyncio.sleep(0.02)
+            now = time.monotonic()
+            longest, last = max(longest, now - last), now
+        return longest
+
+    async def main() -> float:
+        stall = asyncio.create_task(longest_stall())
+        await asyncio.sleep(0.05)
+        await governor.acquire(1)
+        acquired.set()
+        return await stall
+
+    assert asyncio.run(main()) < 0.25
+
+
+def test_async_extraction_waits_out_a_rate_limit_and_retries(governor_path, monkeypatch):
+    import gemini
+    from llm_backends import FakeBackend, LLMBackendError
+
+    class RateLimitedOnce(FakeBackend):
+        async def agenerate(self, prompt):
+            if not self.calls:
+                self.calls += 1
+                raise LLMBackendError(429, "RESOURCE_EXHAUSTED")
+            return await super().agenerate(prompt)
+
+    monkeypatch.setattr(rate_governor, "BACKOFF_BASE", 0.01)
+    governor = RateGovernor(governor_path, rpm=1000, tpm=0)
+    backend = RateLimitedOnce(latency_median_ms=0)
+
+    fields = asyncio.run(gemini.extract_fields_from_gemini_async(
+        backend, {"Case No": "C.P. 1/2020"}, "JUDGMENT", governor, max_retries=2
+    ))
+
+    assert backend.calls == 2
+    assert fields["court"].lower() == "supreme court of pakistan"
+    failures = sqlite3.connect(governor_path).execute("SELECT failures FROM governor").fetchone()[0]
+    assert failures == 0
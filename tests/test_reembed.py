@@ -0,0 +1,156 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sqlalchemy import select, update
+
+from app.chunker import chunk_documents
+from app.database import get_session
+from app.embeddings import HashingEmbedder, set_embedder
+from app.indexer import index_chunks, reembed_chunks, search_chunks
+from app.models import Chunk
+from app.vector_store import VectorStore
+from tests.conftest import add_documents
+
+PASSAGES = [
+    "The petitioner seeks bail after arrest in a case under section 497 of the code.",
+    "The appeal against conviction for murder is dismissed and the sentence maintained.",
+    "Land revenue record entries carry a presumption of truth until rebutted by evidence.",
+    "Bail after arrest is granted to the petitioner as further inquiry is needed.",
+    "The writ petition challenging the tax assessment order is allowed with costs.",
+    "Service matters of civil servants fall within the jurisdiction of the tribunal.",
+]
+
+OLD = dict(model="hashing-v1", dim=128, version="1")
+NEW = dict(model="hashing-v2", dim=64, version="1")
+
+
+@pytest.fixture
+def indexed(db, tmp_path):
+    """Chunks of PASSAGES embedded into a fresh store with the OLD embedder."""
+    add_documents([{"text": text} for text in PASSAGES])
+    chunk_documents(workers=0)
+    store = VectorStore(root=str(tmp_path / "vectors"))
+    index_chunks(store=store, embedder=HashingEmbedder(**OLD))
+    yield store
+    set_embedder(None)
+
+
+def _stamps() -> dict[int, tuple]:
+    with get_session() as session:
+        rows = session.execute(select(Chunk.id, Chunk.embedding_model, Chunk.embedding_version)).all()
+    return {chunk_id: (model, version) for chunk_id, model, version in rows}
+
+
+###############
+# swap_in
+###############
+
+def test_swap_in_replaces_every_row_at_once(tmp_path):
+    live = VectorStore(root=str(tmp_path / "vectors"))
+    live.append([1, 2, 3], np.eye(3, 8, dtype=np.float32), "old", "1")
+    live.build_ivf(nlist=2)
+    staging = VectorStore(root=str(tmp_path / "vectors" / "staging"))
+    staging.append([1, 2, 3, 4], np.eye(4, 4, dtype=np.float32), "new", "1")
+    reader = VectorStore(root=live.root)
+
+    live.swap_in(staging)
+
+    assert (live.model, live.dim, len(live)) == ("new", 4, 4)
+    assert live.stats()["ivf_rows"] == 0
+    assert not os.path.exists(staging.root)
+    assert all(name.startswith("000001-") for name in os.listdir(live.root) if name.endswith(".bin"))
+    # Readers keep the old snapshot until they refresh
+    assert reader.dim == 8
+    assert reader.refresh().search(np.eye(4, dtype=np.float32)[3], k=1)[0][0][0] == 4
+
+
+###############
+# reembed_chunks
+###############
+
+def test_unstamped_chunks_are_embedded_in_place_unless_their_vector_is_live(indexed):
+    first, second = indexed.chunk_ids()[:2].tolist()
+    with get_session() as session:
+        session.execute(update(Chunk).where(Chunk.id.in_([first, second]))
+                        .values(embedding_model=None, embedding_version=None))
+    indexed.delete([first])
+    rows = indexed.stats()["rows"]
+
+    # The chunk whose vector survived (e.g. an interrupted run) is only stamped
+    assert reembed_chunks(store=indexed, embedder=HashingEmbedder(**OLD)) == 1
+
+    assert indexed.stats()["rows"] == rows + 1
+    assert indexed.contains([first, second]).all()
+    assert set(_stamps().values()) == {("hashing-v1", "1")}
+    assert reembed_chunks(store=indexed, embedder=HashingEmbedder(**OLD)) == 0
+
+
+def test_a_new_model_is_staged_and_resumed_before_being_swapped_in(indexed):
+    chunk_ids = indexed.chunk_ids().tolist()
+    new = HashingEmbedder(**NEW)
+    set_embedder(new)
+    old_hits = search_chunks("bail after arrest", k=3, store=indexed, embedder=HashingEmbedder(**OLD))
+
+    assert reembed_chunks(limit=4, store=indexed, embedder=new) == 4
+
+    # Paused: the old vectors, stamps and query model keep serving
+    assert (indexed.model, indexed.dim) == ("hashing-v1", 128)
+    assert set(_stamps().values()) == {("hashing-v1", "1")}
+    assert search_chunks("bail after arrest", k=3, store=indexed) == old_hits
+    assert os.path.isdir(os.path.join(indexed.root, "staging"))
+
+    # The staged vectors are kept, so only the rest is embedded
+    assert reembed_chunks(store=indexed, embedder=new) == len(chunk_ids) - 4
+
+    assert (indexed.model, indexed.dim) == ("hashing-v2", 64)
+    assert indexed.chunk_ids().tolist() == chunk_ids
+    assert set(_stamps().values()) == {("hashing-v2", "1")}
+    assert not os.path.exists(os.path.join(indexed.root, "staging"))
+    hits = search_chunks("bail after arrest", k=2, store=indexed)
+    assert {chunk_id for chunk_id, _ in hits} == {chunk_ids[0], chunk_ids[3]}
+    assert reembed_chunks(store=indexed, embedder=new) == 0
+
+
+def test_a_version_bump_re_embeds_every_chunk(indexed):
+    bumped = HashingEmbedder(**dict(OLD, version="2"))
+
+    assert reembed_chunks(store=indexed, embedder=bumped) == len(indexed)
+
+    assert indexed.version == "2"
+    assert set(_stamps().values()) == {("hashing-v1", "2")}
+
+
+def test_a_leftover_staging_store_for_another_model_is_discarded(indexed):
+    reembed_chunks(limit=2, store=indexed, embedder=HashingEmbedder(**NEW))
+    other = HashingEmbedder(model="hashing-v3", dim=32)
+
+    assert reembed_chunks(store=indexed, embedder=other) == len(indexed)
+
+    assert (indexed.model, indexed.dim) == ("hashing-v3", 32)
+
+
+###############
+# index_chunks
+###############
+
+@pytest.mark.parametrize("configured", [NEW, dict(OLD, version="2")])
+def test_new_chunks_use_the_stores_model_until_it_is_re_embedded(indexed, configured):
+    new = HashingEmbedder(**configured)
+    set_embedder(new)
+    add_documents([{"text": "Pre-arrest bail is an extraordinary relief granted sparingly.",
+                    "reference_id": "C.P. 99/2021"}])
+    chunk_documents(workers=0)
+    before = len(indexed)
+
+    assert index_chunks(store=indexed) == len(indexed) - before > 0
+
+    assert (indexed.model, indexed.version, indexed.dim) == ("hashing-v1", "1", 128)
+    assert set(_stamps().values()) == {("hashing-v1", "1")}
+    hit, _ = search_chunks("pre-arrest bail extraordinary relief", k=1, store=indexed)[0]
+    assert hit == max(_stamps())
+
+    assert reembed_chunks(store=indexed, embedder=new) == len(indexed)
+    assert set(_stamps().values()) == {(configured["model"], configured["version"])}
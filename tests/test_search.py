@@ -0,0 +1,132 @@
+import importlib.util
+import os
+
+import pytest
+from sqlalchemy import delete
+
+from app.database import get_session
+from app.models import Document
+from app.search import _fts5_query, search_documents
+from tests.conftest import ROOT, add_documents
+
+MIGRATION = os.path.join(ROOT, "migrations", "versions", "41802784ebe7_document_full_text_search.py")
+
+
+def _migration():
+    spec = importlib.util.spec_from_file_location("fts_migration", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def fts(db):
+    """The db fixture plus the FTS5 table and triggers of the full-text search migration."""
+    with db.begin() as conn:
+        for statement in _migration().SQLITE_STATEMENTS:
+            conn.exec_driver_sql(statement)
+    return db
+
+
+###############
+# Query syntax
+###############
+
+@pytest.mark.parametrize("query, expected", [
+    ("bail granted", '"bail" "granted"'),
+    ('"section 497" bail', '"section 497" "bail"'),
+    ("bail OR anticipatory", '"bail" OR "anticipatory"'),
+    ("bail -murder", '"bail" NOT "murder"'),
+    ('bail -"section 302"', '"bail" NOT "section 302"'),
+    ("convict*", '"convict"*'),
+    ("2021 SCMR 45", '"2021" "SCMR" "45"'),
+    ("C.P. 1/2021 (AND)", '"C.P." "1/2021" "(AND)"'),
+    ('say "no', '"say" "no"'),
+    ("OR bail OR OR", '"bail"'),
+    ("bail - x", '"bail" "-" "x"'),
+])
+def test_fts5_query_quotes_every_term(query, expected):
+    assert _fts5_query(query) == expected
+
+
+@pytest.mark.parametrize("query", ["", "   ", "OR", '""', "-murder", "* -bail"])
+def test_fts5_query_without_anything_to_match_is_none(query):
+    assert _fts5_query(query) is None
+
+
+###############
+# Search
+###############
+
+def _ids(hits) -> list[int]:
+    return [hit.document_id for hit in hits]
+
+
+def test_title_matches_rank_above_body_matches(fts):
+    body, title = add_documents([
+        {"text": "The petitioner was granted bail. " + "The record was examined. " * 20},
+        {"title": "Bail petition of Ahmad", "text": "The record was examined. " * 20},
+    ])
+
+    hits = search_documents("bail")
+
+    assert _ids(hits) == [title, body]
+    assert hits[0].score > hits[1].score > 0
+    assert "[bail]" in hits[1].snippet.lower()
+
+
+def test_words_are_anded_and_phrases_excluded_terms_and_stems_work(fts):
+    bail, murder, both = add_documents([
+        {"text": "Bail was granted under section 497 of the code."},
+        {"text": "The murder appeal was dismissed."},
+        {"text": "Bail was refused in the murder case, section 497 notwithstanding."},
+    ])
+
+    assert set(_ids(search_documents("bail murder"))) == {both}
+    assert set(_ids(search_documents('"section 497"'))) == {bail, both}
+    assert set(_ids(search_documents("bail -murder"))) == {bail}
+    assert set(_ids(search_documents("refused OR dismissed"))) == {murder, both}
+    # The porter tokenizer matches other forms of a word
+    assert set(_ids(search_documents("dismiss"))) == {murder}
+    assert search_documents("") == [] and search_documents("-bail") == []
+
+
+def test_citation_and_reference_are_searchable(fts):
+    doc, = add_documents([{"text": "Appeal allowed.", "citation": "2019 SCMR 1234", "reference_id": "Crl.A. 77/2018"}])
+
+    assert _ids(search_documents("2019 SCMR 1234")) == [doc]
+    assert _ids(search_documents("Crl.A. 77/2018")) == [doc]
+
+
+def test_filters_narrow_the_results(fts):
+    ids = add_documents([
+        {"text": "Bail granted.", "year": 2015},
+        {"text": "Bail granted.", "year": 2020, "doc_type": "Order"},
+        {"text": "Bail granted.", "year": 2022, "jurisdiction": "India"},
+    ])
+
+    assert set(_ids(search_documents("bail", year=2015))) == {ids[0]}
+    assert set(_ids(search_documents("bail", year_from=2016, year_to=2022))) == {ids[1], ids[2]}
+    assert set(_ids(search_documents("bail", doc_type="Order"))) == {ids[1]}
+    assert set(_ids(search_documents("bail", doc_type=["Order", "Judgment"]))) == set(ids)
+    assert set(_ids(search_documents("bail", jurisdiction="Pakistan"))) == {ids[0], ids[1]}
+    assert len(search_documents("bail", limit=2)) == 2
+    assert len(search_documents("bail", limit=2, offset=2)) == 1
+
+
+def test_the_index_follows_updates_and_deletes(fts):
+    doc, other = add_documents([{"text": "Bail granted."}, {"text": "Bail refused."}])
+
+    with get_session() as session:
+        document = session.get(Document, doc)
+        document.raw_content = "The murder appeal was dismissed."
+        document.title = "Murder appeal"
+    assert _ids(search_documents("bail")) == [other]
+    assert _ids(search_documents("murder")) == [doc]
+
+    with get_session() as session:
+        session.execute(delete(Document).where(Document.id == other))
+    assert search_documents("bail") == []
+    # The FTS index itself is still consistent with its content
+    with fts.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO documents_fts(documents_fts) VALUES ('integrity-check')")
@@ -0,0 +1,150 @@
+import hashlib
+import importlib.util
+import os
+
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import func, select
+
+from app.database import SessionLocal, get_session
+from app.models import MetadataRaw, RawDocument, TextBlob
+from app.models import text_blobs
+from tests.conftest import ROOT, add_raw_documents
+
+MIGRATION = os.path.join(ROOT, "migrations", "versions", "7a4e91c2b5d0_deduplicated_text_blob_store.py")
+
+
+def _blob_count() -> int:
+    with get_session() as session:
+        return session.scalar(select(func.count()).select_from(TextBlob))
+
+
+@pytest.fixture
+def metadata_id(db) -> int:
+    with get_session() as session:
+        metadata = MetadataRaw(fetch_uri="https://example.test/list", structure=["Case No"], delimiter=",")
+        session.add(metadata)
+        session.flush()
+        return metadata.id
+
+
+def _raw_document(metadata_id: int, text: str) -> RawDocument:
+    return RawDocument(metadata_id=metadata_id, payload="{}", pdf_uri="https://example.test/a.pdf", pdf_raw=text)
+
+
+@pytest.fixture
+def blob_writes(monkeypatch):
+    """Rows passed to each blob insert the before_flush listener makes."""
+    calls = []
+    insert_ignore = text_blobs.insert_ignore
+
+    def spy(session, model, rows, keys, **kwargs):
+        calls.append([row["sha256"] for row in rows])
+        return insert_ignore(session, model, rows, keys, **kwargs)
+
+    monkeypatch.setattr(text_blobs, "insert_ignore", spy)
+    return calls
+
+
+###############
+# BlobText
+###############
+
+def test_identical_texts_share_one_blob(db):
+    add_raw_documents([({"Case No": "1"}, "Same judgment text."), ({"Case No": "2"}, "Same judgment text.")])
+    add_raw_documents([({"Case No": "3"}, "Same judgment text.")], fetch_uri="https://example.test/later")
+
+    assert _blob_count() == 1
+    with get_session() as session:
+        docs = session.scalars(select(RawDocument).options(RawDocument.pdf_raw.loader())).all()
+        assert {doc.pdf_raw_sha256 for doc in docs} == {hashlib.sha256(b"Same judgment text.").hexdigest()}
+        assert [doc.pdf_raw for doc in docs] == ["Same judgment text."] * 3
+
+
+def test_a_blob_is_written_once_however_often_its_row_is_flushed(metadata_id, blob_writes):
+    with get_session() as session:
+        doc = _raw_document(metadata_id, "Text one.")
+        session.add(doc)
+        session.flush()
+        doc.status = "done"
+        session.flush()
+        doc.pdf_raw = "Text two."
+        session.flush()
+
+    assert blob_writes == [[TextBlob.hash_text("Text one.")], [TextBlob.hash_text("Text two.")]]
+    assert _blob_count() == 2
+
+
+def test_a_rollback_leaves_no_orphan_blob_and_the_retry_writes_it_again(metadata_id):
+    session = SessionLocal()
+    try:
+        doc = _raw_document(metadata_id, "Rolled back text.")
+        session.add(doc)
+        session.flush()
+        session.rollback()
+        assert _blob_count() == 0
+
+        session.add(doc)
+        session.commit()
+    finally:
+        session.close()
+
+    assert _blob_count() == 1
+    with get_session() as session:
+        assert session.scalars(select(RawDocument.pdf_raw_sha256)).one() == TextBlob.hash_text("Rolled back text.")
+
+
+def test_a_rolled_back_savepoint_does_not_lose_its_blob(metadata_id):
+    with get_session() as session:
+        doc = _raw_document(metadata_id, "Savepoint text.")
+        savepoint = session.begin_nested()
+        session.add(doc)
+        session.flush()
+        savepoint.rollback()
+        session.add(doc)
+
+    assert _blob_count() == 1
+
+
+###############
+# Migration
+###############
+
+def _migration():
+    spec = importlib.util.spec_from_file_location("blob_migration", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_the_migration_moves_texts_into_deduplicated_blobs(tmp_path):
+    migration = _migration()
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    texts = [f"Judgment {i % 7}" for i in range(migration.BATCH_SIZE + 50)] + [""]
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE text_blobs (sha256 VARCHAR(64) PRIMARY KEY, content TEXT NOT NULL)")
+        conn.exec_driver_sql("CREATE TABLE raw_documents (id INTEGER PRIMARY KEY, pdf_raw TEXT, pdf_raw_sha256 VARCHAR(64))")
+        conn.execute(sa.text("INSERT INTO raw_documents (id, pdf_raw) VALUES (:id, :text)"),
+                     [{"id": i + 1, "text": text} for i, text in enumerate(texts)])
+
+        with Operations.context(MigrationContext.configure(conn)):
+            migration._move_text_to_blobs("raw_documents", "pdf_raw", "pdf_raw_sha256")
+
+        rows = conn.execute(sa.text(
+            "SELECT r.id, r.pdf_raw, r.pdf_raw_sha256, b.content FROM raw_documents r "
+            "JOIN text_blobs b ON b.sha256 = r.pdf_raw_sha256 ORDER BY r.id"
+        )).all()
+        assert len(rows) == len(texts)
+        for row_id, text, sha256, content in rows:
+            assert content == text == texts[row_id - 1]
+            assert sha256 == hashlib.sha256(text.encode("utf-8")).hexdigest()
+        assert conn.scalar(sa.text("SELECT count(*) FROM text_blobs")) == len(set(texts))
+
+        # Downgrade: the text is read back from the blobs
+        conn.exec_driver_sql("UPDATE raw_documents SET pdf_raw = NULL")
+        with Operations.context(MigrationContext.configure(conn)):
+            migration._restore_text_from_blobs("raw_documents", "pdf_raw", "pdf_raw_sha256")
+        assert [text for text, in conn.execute(sa.text("SELECT pdf_raw FROM raw_documents ORDER BY id"))] == texts
+    engine.dispose()
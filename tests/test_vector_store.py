@@ -0,0 +1,220 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sqlalchemy import select
+
+from app.chunker import chunk_documents
+from app.database import get_session
+from app.embeddings import EmbeddingBackend, HashingEmbedder
+from app.indexer import index_chunks, search_chunks, similar_chunks
+from app.models import Chunk
+from app.vector_store import VectorStore
+from tests.conftest import add_documents
+
+
+def _vectors(n: int, dim: int = 16, seed: int = 0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _exact(store: VectorStore, query, k: int) -> list[int]:
+    return [chunk_id for chunk_id, _ in store.search(query, k=k, nprobe=None)[0]]
+
+
+###############
+# Store
+###############
+
+def test_appended_vectors_are_normalized_and_found_by_id(tmp_path):
+    store = VectorStore(root=str(tmp_path / "vectors"))
+    vectors = _vectors(5) * 3
+
+    assert store.append([10, 20, 30, 40, 50], vectors, "m", "1") == 5
+
+    assert len(store) == 5 and store.dim == 16
+    assert store.contains([20, 25, 50]).tolist() == [True, False, True]
+    got = store.get([30, 25])
+    assert np.allclose(got[0], vectors[2] / np.linalg.norm(vectors[2]), atol=1e-6)
+    assert not got[1].any()
+    hits = store.search(vectors[3], k=2)[0]
+    assert hits[0][0] == 40 and hits[0][1] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_appending_a_chunk_again_tombstones_its_old_row(tmp_path):
+    store = VectorStore(root=str(tmp_path / "vectors"))
+    old, new = _vectors(3, seed=1), _vectors(1, seed=2)
+    store.append([1, 2, 3], old, "m", "1")
+
+    store.append([2], new, "m", "1")
+
+    assert len(store) == 3
+    assert store.stats() == {"rows": 4, "live": 3, "ivf_rows": 0}
+    assert np.allclose(store.get([2])[0], new[0], atol=1e-6)
+    # The replaced vector no longer matches anything
+    assert all(score < 0.99 for _, score in store.search(old[1], k=3)[0])
+    assert store.search(new[0], k=1)[0][0][0] == 2
+
+
+def test_a_chunk_given_twice_in_one_append_keeps_its_last_vector(tmp_path):
+    store = VectorStore(root=str(tmp_path / "vectors"))
+    vectors = _vectors(3)
+
+    assert store.append([7, 8, 7], vectors, "m", "1") == 2
+
+    assert np.allclose(store.get([7])[0], vectors[2], atol=1e-6)
+
+
+def test_deleted_chunks_leave_search_results_until_compaction_drops_them(tmp_path):
+    store = VectorStore(root=str(tmp_path / "vectors"))
+    vectors = _vectors(50)
+    store.append(range(1, 51), vectors, "m", "1")
+    query = _vectors(1, seed=9)
+
+    assert store.delete([5, 6, 999]) == 2
+    assert store.delete([5]) == 0
+
+    before = store.search(query, k=10, nprobe=None)[0]
+    assert not {5, 6} & {chunk_id for chunk_id, _ in before}
+    assert store.compact() == 2
+    assert store.stats() == {"rows": 48, "live": 48, "ivf_rows": 0}
+    assert store.search(query, k=10, nprobe=None)[0] == pytest.approx(before)
+    # Older generations' files are gone
+    assert all(path.name.startswith("000001-") for path in (tmp_path / "vectors").glob("*.bin"))
+
+
+def test_mixing_models_or_dimensions_is_refused(tmp_path):
+    store = VectorStore(root=str(tmp_path / "vectors"))
+    store.append([1], _vectors(1), "m", "1")
+
+    with pytest.raises(ValueError, match="re-embed"):
+        store.append([2], _vectors(1), "m", "2")
+    with pytest.raises(ValueError, match="8-d"):
+        store.append([2], _vectors(1, dim=8), "m", "1")
+
+
+def test_ivf_search_matches_the_exact_scan(tmp_path):
+    store = VectorStore(root=str(tmp_path / "vectors"))
+    vectors = _vectors(2000, dim=32)
+    store.append(range(2000), vectors, "m", "1")
+    store.build_ivf(nlist=16)
+    # Rows appended after the build are scanned exhaustively
+    store.append([5000], _vectors(1, dim=32, seed=3), "m", "1")
+    queries = _vectors(20, dim=32, seed=4)
+
+    probed = store.search(queries, k=5, nprobe=16)
+    exact = store.search(queries, k=5, nprobe=None)
+
+    assert store.stats()["ivf_rows"] == 2000
+    assert [[c for c, _ in hits] for hits in probed] == [[c for c, _ in hits] for hits in exact]
+    assert store.search(_vectors(1, dim=32, seed=3), k=1, nprobe=1)[0][0][0] == 5000
+
+
+def test_search_excludes_the_given_chunks(tmp_path):
+    store = VectorStore(root=str(tmp_path / "vectors"))
+    vectors = _vectors(10)
+    store.append(range(10), vectors, "m", "1")
+
+    hits = store.search(vectors[4], k=3, exclude={4})[0]
+
+    assert len(hits) == 3 and 4 not in {chunk_id for chunk_id, _ in hits}
+
+
+def test_another_instance_sees_writes_after_refresh(tmp_path):
+    root = str(tmp_path / "vectors")
+    reader = VectorStore(root=root)
+    writer = VectorStore(root=root)
+
+    writer.append([1, 2], _vectors(2), "m", "1")
+    assert len(reader) == 0
+    assert len(reader.refresh()) == 2
+
+    writer.compact()
+    writer.delete([1])
+    assert reader.refresh().chunk_ids().tolist() == [2]
+
+
+def test_float16_store_scores_close_to_float32(tmp_path):
+    vectors, query = _vectors(100), _vectors(1, seed=5)
+    full = VectorStore(root=str(tmp_path / "f32"))
+    half = VectorStore(root=str(tmp_path / "f16"), dtype="float16")
+    full.append(range(100), vectors, "m", "1")
+    half.append(range(100), vectors, "m", "1")
+
+    assert (tmp_path / "f16" / "000000-vectors.bin").stat().st_size == 100 * 16 * 2
+    assert _exact(half, query, 5) == _exact(full, query, 5)
+    assert [s for _, s in half.search(query, k=5)[0]] == pytest.approx([s for _, s in full.search(query, k=5)[0]], abs=1e-2)
+
+
+###############
+# Embedders
+###############
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=64)
+    texts = ["Bail is granted under section 497", "bail is GRANTED under section 497!", "", "murder appeal dismissed"]
+
+    vectors = embedder.embed(texts)
+
+    assert vectors.shape == (4, 64) and vectors.dtype == np.float32
+    assert np.array_equal(vectors, HashingEmbedder(dim=64).embed(texts))
+    assert np.allclose(np.linalg.norm(vectors[[0, 1, 3]], axis=1), 1.0, atol=1e-6)
+    assert not vectors[2].any()
+    # Case and punctuation don't matter; different wording does
+    assert vectors[0] @ vectors[1] == pytest.approx(1.0, abs=1e-6)
+    assert vectors[0] @ vectors[3] < 0.5
+
+
+def test_an_embedder_must_implement_embed():
+    class Incomplete(EmbeddingBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete("model", 8)
+
+
+###############
+# Indexing
+###############
+
+PASSAGES = [
+    "The petitioner seeks bail after arrest in a case under section 497 of the code.",
+    "The appeal against conviction for murder is dismissed and the sentence maintained.",
+    "Land revenue record entries carry a presumption of truth until rebutted by evidence.",
+    "Bail after arrest is granted to the petitioner as further inquiry is needed under section 497.",
+]
+
+
+@pytest.fixture
+def chunks(db):
+    add_documents([{"text": text} for text in PASSAGES])
+    chunk_documents(workers=0)
+    with get_session() as session:
+        return session.scalars(select(Chunk.id).order_by(Chunk.id)).all()
+
+
+def test_index_chunks_embeds_each_chunk_once_and_stamps_it(chunks, tmp_path):
+    store = VectorStore(root=str(tmp_path / "vectors"))
+    embedder = HashingEmbedder(dim=128, version="1")
+
+    assert index_chunks(limit=2, store=store, embedder=embedder) == 2
+    assert index_chunks(store=store, embedder=embedder) == len(chunks) - 2
+    assert index_chunks(store=store, embedder=embedder) == 0
+
+    assert store.chunk_ids().tolist() == chunks
+    assert (store.model, store.version) == ("hashing-v1", "1")
+    with get_session() as session:
+        stamps = set(session.execute(select(Chunk.embedding_model, Chunk.embedding_version)).all())
+    assert stamps == {("hashing-v1", "1")}
+
+
+def test_search_and_similar_chunks_find_passages_sharing_their_wording(chunks, tmp_path):
+    store = VectorStore(root=str(tmp_path / "vectors"))
+    embedder = HashingEmbedder(dim=128)
+    index_chunks(store=store, embedder=embedder)
+    bail, murder, _, other_bail = chunks
+
+    assert search_chunks("appeal against conviction for murder", k=1, store=store, embedder=embedder)[0][0] == murder
+    similar = similar_chunks(bail, k=2, store=store)
+    assert similar[0][0] == other_bail and bail not in {chunk_id for chunk_id, _ in similar}
+    assert similar_chunks(10_000, store=store) == []
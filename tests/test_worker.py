@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+import app.worker as worker
+from app.analyzer import ANALYZER_MAX_ATTEMPTS
+from app.database import get_session
+from app.models import RawDocument, RawDocumentLease
+from app.models.raw_documents import STATUS_DONE
+from tests.conftest import add_raw_documents
+
+
+def _pending(count: int) -> list[int]:
+    return add_raw_documents([({"Case No": f"C.P. {i}/2020"}, f"text {i}") for i in range(count)])
+
+
+def _statuses() -> dict[int, tuple[str, int]]:
+    with get_session() as session:
+        return {raw_id: (status, attempts) for raw_id, status, attempts in session.execute(
+            select(RawDocument.id, RawDocument.status, RawDocument.attempts)
+        )}
+
+
+###############
+# Leases
+###############
+
+def test_workers_claim_disjoint_batches(db):
+    ids = _pending(5)
+
+    first = worker.claim_batch("w1", 3)
+    second = worker.claim_batch("w2", 3)
+
+    assert first == ids[:3]
+    assert second == ids[3:]
+    assert worker.claim_batch("w3", 3) == []
+
+
+def test_expired_leases_hand_the_work_back(db):
+    ids = _pending(2)
+    worker.claim_batch("dead", 2)
+    with get_session() as session:
+        session.execute(update(RawDocumentLease).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+
+    assert worker.claim_batch("alive", 2) == ids
+    with get_session() as session:
+        assert set(session.scalars(select(RawDocumentLease.worker_id))) == {"alive"}
+
+
+def test_only_the_holder_extends_and_releases_its_leases(db):
+    ids = _pending(2)
+    worker.claim_batch("w1", 2)
+
+    assert worker.extend_leases("w2", ids) == 0
+    assert worker.extend_leases("w1", ids) == 2
+    worker.release_leases("w2", ids)
+    assert worker.claim_batch("w2", 2) == []
+    worker.release_leases("w1", ids)
+    assert worker.claim_batch("w2", 2) == ids
+
+
+def test_finished_documents_are_not_claimed(db):
+    ids = _pending(3)
+    with get_session() as session:
+        session.execute(update(RawDocument).where(RawDocument.id == ids[1]).values(status=STATUS_DONE))
+
+    assert worker.claim_batch("w1", 3) == [ids[0], ids[2]]
+
+
+###############
+# Worker loop
+###############
+
+def test_a_worker_drains_the_queue_and_releases_its_leases(db):
+    ids = _pending(5)
+
+    assert worker.run_worker("w1", batch_size=2, cache_mode="bypass") == 5
+    assert _statuses() == {raw_id: ("done", 0) for raw_id in ids}
+    with get_session() as session:
+        assert session.scalars(select(RawDocumentLease)).all() == []
+
+
+def test_a_poison_document_fails_alone_instead_of_blocking_its_batch(db, monkeypatch):
+    ids = _pending(4)
+    poison = ids[1]
+    batches = []
+
+    def process_batch(session, raw_docs, cache_mode):
+        batches.append([doc.id for doc in raw_docs])
+        if any(doc.id == poison for doc in raw_docs):
+            raise RuntimeError("PDF text crashes the extractor")
+        for doc in raw_docs:
+            doc.status = STATUS_DONE
+        return len(raw_docs)
+
+    monkeypatch.setattr(worker, "_process_batch", process_batch)
+
+    assert worker.run_worker("w1", batch_size=4) == 3
+    statuses = _statuses()
+    assert statuses[poison] == ("failed", ANALYZER_MAX_ATTEMPTS)
+    assert all(statuses[i] == ("done", 0) for i in ids if i != poison)
+    assert batches[0] == ids
+    # After the first failure the batch is retried one document at a time
+    assert batches[1:5] == [[i] for i in ids]